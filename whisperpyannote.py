@@ -6,7 +6,12 @@ Auteur : marcdelage
 """
 
 import os
+import io
 import sys
+import socket
+import socketserver
+import contextlib
+import http.server
 import subprocess
 import datetime
 import wave
@@ -14,13 +19,352 @@ import tempfile
 import argparse
 import re
 import json
-import whisper
-from tqdm import tqdm
-from pyannote.audio import Pipeline
-import torchaudio
-import torch
-from torch.serialization import add_safe_globals
-from pyannote.audio.core.task import Specifications, Problem, Resolution
+import heapq
+import bisect
+import queue
+import itertools
+import hashlib
+import types
+import functools
+import cProfile
+import importlib.metadata
+import importlib.util
+import glob
+import csv
+import time
+import gc
+import threading
+import multiprocessing
+import concurrent.futures
+import numpy as np
+
+# torch, torchaudio, whisper et pyannote.audio ne sont importés qu'au moment où une étape
+# en a besoin : -h, la validation des arguments et le parsing restent instantanés.
+
+
+# =========================
+#   Trace des étapes (--trace)
+# =========================
+
+_TRACE = None  # Tracer actif, ou None (les spans ne coûtent alors qu'un test)
+
+
+class Tracer:
+    """
+    Enregistre des spans (début, durée, pid, tid, compteurs) au format Chrome trace-event,
+    avec profilage cProfile optionnel de certaines étapes.
+    """
+
+    def __init__(self, profile_stages=()):
+        self.origin = time.perf_counter()
+        self.events = []
+        self.thread_names = {}
+        self.lock = threading.Lock()
+        self.profile_stages = set(profile_stages)
+        self.profiles = {}
+        self._profiling = threading.Lock()  # un seul profileur actif à la fois
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def record(self, name: str, start_us: float, end_us: float, args: dict):
+        tid = threading.get_native_id()
+        with self.lock:
+            self.thread_names.setdefault(tid, threading.current_thread().name)
+            self.events.append({
+                "name": name, "cat": "stage", "ph": "X",
+                "ts": start_us, "dur": end_us - start_us,
+                "pid": os.getpid(), "tid": tid, "args": args,
+            })
+
+    def profiler_for(self, name: str):
+        if not (name in self.profile_stages or "all" in self.profile_stages):
+            return None
+        if not self._profiling.acquire(blocking=False):
+            return None
+        with self.lock:
+            return self.profiles.setdefault(name, cProfile.Profile())
+
+    def summary(self) -> dict:
+        wall = self._now_us() / 1e6
+        stages = {}
+        for e in self.events:
+            s = stages.setdefault(e["name"], {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            seconds = e["dur"] / 1e6
+            s["count"] += 1
+            s["total_seconds"] += seconds
+            s["max_seconds"] = max(s["max_seconds"], seconds)
+            for key, value in e["args"].items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    s[key] = s.get(key, 0) + value
+        for s in stages.values():
+            s["share_of_wall"] = s["total_seconds"] / wall if wall else 0.0
+        ordered = dict(sorted(stages.items(), key=lambda item: -item[1]["total_seconds"]))
+        return {"wall_seconds": wall, "pid": os.getpid(), "stages": ordered}
+
+    def write(self, trace_path: str):
+        root, _ = os.path.splitext(trace_path)
+        pid = os.getpid()
+        metadata = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "whisperpyannote"}}]
+        metadata += [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self.thread_names.items()
+        ]
+        with open(trace_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}, f)
+        print(f"\nOK Trace sauvegardee dans : {trace_path} (chrome://tracing ou https://ui.perfetto.dev)")
+
+        summary = self.summary()
+        summary_path = root + ".summary.json"
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"OK Resume de trace sauvegarde dans : {summary_path}")
+        for name, s in list(summary["stages"].items())[:8]:
+            print(f"- {name} : {s['total_seconds']:.2f}s ({s['count']}x, {s['share_of_wall']:.0%} du temps total)")
+
+        for name, profile in self.profiles.items():
+            prof_path = f"{root}.{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}.prof"
+            profile.dump_stats(prof_path)
+            print(f"OK Profil cProfile de '{name}' : {prof_path} (python -m pstats {prof_path})")
+
+
+@contextlib.contextmanager
+def trace_span(name: str, **counts):
+    """
+    Span de trace autour d'un bloc ; le dict produit accepte des compteurs
+    supplémentaires (octets, segments...) renseignés pendant le bloc.
+    """
+    tracer = _TRACE
+    if tracer is None:
+        yield counts
+        return
+    profile = tracer.profiler_for(name)
+    start = tracer._now_us()
+    if profile is not None:
+        profile.enable()
+    try:
+        yield counts
+    finally:
+        if profile is not None:
+            profile.disable()
+            tracer._profiling.release()
+        tracer.record(name, start, tracer._now_us(), counts)
+
+
+def traced(name: str, counts=None):
+    """Décorateur : trace chaque appel ; counts(resultat, *args, **kwargs) -> dict de compteurs."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _TRACE is None:
+                return fn(*args, **kwargs)
+            with trace_span(name) as span:
+                result = fn(*args, **kwargs)
+                if counts is not None:
+                    span.update(counts(result, *args, **kwargs))
+                return result
+        return wrapper
+    return decorator
+
+
+def _file_bytes(path: str) -> dict:
+    return {"bytes": os.path.getsize(path) if path and os.path.exists(path) else 0}
+
+
+@contextlib.contextmanager
+def trace_session(args):
+    """Active la trace pour la durée du bloc si --trace est demandé (sans effet si déjà active)."""
+    global _TRACE
+    trace_path = getattr(args, "trace", None)
+    if not trace_path or _TRACE is not None:
+        yield
+        return
+    stages = [x.strip() for x in (getattr(args, "trace_profile", None) or "").split(",") if x.strip()]
+    _TRACE = Tracer(stages)
+    try:
+        yield
+    finally:
+        tracer, _TRACE = _TRACE, None
+        tracer.write(trace_path)
+
+
+# =========================
+#   Progression JSON (--progress_json)
+# =========================
+
+PROGRESS_PROTOCOL_VERSION = 1
+PROGRESS_STAGES = ("ingest", "transcription", "diarization", "export")
+PROGRESS_EVENTS = ("session_start", "stage_start", "progress", "stage_end", "stage_error", "session_end")
+
+# Poids approximatifs des étapes Pyannote dans le temps total de diarisation.
+DIARIZATION_STEP_WEIGHTS = (("segmentation", 0.35), ("embeddings", 0.65))
+
+_PROGRESS = None  # ProgressReporter actif, ou None
+_progress_local = threading.local()  # fichier et étape en cours, par thread
+
+
+class ProgressReporter:
+    """
+    Émet des événements NDJSON (un objet JSON par ligne) sur un flux dédié, séparé
+    des messages texte, pour que les interfaces affichent une vraie progression.
+    """
+
+    def __init__(self, stream, min_interval: float = 0.5, **static_fields):
+        self.stream = stream
+        self.min_interval = min_interval
+        self.static_fields = static_fields  # ajoutés à chaque événement (ex: id du job en mode worker)
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+        self._last_emit = {}
+
+    def emit(self, event: str, **fields):
+        payload = {"event": event, "t": round(time.perf_counter() - self.origin, 3), **self.static_fields, **fields}
+        line = json.dumps(payload, ensure_ascii=False)
+        with self.lock:
+            try:
+                self.stream.write(line + "\n")
+                self.stream.flush()
+            except (OSError, ValueError):
+                pass
+
+    def progress(self, stage: str, done: float, total: float, **fields):
+        """Événement "progress" limité à un tous les min_interval secondes (sauf à 100 %)."""
+        if not total or total <= 0:
+            return
+        fraction = min(1.0, max(0.0, done / total))
+        input_path = getattr(_progress_local, "input", None)
+        now = time.perf_counter()
+        key = (input_path, stage)
+        if fraction < 1.0 and now - self._last_emit.get(key, 0.0) < self.min_interval:
+            return
+        self._last_emit[key] = now
+
+        started = getattr(_progress_local, "stage_started", None)
+        elapsed = now - started if started else None
+        eta = elapsed * (1.0 - fraction) / fraction if elapsed and fraction > 0 else None
+        audio_seconds = getattr(_progress_local, "audio_seconds", None)
+        self.emit(
+            "progress",
+            stage=stage,
+            input=input_path,
+            percent=round(100.0 * fraction, 1),
+            processed_seconds=round(fraction * audio_seconds, 2) if audio_seconds else None,
+            audio_seconds=audio_seconds,
+            eta_seconds=round(eta, 1) if eta is not None else None,
+            **fields,
+        )
+
+
+def open_progress_stream(dest: str):
+    """stderr (défaut), stdout, fd:N (descripteur hérité) ou chemin de fichier/FIFO."""
+    if not dest or dest == "stderr":
+        return sys.stderr
+    if dest == "stdout":
+        return sys.__stdout__
+    if dest.startswith("fd:"):
+        return os.fdopen(int(dest[3:]), "w", encoding="utf-8", buffering=1, closefd=False)
+    return open(dest, "a", encoding="utf-8", buffering=1)
+
+
+@contextlib.contextmanager
+def progress_session(args):
+    """Active --progress_json pour la durée du bloc (sans effet si déjà actif)."""
+    global _PROGRESS
+    if not getattr(args, "progress_json", False) or _PROGRESS is not None:
+        yield
+        return
+    _PROGRESS = ProgressReporter(open_progress_stream(getattr(args, "progress_stream", None)))
+    _PROGRESS.emit("session_start", protocol=PROGRESS_PROTOCOL_VERSION, pid=os.getpid())
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        reporter, _PROGRESS = _PROGRESS, None
+        reporter.emit("session_end", status=status)
+
+
+def report_progress(stage: str, done: float, total: float, **fields):
+    if _PROGRESS is not None:
+        _PROGRESS.progress(stage, done, total, **fields)
+
+
+def _stage_counts(job, stage: str) -> dict:
+    if stage == "ingest":
+        return {"audio_seconds": job.get("audio_duration_seconds")}
+    if stage == "transcription":
+        return {"segments": len(job.get("transcript_segments") or [])}
+    if stage == "diarization":
+        return {"segments": len(job.get("speaker_segments") or [])}
+    return {"output": job.get("output")}
+
+
+def report_stage(stage: str, skip=None):
+    """
+    Décorateur des étapes de job : événements stage_start / stage_end (ou stage_error)
+    avec durée et nombre de segments. skip(job) -> True si l'étape ne s'applique pas.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(job, *args, **kwargs):
+            if _PROGRESS is None or (skip is not None and skip(job)):
+                return fn(job, *args, **kwargs)
+            _progress_local.input = job["input"]
+            _progress_local.audio_seconds = job.get("audio_duration_seconds") or None
+            _progress_local.stage_started = started = time.perf_counter()
+            _PROGRESS.emit("stage_start", stage=stage, input=job["input"])
+            try:
+                result = fn(job, *args, **kwargs)
+            except BaseException as e:
+                _PROGRESS.emit("stage_error", stage=stage, input=job["input"], message=str(e))
+                raise
+            _PROGRESS.emit("stage_end", stage=stage, input=job["input"],
+                           seconds=round(time.perf_counter() - started, 3), **_stage_counts(job, stage))
+            return result
+        return wrapper
+    return decorator
+
+
+def install_whisper_progress_hook():
+    """
+    Remplace la barre tqdm interne de whisper.transcribe par une sous-classe qui
+    publie l'avancement (trames mel traitées / total) en événements "progress".
+    """
+    try:
+        import whisper.transcribe as whisper_transcribe
+        base = whisper_transcribe.tqdm.tqdm
+    except (ImportError, AttributeError):
+        return
+    if getattr(whisper_transcribe, "_progress_hook_installed", False) or not isinstance(base, type):
+        return
+
+    class _ProgressTqdm(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._frames_total = kwargs.get("total")
+            self._frames_done = 0
+
+        def update(self, n=1):
+            self._frames_done += n
+            report_progress("transcription", self._frames_done, self._frames_total)
+            return super().update(n)
+
+    whisper_transcribe.tqdm = types.SimpleNamespace(tqdm=_ProgressTqdm)
+    whisper_transcribe._progress_hook_installed = True
+
+
+def pyannote_progress_hook(step_name, step_artifact, file=None, total=None, completed=None):
+    """Hook Pyannote (pipeline(..., hook=...)) : avancement pondéré des étapes internes."""
+    if total is None or completed is None:
+        return
+    done = 0.0
+    for name, weight in DIARIZATION_STEP_WEIGHTS:
+        if name == step_name:
+            fraction = done + weight * (completed / total if total else 1.0)
+            report_progress("diarization", fraction, 1.0, step=step_name,
+                            step_percent=round(100.0 * completed / total, 1) if total else 100.0)
+            return
+        done += weight
 
 
 # =========================
@@ -43,6 +387,7 @@ def is_video(file_path: str) -> bool:
     ))
 
 
+@traced("extract_audio", lambda out, *a, **k: _file_bytes(out))
 def extract_audio(video_path: str) -> str:
     """Extrait l'audio d'une vidéo en mono 16kHz vers un fichier WAV temporaire."""
     with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmpfile:
@@ -50,7 +395,7 @@ def extract_audio(video_path: str) -> str:
 
     print("Extraction audio depuis la video...")
     run_command([
-        "ffmpeg", "-i", video_path,
+        "ffmpeg", *ffmpeg_thread_args(), "-i", video_path,
         "-ac", "1", "-ar", "16000",
         "-vn", "-y",
         audio_output
@@ -60,14 +405,16 @@ def extract_audio(video_path: str) -> str:
 
 
 def is_valid_audio(file_path: str) -> bool:
-    """Vérifie que l'audio est bien au format 16kHz mono (sinon conversion)."""
+    """Vérifie que l'audio est bien au format WAV PCM 16 bits 16kHz mono (sinon conversion)."""
     try:
         with wave.open(file_path, 'rb') as audio:
-            return audio.getframerate() == 16000 and audio.getnchannels() == 1
+            return (audio.getframerate() == 16000 and audio.getnchannels() == 1
+                    and audio.getsampwidth() == 2)
     except (wave.Error, FileNotFoundError, IOError):
         return False
 
 
+@traced("convert_audio", lambda out, *a, **k: _file_bytes(out))
 def convert_audio(audio_path: str) -> str:
     """Convertit un fichier audio en WAV mono 16kHz temporaire."""
     with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmpfile:
@@ -75,7 +422,7 @@ def convert_audio(audio_path: str) -> str:
 
     print("Conversion de l'audio au format 16kHz mono...")
     run_command([
-        "ffmpeg", "-i", audio_path,
+        "ffmpeg", *ffmpeg_thread_args(), "-i", audio_path,
         "-ac", "1", "-ar", "16000",
         "-y",
         converted_audio
@@ -115,31 +462,34 @@ def _smart_join(a: str, b: str) -> str:
     return j.strip()
 
 
-def merge_by_runs(segments):
+@traced("merge_by_runs", lambda out, segments, *a, **k: {"segments_in": len(segments), "segments": len(out)})
+def merge_by_runs(segments, max_gap: float = None):
     """
     Fusionne des segments consécutifs qui appartiennent au même speaker.
     segments: liste de dicts {"start", "end", "speaker", "text"}
+    max_gap: si fourni, un silence plus long (en secondes) entre deux segments coupe la fusion.
     """
-    if not segments:
-        return []
+    return list(iter_runs(sorted(segments, key=lambda s: (s["start"], s["end"])), max_gap))
 
-    segments = sorted(segments, key=lambda s: (s["start"], s["end"]))
-    merged = []
-    cur = dict(segments[0])
 
-    for seg in segments[1:]:
-        if seg["speaker"] == cur["speaker"]:
+def iter_runs(segments, max_gap: float = None):
+    """
+    Version itérative de merge_by_runs pour des segments déjà triés : chaque tour de parole
+    est produit dès qu'il est terminé, sans construire la liste complète.
+    """
+    cur = None
+    for seg in segments:
+        if cur is not None and seg["speaker"] == cur["speaker"] and \
+                (max_gap is None or float(seg["start"]) - cur["end"] <= max_gap):
             cur["end"] = max(cur["end"], float(seg["end"]))
             cur["text"] = _smart_join(cur.get("text", ""), seg.get("text", ""))
         else:
-            if cur.get("text", "").strip():
-                merged.append(cur)
+            if cur is not None and cur.get("text", "").strip():
+                yield cur
             cur = dict(seg)
 
-    if cur.get("text", "").strip():
-        merged.append(cur)
-
-    return merged
+    if cur is not None and cur.get("text", "").strip():
+        yield cur
 
 
 def hhmmss(t: float) -> str:
@@ -158,10 +508,750 @@ def get_audio_duration_seconds(audio_path: str) -> float:
         return 0.0
 
 
+def release_memory():
+    """Rend au système la mémoire des gros tableaux qui viennent d'être libérés."""
+    gc.collect()
+    try:
+        torch = sys.modules.get("torch")  # rien à libérer si torch n'a jamais été chargé
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
+
+
+def peak_rss_bytes():
+    """Pic de mémoire résidente (RSS) du processus, ou None si indisponible (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux : kilo-octets, macOS : octets
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def print_memory_report(max_memory_mb: float = None):
+    peak = peak_rss_bytes()
+    if peak is None:
+        print("\nMemoire : pic RSS indisponible sur cette plateforme.")
+        return
+    peak_mb = peak / (1024 * 1024)
+    if max_memory_mb:
+        print(f"\nMemoire : pic RSS {peak_mb:.0f} Mo (budget --max_memory : {max_memory_mb:.0f} Mo)")
+        if peak_mb > max_memory_mb:
+            print("ATTENTION Budget memoire depasse (modeles et inference Whisper inclus).")
+    else:
+        print(f"\nMemoire : pic RSS {peak_mb:.0f} Mo")
+
+
+# =============================
+#   Ressources CPU (threads, affinité)
+# =============================
+
+# Réglages CPU du processus (cf. configure_cpu) ; None : comportement par défaut de torch/ffmpeg
+_CPU_SETTINGS = None
+CPU_STAGES = ("transcription", "diarization")
+
+
+def cpu_list(text: str) -> list:
+    """Type argparse : liste de CPU au format '0-3,8,10-11'."""
+    cpus = set()
+    try:
+        for part in text.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            first, _, last = part.partition("-")
+            cpus.update(range(int(first), int(last or first) + 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"liste de CPU invalide : '{text}' (attendu : ex. 0-3,8)")
+    if not cpus:
+        raise argparse.ArgumentTypeError(f"liste de CPU vide : '{text}'")
+    return sorted(cpus)
+
+
+def format_cpu_list(cpus) -> str:
+    """[0, 1, 2, 3, 8] -> '0-3,8'."""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(f"{a}-{b}" if b > a else str(a) for a, b in ranges)
+
+
+def available_cpus() -> list:
+    """CPU utilisables par le processus (affinité héritée, ex: cgroup/taskset)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cpu_budget() -> int:
+    """Nombre de threads de calcul alloués au processus (tous étages confondus)."""
+    if _CPU_SETTINGS is not None:
+        return _CPU_SETTINGS["threads"]
+    return os.cpu_count() or 1
+
+
+def _set_process_affinity(cpus):
+    """Épingle tous les threads existants du processus ; les threads créés ensuite héritent."""
+    try:
+        tasks = [int(t) for t in os.listdir("/proc/self/task")]
+    except OSError:
+        tasks = [0]
+    for tid in tasks:
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except OSError:
+            pass
+
+
+def add_cpu_arguments(parser):
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help="Threads torch intra-op pour l'inférence (par défaut : nombre de CPU du processus, "
+             "divisé par --host_jobs)."
+    )
+    parser.add_argument(
+        "--interop_threads",
+        type=int,
+        help="Threads torch inter-op (par défaut : réglage de torch, 1 dès que les CPU sont limités)."
+    )
+    parser.add_argument(
+        "--ffmpeg_threads",
+        type=int,
+        help="Threads de décodage ffmpeg (par défaut : automatique, --threads dès que les CPU sont limités)."
+    )
+    parser.add_argument(
+        "--cpus",
+        type=cpu_list,
+        metavar="LISTE",
+        help="Affinité CPU du processus, ex. 0-3,8 (Linux)."
+    )
+    parser.add_argument(
+        "--host_jobs",
+        type=int,
+        default=1,
+        help="Nombre de jobs lancés en même temps sur la machine : les threads par défaut sont répartis "
+             "entre eux (par défaut : 1)."
+    )
+    parser.add_argument(
+        "--host_slot",
+        type=int,
+        help="Avec --host_jobs N : épingler ce job sur la tranche numéro I (0 à N-1) des CPU, "
+             "disjointe de celles des autres jobs."
+    )
+    parser.add_argument(
+        "--transcription_cpus",
+        type=cpu_list,
+        metavar="LISTE",
+        help="CPU réservés au thread de Whisper (chargement et transcription) ; bornent aussi les threads torch."
+    )
+    parser.add_argument(
+        "--diarization_cpus",
+        type=cpu_list,
+        metavar="LISTE",
+        help="CPU réservés au thread de Pyannote (chargement et diarisation) ; bornent aussi les threads torch."
+    )
+
+
+def configure_cpu(args) -> dict:
+    """
+    Calcule les réglages CPU effectifs du processus et applique l'affinité. Les threads torch
+    sont appliqués au premier usage de torch (cf. cpu_stage), torch étant importé à la demande.
+    """
+    global _CPU_SETTINGS
+    base = available_cpus()
+    affinity = hasattr(os, "sched_setaffinity")
+    wanted = [c for c in (args.cpus, args.transcription_cpus, args.diarization_cpus) if c] or \
+        ([True] if args.host_slot is not None else [])
+    if wanted and not affinity:
+        print("ATTENTION Affinite CPU non disponible sur cette plateforme : seuls les nombres de threads "
+              "sont appliques.")
+
+    if args.host_jobs < 1 or any(n is not None and n < 1 for n in
+                                 (args.threads, args.interop_threads, args.ffmpeg_threads)):
+        print("ERREUR --host_jobs, --threads, --interop_threads et --ffmpeg_threads doivent etre >= 1.")
+        sys.exit(1)
+    cpus = base
+    if args.cpus:
+        cpus = [c for c in args.cpus if c in base]
+        if len(cpus) != len(args.cpus):
+            print(f"ERREUR --cpus {format_cpu_list(args.cpus)} : CPU hors de ceux disponibles "
+                  f"({format_cpu_list(base)}).")
+            sys.exit(1)
+    if args.host_slot is not None:
+        if not 0 <= args.host_slot < args.host_jobs:
+            print(f"ERREUR --host_slot doit etre compris entre 0 et --host_jobs - 1 ({args.host_jobs - 1}).")
+            sys.exit(1)
+        if args.host_jobs > len(cpus):
+            print(f"ERREUR --host_jobs {args.host_jobs} : seulement {len(cpus)} CPU disponibles.")
+            sys.exit(1)
+        cpus = [int(c) for c in np.array_split(cpus, args.host_jobs)[args.host_slot]]
+        share = 1
+    else:
+        share = args.host_jobs
+
+    stage_cpus = {}
+    for stage in CPU_STAGES:
+        selected = getattr(args, f"{stage}_cpus")
+        if selected and not set(selected) <= set(cpus):
+            print(f"ERREUR --{stage}_cpus {format_cpu_list(selected)} : CPU hors de ceux du processus "
+                  f"({format_cpu_list(cpus)}).")
+            sys.exit(1)
+        stage_cpus[stage] = selected
+
+    limited = cpus != base or share > 1 or args.threads is not None
+    threads = args.threads or max(1, len(cpus) // share)
+    _CPU_SETTINGS = {
+        "cpus": cpus,
+        "pinned": affinity and cpus != base,
+        "threads": threads,
+        "inference_concurrency": inference_concurrency(args),
+        "interop_threads": args.interop_threads or (1 if limited else None),
+        "ffmpeg_threads": args.ffmpeg_threads or (threads if limited else None),
+        "stage_cpus": stage_cpus if affinity else {},
+        "torch_applied": False,
+    }
+    if _CPU_SETTINGS["pinned"]:
+        _set_process_affinity(cpus)
+    return _CPU_SETTINGS
+
+
+def ffmpeg_thread_args() -> list:
+    """Options ffmpeg de décodage (avant -i) selon --ffmpeg_threads."""
+    if _CPU_SETTINGS is None or not _CPU_SETTINGS["ffmpeg_threads"]:
+        return []
+    return ["-threads", str(_CPU_SETTINGS["ffmpeg_threads"])]
+
+
+def inference_concurrency(args) -> int:
+    """Nombre d'étapes d'inférence (transcription, diarisation) qui tournent en même temps."""
+    transcription = not getattr(args, "diarization_only", False)
+    diarization = not getattr(args, "transcription_only", False)
+    if getattr(args, "scheduler", False):
+        return max(1, transcription * getattr(args, "transcription_workers", 1)
+                   + diarization * getattr(args, "diarization_workers", 1))
+    if getattr(args, "parallel_stages", False) and transcription and diarization:
+        return 2
+    return 1
+
+
+def inference_threads(concurrent: int = 1) -> int:
+    """
+    Threads torch intra-op quand `concurrent` étapes d'inférence tournent en même temps :
+    part du budget CPU de chacune, bornée par la plus petite des listes --<stage>_cpus.
+    """
+    threads = max(1, cpu_budget() // max(1, concurrent))
+    stage_cpus = [c for c in (_CPU_SETTINGS["stage_cpus"].values() if _CPU_SETTINGS else ()) if c]
+    if stage_cpus:
+        threads = min(threads, min(len(c) for c in stage_cpus))
+    return threads
+
+
+def torch_cpu_setup():
+    """
+    Importe torch et applique une fois les threads intra/inter-op configurés. Retourne torch.
+    torch.set_num_threads vaut pour tout le processus : il n'est appelé qu'ici, avec la part
+    de budget des étapes concurrentes prévues par la ligne de commande (inference_concurrency).
+    """
+    import torch
+
+    settings = _CPU_SETTINGS
+    if settings is None or settings["torch_applied"]:
+        return torch
+    settings["torch_applied"] = True
+    torch.set_num_threads(inference_threads(settings["inference_concurrency"]))
+    if settings["interop_threads"]:
+        try:
+            torch.set_num_interop_threads(settings["interop_threads"])
+        except RuntimeError:
+            # torch refuse une fois du travail inter-op lancé (ex: second job d'un serveur)
+            print(f"ATTENTION Threads inter-op deja fixes par torch "
+                  f"({torch.get_num_interop_threads()}), --interop_threads ignore.")
+    print_cpu_report(torch)
+    return torch
+
+
+def print_cpu_report(torch=None):
+    """Réglages CPU effectifs (lus auprès du système et de torch, pas seulement demandés)."""
+    settings = _CPU_SETTINGS
+    cpus = available_cpus()
+    print("\nRessources CPU :")
+    print(f"- CPU du processus : {len(cpus)} ({format_cpu_list(cpus)})"
+          + (" [epingle]" if settings and settings["pinned"] else ""))
+    if torch is not None:
+        print(f"- Threads torch : {torch.get_num_threads()} intra-op, {torch.get_num_interop_threads()} inter-op")
+    ffmpeg_threads = settings["ffmpeg_threads"] if settings else None
+    print(f"- Threads ffmpeg : {ffmpeg_threads or 'auto'}")
+    for stage, stage_cpus in (settings["stage_cpus"].items() if settings else ()):
+        if stage_cpus:
+            label = "diarisation" if stage == "diarization" else stage
+            print(f"- Etape {label} : CPU {format_cpu_list(stage_cpus)} (thread de l'etape)")
+
+
+@contextlib.contextmanager
+def cpu_stage(stage: str):
+    """
+    Épingle le thread courant sur les CPU --<stage>_cpus d'une étape d'inférence
+    ("transcription" ou "diarization") le temps de l'étape, puis restaure son affinité.
+    Seuls ce thread et les threads qu'il crée pendant l'étape sont concernés : les pools déjà
+    créés (ex: threads intra-op de torch) gardent leur affinité. Le nombre de threads torch,
+    réglage global au processus, est appliqué une fois (torch_cpu_setup) si torch est chargé :
+    les moteurs sans torch (factice, faster-whisper) ne l'importent pas.
+    S'utilise aussi comme décorateur (@cpu_stage("transcription")).
+    """
+    settings = _CPU_SETTINGS
+    if settings is None:
+        yield
+        return
+    if "torch" in sys.modules:
+        torch_cpu_setup()
+    stage_cpus = settings["stage_cpus"].get(stage)
+    previous_cpus = None
+    if stage_cpus:
+        previous_cpus = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, stage_cpus)
+    try:
+        yield
+    finally:
+        if previous_cpus is not None:
+            os.sched_setaffinity(0, previous_cpus)
+    # torch importé pendant l'étape (chargement du modèle) : réglé avant la première inférence
+    if "torch" in sys.modules:
+        torch_cpu_setup()
+
+
+# =============================
+#   Ingestion audio
+# =============================
+
+SAMPLE_RATE = 16000
+INGEST_MODES = ("pipe", "tempfile", "mmap")
+
+
+def prepare_audio(input_path: str, temp_files: list) -> str:
+    """Retourne un WAV mono 16kHz pour input_path (extraction/conversion si besoin)."""
+    if is_video(input_path):
+        input_path = extract_audio(input_path)
+        temp_files.append(input_path)
+
+    if not is_valid_audio(input_path):
+        converted = convert_audio(input_path)
+        temp_files.append(converted)
+        input_path = converted
+
+    return input_path
+
+
+@traced("read_wav_buffer", lambda out, *a, **k: {"bytes": int(out.nbytes)})
+def read_wav_buffer(wav_path: str) -> np.ndarray:
+    """Lit un WAV PCM 16 bits mono 16kHz en tableau float32 dans [-1, 1]."""
+    with wave.open(wav_path, 'rb') as audio:
+        frames = audio.readframes(audio.getnframes())
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+@traced("decode_audio_pipe", lambda out, *a, **k: {"bytes": int(out.nbytes)})
+def decode_audio_pipe(input_path: str) -> np.ndarray:
+    """
+    Décode input_path en mono 16kHz float32 en lisant la sortie brute de ffmpeg
+    (-f f32le sur stdout) directement en mémoire, sans WAV temporaire.
+    Lève RuntimeError si ffmpeg échoue.
+    """
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", *ffmpeg_thread_args(),
+        "-i", input_path,
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "-f", "f32le", "-",
+    ]
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # stderr est vidé en parallèle pour qu'un flot d'erreurs ne bloque pas ffmpeg.
+    errors = []
+    drain = threading.Thread(target=lambda: errors.append(proc.stderr.read()), daemon=True)
+    drain.start()
+
+    buffer = bytearray()
+    try:
+        while True:
+            chunk = proc.stdout.read(1 << 20)
+            if not chunk:
+                break
+            buffer += chunk
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+        drain.join()
+
+    if returncode != 0:
+        message = b"".join(errors).decode("utf-8", "replace").strip()
+        raise RuntimeError(f"ffmpeg a echoue (code={returncode}) : {message}")
+
+    return np.frombuffer(buffer, dtype=np.float32, count=len(buffer) // 4)
+
+
+@traced("decode_audio_mmap", lambda out, *a, **k: {"bytes": int(out.nbytes)})
+def decode_audio_mmap(input_path: str, temp_files: list) -> np.ndarray:
+    """
+    Décode input_path en float32 brut dans un fichier temporaire puis le memory-mappe :
+    les pages sont lues à la demande et restent évictables, la mémoire résidente
+    ne dépend donc plus de la durée de l'enregistrement.
+    """
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".f32") as tmpfile:
+        raw_path = tmpfile.name
+    temp_files.append(raw_path)
+
+    print("Decodage audio vers un fichier memory-mappe (memoire bornee)...")
+    run_command([
+        "ffmpeg", "-nostdin", "-loglevel", "error", *ffmpeg_thread_args(),
+        "-i", input_path,
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "-f", "f32le", "-y",
+        raw_path
+    ])
+    if os.path.getsize(raw_path) < 4:
+        return np.zeros(0, dtype=np.float32)
+    # mode "c" (copy-on-write) : tableau modifiable pour torch, fichier jamais réécrit
+    return np.memmap(raw_path, dtype=np.float32, mode="c")
+
+
+def decode_audio(input_path: str, temp_files: list, ingest: str = "pipe") -> np.ndarray:
+    """
+    Décode input_path une seule fois en mono 16kHz float32.
+
+    Le même tableau est ensuite passé à Whisper et à Pyannote : plus de second
+    décodage ffmpeg dans model.transcribe() ni de relecture par torchaudio.load().
+
+    ingest="pipe" lit ffmpeg directement en mémoire ; "tempfile" (ou l'échec du pipe)
+    passe par un WAV temporaire comme extract_audio()/convert_audio() ;
+    "mmap" décode vers un fichier brut memory-mappé (cf. --max_memory).
+    """
+    audio = None
+
+    if ingest == "mmap":
+        audio = decode_audio_mmap(input_path, temp_files)
+
+    if ingest == "pipe" and not is_valid_audio(input_path):
+        print("Decodage audio via ffmpeg (pipe en memoire, sans fichier temporaire)...")
+        try:
+            audio = decode_audio_pipe(input_path)
+        except (OSError, RuntimeError) as e:
+            print("ATTENTION Decodage via pipe impossible, repli sur un WAV temporaire :")
+            print(e)
+        else:
+            # Équivalent WAV PCM 16 bits qui aurait été écrit puis relu dans /tmp.
+            avoided = 2 * len(audio) * 2
+            print(f"OK E/S disque evitees : ~{avoided / (1024 * 1024):.1f} Mo (aucun WAV temporaire)")
+
+    if audio is None:
+        wav_path = prepare_audio(input_path, temp_files)
+        try:
+            audio = read_wav_buffer(wav_path)
+        except (wave.Error, EOFError, OSError) as e:
+            print(f"ERREUR lors de la lecture audio de {wav_path} :")
+            print(e)
+            sys.exit(1)
+
+    where = "memory-mappes sur disque" if isinstance(audio, np.memmap) else "en memoire"
+    print(f"OK Audio decode une seule fois : {hhmmss(len(audio) / SAMPLE_RATE)} "
+          f"({audio.nbytes / (1024 * 1024):.1f} Mo {where})")
+    return audio
+
+
+# =============================
+#   Alignement transcription <-> speakers
+# =============================
+
+OVERLAP_THRESHOLD = 0.01
+ALIGNMENT_STRATEGIES = ("accumulate", "best_segment")
+
+
+@traced("alignment", lambda out, *a, **k: {"segments": len(out)})
+def assign_speakers(transcript_segments, speaker_segments, threshold: float = OVERLAP_THRESHOLD,
+                    strategy: str = "accumulate", unknown: str = "inconnu"):
+    """
+    Associe un speaker à chaque segment Whisper par balayage (sweep-line).
+
+    Les segments Pyannote sont triés par début et parcourus une seule fois ; un tas
+    ordonné par fin conserve les segments actifs. Coût O((N+M) log M) au lieu du
+    O(N·M) de la double boucle sur segment_score().
+
+    strategy :
+      - "accumulate"   : cumule le recouvrement par speaker et retient le speaker
+                         qui couvre la plus grande fraction du segment.
+      - "best_segment" : comportement historique, meilleur segment Pyannote unique.
+    Dans les deux cas, le score doit dépasser strictement `threshold`
+    (sémantique de OVERLAP_THRESHOLD), sinon le segment reste `unknown`.
+
+    Retourne la liste des speakers, dans l'ordre de transcript_segments.
+    """
+    if strategy not in ALIGNMENT_STRATEGIES:
+        raise ValueError(f"Strategie d'alignement inconnue : {strategy}")
+
+    transcript_segments = list(transcript_segments or [])
+    assigned = [unknown] * len(transcript_segments)
+    if not transcript_segments or not speaker_segments:
+        return assigned
+
+    # (start, end, index d'origine, speaker) ; l'index sert à départager comme l'ancienne boucle
+    speakers = sorted(
+        (float(s["start"]), float(s["end"]), idx, s["speaker"])
+        for idx, s in enumerate(speaker_segments)
+    )
+    order = sorted(range(len(transcript_segments)), key=lambda i: float(transcript_segments[i]["start"]))
+
+    active = []
+    j = 0
+    for i in order:
+        ts = float(transcript_segments[i]["start"])
+        te = float(transcript_segments[i]["end"])
+
+        while j < len(speakers) and speakers[j][0] < te:
+            ss, se, idx, spk = speakers[j]
+            heapq.heappush(active, (se, idx, ss, spk))
+            j += 1
+        # Les débuts Whisper sont croissants : un segment fini avant ts ne servira plus.
+        while active and active[0][0] <= ts:
+            heapq.heappop(active)
+
+        duration = te - ts
+        if duration <= 0:
+            continue
+
+        best_key = None
+        best_speaker = unknown
+        totals = {}
+        for se, idx, ss, spk in active:
+            overlap = min(te, se) - max(ts, ss)
+            if overlap <= 0:
+                continue
+            if strategy == "best_segment":
+                key = (overlap / duration, -idx)
+                if best_key is None or key > best_key:
+                    best_key, best_speaker = key, spk
+            else:
+                total, first_idx = totals.get(spk, (0.0, idx))
+                totals[spk] = (total + overlap, min(first_idx, idx))
+
+        if strategy == "accumulate":
+            for spk, (total, first_idx) in totals.items():
+                key = (total / duration, -first_idx)
+                if best_key is None or key > best_key:
+                    best_key, best_speaker = key, spk
+
+        if best_key is not None and best_key[0] > threshold:
+            assigned[i] = best_speaker
+
+    return assigned
+
+
+WORD_LOOKUP_BLOCK = 65536  # mots traités par bloc : mémoire bornée à speakers x bloc
+WORD_TIE_EPSILON = 1e-9    # écart (s) en dessous duquel deux recouvrements sont égaux
+
+
+class SpeakerActivity:
+    """
+    Activité cumulée de chaque speaker sur la timeline Pyannote, précalculée une fois.
+
+    Pour le speaker k, C_k(t) est le temps de parole cumulé de 0 à t (linéaire par morceaux
+    entre les bornes des segments) : le recouvrement d'un intervalle [a, b] vaut
+    C_k(b) - C_k(a). np.interp l'évalue pour tous les intervalles d'un coup, ce qui
+    garde l'attribution mot par mot rapide pour des centaines de milliers de mots.
+    Les recouvrements s'additionnent comme avec la stratégie "accumulate".
+    """
+
+    def __init__(self, speaker_segments):
+        speaker_segments = list(speaker_segments or [])
+        self.speaker_segments = speaker_segments
+        self.labels = list(dict.fromkeys(s["speaker"] for s in speaker_segments))
+        index = {label: k for k, label in enumerate(self.labels)}
+        n = len(speaker_segments)
+        starts = np.fromiter((float(s["start"]) for s in speaker_segments), dtype=np.float64, count=n)
+        ends = np.fromiter((float(s["end"]) for s in speaker_segments), dtype=np.float64, count=n)
+        codes = np.fromiter((index[s["speaker"]] for s in speaker_segments), dtype=np.int64, count=n)
+        valid = ends > starts
+        starts, ends, codes = starts[valid], ends[valid], codes[valid]
+
+        self.edges = np.unique(np.concatenate([starts, ends]))
+        self.cumulative = np.zeros((len(self.labels), len(self.edges)))
+        if len(self.edges) < 2:
+            return
+        # Nombre de segments actifs par speaker entre deux bornes consécutives
+        delta = np.zeros((len(self.labels), len(self.edges)), dtype=np.int64)
+        np.add.at(delta, (codes, np.searchsorted(self.edges, starts)), 1)
+        np.add.at(delta, (codes, np.searchsorted(self.edges, ends)), -1)
+        active = np.cumsum(delta, axis=1)[:, :-1]
+        self.cumulative[:, 1:] = np.cumsum(active * np.diff(self.edges), axis=1)
+
+    def assign(self, starts: np.ndarray, ends: np.ndarray, threshold: float = OVERLAP_THRESHOLD) -> np.ndarray:
+        """
+        Indice dans self.labels du speaker qui couvre la plus grande fraction de chaque
+        intervalle [starts[i], ends[i]], ou -1 si cette fraction ne dépasse pas threshold.
+        """
+        codes = np.full(len(starts), -1, dtype=np.int64)
+        if not self.labels or len(self.edges) < 2:
+            return codes
+        for a in range(0, len(starts), WORD_LOOKUP_BLOCK):
+            b = min(a + WORD_LOOKUP_BLOCK, len(starts))
+            s, e = starts[a:b], ends[a:b]
+            overlaps = np.stack([np.interp(e, self.edges, c) - np.interp(s, self.edges, c)
+                                 for c in self.cumulative])
+            best = overlaps.argmax(axis=0)
+            top = overlaps[best, np.arange(b - a)]
+            duration = e - s
+            score = np.divide(top, duration, out=np.zeros(b - a), where=duration > 0)
+            candidates = overlaps >= top - WORD_TIE_EPSILON
+            tied = np.flatnonzero((candidates.sum(axis=0) > 1) & (score > threshold))
+            if len(tied):
+                best[tied] = self._break_ties(s[tied], e[tied])
+            codes[a:b] = np.where(score > threshold, best, -1)
+        return codes
+
+    def _break_ties(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        Égalités (mot entièrement dans de la parole superposée) : les intervalles repassent
+        par assign_speakers(), qui ne retient que les segments Pyannote recouvrant le mot et
+        fait gagner le speaker du premier d'entre eux. Les égalités suivent ainsi exactement
+        l'attribution par segment.
+        """
+        index = {label: k for k, label in enumerate(self.labels)}
+        # Seuil négatif : le score de ces intervalles dépasse déjà le seuil demandé
+        winners = assign_speakers(
+            [{"start": a, "end": b} for a, b in zip(starts.tolist(), ends.tolist())],
+            self.speaker_segments, threshold=-1.0, unknown=None,
+        )
+        return np.array([index[w] for w in winners], dtype=np.int64)
+
+
+def has_word_timestamps(transcript_segments) -> bool:
+    return any(seg.get("words") for seg in transcript_segments or [])
+
+
+@traced("word_alignment", lambda out, *a, **k: {"segments": len(out)})
+def assign_word_speakers(transcript_segments, speaker_segments, threshold: float = OVERLAP_THRESHOLD,
+                         strategy: str = "accumulate", unknown: str = "inconnu"):
+    """
+    Attribution des speakers mot par mot (horodatages "words" de Whisper) puis redécoupage
+    du texte aux changements de speaker.
+
+    Un mot sans speaker (silence entre deux tours, mot de durée nulle) prend celui du mot
+    précédent du même segment, sinon du suivant. Les segments sans horodatage par mot,
+    ou dont aucun mot n'est attribué, gardent l'attribution par segment (assign_speakers).
+    Un segment sans changement de speaker est conservé tel quel (bornes et texte).
+
+    Retourne la liste des segments {"start", "end", "speaker", "text"}, dans l'ordre de
+    transcript_segments, prête pour iter_runs() / merge_by_runs().
+    """
+    transcript_segments = list(transcript_segments or [])
+    activity = SpeakerActivity(speaker_segments)
+
+    words = [w for seg in transcript_segments for w in (seg.get("words") or [])]
+    n = len(words)
+    counts = np.fromiter((len(seg.get("words") or []) for seg in transcript_segments),
+                         dtype=np.int64, count=len(transcript_segments))
+    seg_ids = np.repeat(np.arange(len(transcript_segments)), counts)
+    starts = np.fromiter((float(w["start"]) for w in words), dtype=np.float64, count=n)
+    ends = np.fromiter((float(w["end"]) for w in words), dtype=np.float64, count=n)
+    codes = activity.assign(starts, ends, threshold)
+
+    if n:
+        # Mots non attribués : report du précédent puis du suivant, sans sortir du segment
+        positions = np.arange(n)
+        prev = np.maximum.accumulate(np.where(codes >= 0, positions, -1))
+        use_prev = (codes < 0) & (prev >= 0)
+        use_prev[use_prev] = seg_ids[prev[use_prev]] == seg_ids[use_prev]
+        nxt = np.minimum.accumulate(np.where(codes >= 0, positions, n)[::-1])[::-1]
+        use_next = (codes < 0) & ~use_prev & (nxt < n)
+        use_next[use_next] = seg_ids[np.minimum(nxt[use_next], n - 1)] == seg_ids[use_next]
+        codes = np.where(use_prev, codes[np.maximum(prev, 0)],
+                         np.where(use_next, codes[np.minimum(nxt, n - 1)], codes))
+
+    # Débuts des tours : changement de speaker ou de segment
+    turn_starts = np.flatnonzero(np.concatenate(
+        [[True], (codes[1:] != codes[:-1]) | (seg_ids[1:] != seg_ids[:-1])]
+    )) if n else np.zeros(0, dtype=np.int64)
+    turn_ends = np.append(turn_starts[1:], n)
+    turns_per_segment = np.bincount(seg_ids[turn_starts], minlength=len(transcript_segments))
+    first_turn = np.cumsum(turns_per_segment) - turns_per_segment
+
+    # Segments sans mot ou sans aucun mot attribué : repli sur l'attribution par segment
+    single_code = np.full(len(transcript_segments), -1, dtype=np.int64)
+    has_turn = turns_per_segment > 0
+    single_code[has_turn] = codes[turn_starts[first_turn[has_turn]]]
+    fallback = np.flatnonzero((turns_per_segment <= 1) & (single_code < 0))
+    fallback_speakers = dict(zip(fallback.tolist(), assign_speakers(
+        [transcript_segments[i] for i in fallback], speaker_segments,
+        threshold=threshold, strategy=strategy, unknown=unknown,
+    )))
+
+    labels = activity.labels
+    out = []
+    turn = 0
+    for i, (seg, n_turns) in enumerate(zip(transcript_segments, turns_per_segment)):
+        if n_turns <= 1:
+            speaker = labels[single_code[i]] if single_code[i] >= 0 else fallback_speakers[i]
+            out.append({"start": float(seg["start"]), "end": float(seg["end"]),
+                        "speaker": speaker, "text": seg.get("text", "")})
+            turn += n_turns
+            continue
+        for k in range(turn, turn + n_turns):
+            a, b = turn_starts[k], turn_ends[k]
+            code = codes[a]
+            out.append({
+                "start": float(seg["start"]) if k == turn else float(starts[a]),
+                "end": float(seg["end"]) if k == turn + n_turns - 1 else float(ends[b - 1]),
+                "speaker": labels[code] if code >= 0 else unknown,
+                "text": "".join(w.get("word", "") for w in words[a:b]).strip(),
+            })
+        turn += n_turns
+    return out
+
+
 # =========================
-#   Sorties JSON / SRT / VTT
+#   Sorties TXT / JSON / JSONL / SRT / VTT (écriture en flux)
 # =========================
 
+STDOUT_PATH = "-"
+OUTPUT_FORMATS = ("txt", "jsonl", "srt", "vtt")
+
+# Flux réel de la sortie standard quand les messages d'état sont redirigés vers stderr (sortie "-")
+_STDOUT_STREAM = None
+
+
+@contextlib.contextmanager
+def stdout_reserved_for(output_file: str):
+    """Avec la sortie '-', les messages d'état passent sur stderr pour ne pas polluer le flux."""
+    global _STDOUT_STREAM
+    if output_file != STDOUT_PATH:
+        yield
+        return
+    _STDOUT_STREAM = sys.stdout
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            yield
+    finally:
+        _STDOUT_STREAM = None
+
+
+def check_output_args(args, output_file: str):
+    """Les sorties annexes (.json, .srt...) sont dérivées du nom du fichier de sortie : impossible avec '-'."""
+    if output_file != STDOUT_PATH:
+        return
+    extras = [f"--{k}" for k in ("json", "jsonl", "srt", "vtt") if getattr(args, k, False)]
+    if extras:
+        print(f"ERREUR Options incompatibles avec la sortie '-' : {', '.join(extras)} "
+              f"(utiliser --output_format pour choisir le format ecrit sur la sortie standard).")
+        sys.exit(1)
+
+
+def output_label(path: str) -> str:
+    return "sortie standard" if path == STDOUT_PATH else path
+
+
 def json_path_for_output(output_file: str) -> str:
     if output_file.lower().endswith(".json"):
         return output_file
@@ -172,8 +1262,10 @@ def write_json_if_requested(args, output_file: str, payload: dict):
     if not getattr(args, "json", False):
         return
     out_json = json_path_for_output(output_file)
-    with open(out_json, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+    with trace_span("write_json") as span:
+        with open(out_json, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        span.update(_file_bytes(out_json))
     print(f"\nOK JSON sauvegarde dans : {out_json}")
 
 
@@ -215,68 +1307,258 @@ def format_vtt_timestamp(seconds: float) -> str:
     return f"{hh:02d}:{mm:02d}:{ss:02d}.{ms:03d}"
 
 
-def write_srt(segments, out_path: str, include_speaker: bool = True):
+def segment_record(seg, mode: str) -> dict:
+    """Segment tel qu'écrit en JSON / JSONL (mêmes champs que les tableaux du fichier JSON)."""
+    record = {}
+    if mode != "transcription_only":
+        record["speaker"] = seg["speaker"]
+    start, end = float(seg["start"]), float(seg["end"])
+    record.update({"start": start, "end": end, "start_hhmmss": hhmmss(start), "end_hhmmss": hhmmss(end)})
+    if mode != "diarization_only":
+        record["text"] = (seg.get("text", "") or "").strip()
+    return record
+
+
+class SegmentWriter:
     """
-    segments: liste de dicts {"start","end","text", "speaker"?}
+    Écriture incrémentale d'une sortie : un segment {"start", "end", "speaker", "text"} à la fois,
+    sans liste intermédiaire. path == "-" écrit sur la sortie standard.
     """
-    with open(out_path, "w", encoding="utf-8") as f:
-        idx = 1
-        for seg in segments:
-            text = (seg.get("text", "") or "").strip()
-            if not text:
-                continue
-            start = format_srt_timestamp(seg.get("start", 0.0))
-            end = format_srt_timestamp(seg.get("end", 0.0))
-            if include_speaker and seg.get("speaker") not in (None, "", "inconnu"):
-                text = f"{seg['speaker']}: {text}"
-            f.write(f"{idx}\n")
-            f.write(f"{start} --> {end}\n")
-            f.write(f"{text}\n\n")
-            idx += 1
-    print(f"\nOK SRT sauvegarde dans : {out_path}")
 
+    label = "Sortie"
 
-def write_vtt(segments, out_path: str, include_speaker: bool = True):
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write("WEBVTT\n\n")
-        for seg in segments:
-            text = (seg.get("text", "") or "").strip()
-            if not text:
-                continue
-            start = format_vtt_timestamp(seg.get("start", 0.0))
-            end = format_vtt_timestamp(seg.get("end", 0.0))
-            if include_speaker and seg.get("speaker") not in (None, "", "inconnu"):
-                text = f"{seg['speaker']}: {text}"
-            f.write(f"{start} --> {end}\n")
-            f.write(f"{text}\n\n")
-    print(f"\nOK VTT sauvegarde dans : {out_path}")
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self.f = (_STDOUT_STREAM or sys.stdout) if path == STDOUT_PATH else open(path, "w", encoding="utf-8")
+        self.begin()
 
+    def begin(self):
+        pass
 
-def write_subtitles_if_requested(args, output_file: str, segments, include_speaker: bool = True):
-    """
-    Génère .srt et/ou .vtt si demandé via CLI.
-    """
-    if getattr(args, "srt", False):
-        out_srt = replace_ext(output_file, ".srt")
-        write_srt(segments, out_srt, include_speaker=include_speaker)
-    if getattr(args, "vtt", False):
-        out_vtt = replace_ext(output_file, ".vtt")
-        write_vtt(segments, out_vtt, include_speaker=include_speaker)
+    def write(self, seg):
+        if self._write(seg) is not False:
+            self.count += 1
 
+    def _write(self, seg):
+        raise NotImplementedError
 
-# =============================
-#   Gestion du token HF
-# =============================
+    def end(self):
+        pass
 
-def get_hf_token(args) -> str:
-    env_token = os.environ.get("HF_TOKEN") or os.environ.get("HUGGINGFACE_TOKEN")
-    if env_token:
-        return env_token.strip()
+    def close(self) -> int:
+        try:
+            self.end()
+        finally:
+            if self.path == STDOUT_PATH:
+                self.f.flush()
+            else:
+                self.f.close()
+        return self.count
 
-    if args.hf_token:
-        return args.hf_token.strip()
+    def __enter__(self):
+        return self
 
-    if args.ask_token and not sys.stdin.isatty():
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TxtWriter(SegmentWriter):
+    """Fichier texte : en-tête, préambule (temps de parole...) puis une ligne par segment."""
+
+    def __init__(self, path: str, preamble: str, format_line, empty_line: str = None):
+        self.preamble = preamble
+        self.format_line = format_line
+        self.empty_line = empty_line
+        super().__init__(path)
+
+    def begin(self):
+        self.f.write(self.preamble)
+
+    def _write(self, seg):
+        self.f.write(self.format_line(seg) + "\n")
+
+    def end(self):
+        if not self.count and self.empty_line:
+            self.f.write(self.empty_line + "\n")
+
+
+class SrtWriter(SegmentWriter):
+    label = "SRT"
+
+    def __init__(self, path: str, include_speaker: bool = True):
+        self.include_speaker = include_speaker
+        super().__init__(path)
+
+    def cue_text(self, seg):
+        text = (seg.get("text", "") or "").strip()
+        if text and self.include_speaker and seg.get("speaker") not in (None, "", "inconnu"):
+            text = f"{seg['speaker']}: {text}"
+        return text
+
+    def _write(self, seg):
+        text = self.cue_text(seg)
+        if not text:
+            return False
+        start = format_srt_timestamp(seg.get("start", 0.0))
+        end = format_srt_timestamp(seg.get("end", 0.0))
+        self.f.write(f"{self.count + 1}\n")
+        self.f.write(f"{start} --> {end}\n")
+        self.f.write(f"{text}\n\n")
+
+
+class VttWriter(SrtWriter):
+    label = "VTT"
+
+    def begin(self):
+        self.f.write("WEBVTT\n\n")
+
+    def _write(self, seg):
+        text = self.cue_text(seg)
+        if not text:
+            return False
+        start = format_vtt_timestamp(seg.get("start", 0.0))
+        end = format_vtt_timestamp(seg.get("end", 0.0))
+        self.f.write(f"{start} --> {end}\n")
+        self.f.write(f"{text}\n\n")
+
+
+class JsonlWriter(SegmentWriter):
+    """JSON Lines : un objet par segment et par ligne (jq, pandas.read_json(lines=True)...)."""
+
+    label = "JSONL"
+
+    def __init__(self, path: str, mode: str):
+        self.mode = mode
+        super().__init__(path)
+
+    def _write(self, seg):
+        self.f.write(json.dumps(segment_record(seg, self.mode), ensure_ascii=False) + "\n")
+
+
+class JsonWriter(SegmentWriter):
+    """
+    Fichier JSON écrit au fil de l'eau : les champs fixes (meta, speakers) d'abord, puis le
+    tableau de segments élément par élément. Même contenu et même mise en forme que json.dump(indent=2).
+    """
+
+    label = "JSON"
+
+    def __init__(self, path: str, mode: str, fields: dict, list_key: str):
+        self.mode = mode
+        head = json.dumps({**fields, list_key: []}, ensure_ascii=False, indent=2)
+        self.prefix = head[:head.rindex("[]")] + "["
+        super().__init__(path)
+
+    def begin(self):
+        self.f.write(self.prefix)
+
+    def _write(self, seg):
+        item = json.dumps(segment_record(seg, self.mode), ensure_ascii=False, indent=2)
+        self.f.write(("," if self.count else "") + "\n    " + item.replace("\n", "\n    "))
+
+    def end(self):
+        self.f.write("\n  ]\n}" if self.count else "]\n}")
+
+
+def write_segments(segments, writers, first_label: str = None):
+    """
+    Distribue chaque segment à toutes les sorties en une seule passe, puis les ferme.
+    first_label : message pour la sortie principale (writers[0]), ex: "Transcription sauvegardee".
+    """
+    with trace_span("write_outputs") as span:
+        try:
+            for seg in segments:
+                for w in writers:
+                    w.write(seg)
+        finally:
+            for w in writers:
+                w.close()
+        span.update(segments=writers[0].count if writers else 0,
+                    bytes=sum(_file_bytes(w.path)["bytes"] for w in writers))
+
+    for i, w in enumerate(writers):
+        if i == 0 and first_label:
+            print(f"\nOK {first_label} dans : {output_label(w.path)}")
+        else:
+            print(f"\nOK {w.label} sauvegarde dans : {output_label(w.path)}")
+
+
+@traced("write_srt", lambda count, segments, out_path, **k: {"segments": count, **_file_bytes(out_path)})
+def write_srt(segments, out_path: str, include_speaker: bool = True):
+    """
+    segments: itérable de dicts {"start","end","text", "speaker"?}
+    """
+    with SrtWriter(out_path, include_speaker=include_speaker) as w:
+        for seg in segments:
+            w.write(seg)
+    print(f"\nOK SRT sauvegarde dans : {output_label(out_path)}")
+    return w.count
+
+
+@traced("write_vtt", lambda count, segments, out_path, **k: {"segments": count, **_file_bytes(out_path)})
+def write_vtt(segments, out_path: str, include_speaker: bool = True):
+    with VttWriter(out_path, include_speaker=include_speaker) as w:
+        for seg in segments:
+            w.write(seg)
+    print(f"\nOK VTT sauvegarde dans : {output_label(out_path)}")
+    return w.count
+
+
+def build_writers(args, output_file: str, mode: str, preamble: str, format_line, empty_line: str,
+                  json_fields: dict, json_list_key: str):
+    """
+    Sorties demandées : la sortie principale (format --output_format, TXT par défaut) en premier,
+    puis les fichiers annexes --json / --jsonl / --srt / --vtt.
+    """
+    include_speaker = not args.subs_no_speaker
+    subtitles = mode != "diarization_only"
+
+    def make(kind: str, path: str):
+        if kind == "txt":
+            return TxtWriter(path, preamble, format_line, empty_line)
+        if kind == "jsonl":
+            return JsonlWriter(path, mode)
+        if kind == "json":
+            return JsonWriter(path, mode, json_fields, json_list_key)
+        return (SrtWriter if kind == "srt" else VttWriter)(path, include_speaker=include_speaker)
+
+    main_format = getattr(args, "output_format", "txt")
+    if main_format in ("srt", "vtt") and not subtitles:
+        print(f"ATTENTION --output_format {main_format} impossible en mode diarisation seule : TXT ecrit a la place.")
+        main_format = "txt"
+
+    writers = [make(main_format, output_file)]
+    extras = [
+        ("srt", replace_ext(output_file, ".srt"), args.srt and subtitles),
+        ("vtt", replace_ext(output_file, ".vtt"), args.vtt and subtitles),
+        ("json", json_path_for_output(output_file), getattr(args, "json", False)),
+        ("jsonl", replace_ext(output_file, ".jsonl"), getattr(args, "jsonl", False)),
+    ]
+    try:
+        for kind, path, wanted in extras:
+            if wanted and path != output_file:
+                writers.append(make(kind, path))
+    except OSError:
+        for w in writers:
+            w.close()
+        raise
+    return writers
+
+
+# =============================
+#   Gestion du token HF
+# =============================
+
+def get_hf_token(args) -> str:
+    env_token = os.environ.get("HF_TOKEN") or os.environ.get("HUGGINGFACE_TOKEN")
+    if env_token:
+        return env_token.strip()
+
+    if args.hf_token:
+        return args.hf_token.strip()
+
+    if args.ask_token and not sys.stdin.isatty():
         print("ERREUR --ask_token demande mais impossible de lire depuis stdin (mode non interactif).")
         sys.exit(1)
 
@@ -299,7 +1581,20 @@ def get_hf_token(args) -> str:
 #   Transcription Whisper
 # =============================
 
-def load_whisper_model(whisper_model_choice: str):
+QUANTIZE_MODES = ("int8",)
+QUANTIZED_FORMAT_VERSION = 2
+
+
+@traced("load_whisper_model")
+@cpu_stage("transcription")
+def load_whisper_model(whisper_model_choice: str, quantize: str = None, cache_dir: str = None):
+    """
+    quantize : "int8" pour une inférence CPU quantifiée (cf. load_quantized_whisper) ;
+    cache_dir : racine du cache où est gardé le modèle quantifié (par défaut : default_cache_dir()).
+    """
+    import torch
+    import whisper
+
     # Priorité: CUDA > MPS > CPU
     if torch.cuda.is_available():
         device = "cuda"
@@ -308,479 +1603,3503 @@ def load_whisper_model(whisper_model_choice: str):
     else:
         device = "cpu"
 
+    if quantize:
+        if device != "cpu":
+            print(f"ATTENTION --quantize {quantize} : inference sur CPU (la quantification dynamique "
+                  f"torch n'existe que sur CPU, {device} disponible mais non utilise).")
+        print(f"\nChargement du modele Whisper '{whisper_model_choice}' quantifie {quantize} (device=cpu)...")
+        return load_quantized_whisper(whisper_model_choice, quantize, cache_dir), "cpu"
+
     print(f"\nChargement du modele Whisper '{whisper_model_choice}' (device={device})...")
     model = whisper.load_model(whisper_model_choice, device=device)
     return model, device
 
 
-def run_whisper_transcription(model, audio_path: str, language: str = None, device: str = None):
-    print("Transcription en cours... (cela peut prendre un moment)")
-    transcribe_kwargs = {}
-    if language:
-        transcribe_kwargs["language"] = language
-        print(f"Langue forcee pour Whisper : {language}")
-
-    # Important: fp16 uniquement sur CUDA (plus stable sur CPU/MPS)
-    if device is None:
-        try:
-            device = str(next(model.parameters()).device)
-        except Exception:
-            device = "cpu"
-    transcribe_kwargs["fp16"] = (device == "cuda")
+def quantized_model_path(cache_dir: str, whisper_model_choice: str, quantize: str) -> str:
+    """Un fichier par modèle, mode et versions de torch/whisper (un changement invalide le cache)."""
+    name = (f"whisper-{whisper_model_choice}-{quantize}-v{QUANTIZED_FORMAT_VERSION}"
+            f"-torch{_package_version('torch')}-whisper{_package_version('openai-whisper')}.pt")
+    return os.path.join(cache_dir or default_cache_dir(), "models", name)
 
-    result = model.transcribe(audio_path, **transcribe_kwargs)
-    return result
 
+def quantize_whisper_int8(model):
+    """
+    Quantification dynamique int8 des couches linéaires (attention et MLP, l'essentiel du calcul) :
+    poids stockés en int8, activations quantifiées à la volée. Les convolutions, embeddings et
+    normalisations restent en fp32.
+    """
+    import torch
+    from whisper.model import Linear as WhisperLinear
 
-# =============================
-#   Diarisation Pyannote
-# =============================
+    # whisper.model.Linear convertit seulement ses poids au dtype de l'entrée : en fp32 sur CPU
+    # c'est un nn.Linear, seule classe que quantize_dynamic sait remplacer.
+    for module in model.modules():
+        if type(module) is WhisperLinear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
 
-def prepare_safe_globals():
-    try:
-        add_safe_globals([Specifications, Problem, Resolution])
-    except Exception as e:
-        print("ATTENTION Impossible d'ajouter Specifications/Problem/Resolution aux safe_globals :", e)
 
+def _cache_file_trusted(path: str) -> bool:
+    """Fichier de cache appartenant à l'utilisateur courant (POSIX) : sinon il n'est pas relu."""
+    if not hasattr(os, "getuid"):
+        return True
+    return os.stat(path).st_uid == os.getuid()
 
-def run_diarization(audio_path: str, hf_token: str):
-    print("\nDiarisation avec Pyannote en cours...")
 
-    prepare_safe_globals()
+def _build_quantized_whisper(whisper_model_choice: str, payload: dict):
+    """Squelette Whisper (dimensions du modèle, sans checkpoint fp32) quantifié puis rempli des poids int8."""
+    import whisper
+    from whisper.model import ModelDimensions, Whisper
 
-    try:
-        pipeline = Pipeline.from_pretrained(
-            "pyannote/speaker-diarization-community-1",
-            token=hf_token,
-        )
-    except Exception as e:
-        print("ERREUR lors du chargement de la pipeline pyannote/speaker-diarization-community-1 :")
-        print(e)
-        sys.exit(1)
+    model = Whisper(ModelDimensions(**payload["dims"]))
+    quantize_whisper_int8(model)
+    model.load_state_dict(payload["state_dict"])
+    alignment_heads = getattr(whisper, "_ALIGNMENT_HEADS", {}).get(whisper_model_choice)
+    if alignment_heads is not None:
+        model.set_alignment_heads(alignment_heads)
+    return model.eval()
 
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    try:
-        pipeline.to(device)
-    except Exception:
-        pass
 
-    try:
-        waveform, sample_rate = torchaudio.load(audio_path)
-    except Exception as e:
-        print("ERREUR lors du chargement audio avec torchaudio :")
-        print(e)
-        sys.exit(1)
+@traced("load_quantized_whisper")
+def load_quantized_whisper(whisper_model_choice: str, quantize: str = "int8", cache_dir: str = None):
+    """
+    Modèle Whisper CPU quantifié : relu depuis le cache disque s'il existe, sinon chargé en fp32,
+    quantifié puis enregistré pour les prochains chargements.
+    Le cache ne contient que les dimensions et les poids (state_dict), relus avec
+    weights_only=True : aucun objet Python arbitraire n'est désérialisé.
+    """
+    import dataclasses
+
+    import torch
+    import whisper
+
+    if quantize not in QUANTIZE_MODES:
+        raise ValueError(f"Quantification inconnue : {quantize}")
+    path = quantized_model_path(cache_dir, whisper_model_choice, quantize)
+    if os.path.exists(path):
+        if not _cache_file_trusted(path):
+            print(f"ATTENTION Modele quantifie ignore ({path}) : fichier n'appartenant pas a l'utilisateur "
+                  f"courant. Nouvelle quantification.")
+        else:
+            try:
+                payload = torch.load(path, map_location="cpu", weights_only=True)
+                model = _build_quantized_whisper(whisper_model_choice, payload)
+                print(f"OK Modele quantifie {quantize} charge depuis le cache ({os.path.getsize(path) / 1e6:.0f} Mo).")
+                return model
+            except Exception as e:
+                print(f"ATTENTION Modele quantifie illisible ({path}) : {e}. Nouvelle quantification.")
+
+    started = time.perf_counter()
+    model = whisper.load_model(whisper_model_choice, device="cpu")
+    fp32_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+    quantize_whisper_int8(model)
+    print(f"OK Modele quantifie {quantize} en {time.perf_counter() - started:.1f}s.")
 
     try:
-        waveform = waveform.to(device)
-    except Exception:
-        pass
-
-    diarization = pipeline({"waveform": waveform, "sample_rate": sample_rate})
-
-    speaker_segments = []
-
-    annotation = getattr(diarization, "speaker_diarization", diarization)
-
-    for segment, _, speaker in annotation.itertracks(yield_label=True):
-        speaker_segments.append({
-            "speaker": speaker,
-            "start": segment.start,
-            "end": segment.end,
-        })
-
-    print(f"OK {len(speaker_segments)} segments de speakers detectes.")
-    return speaker_segments, waveform, sample_rate
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        torch.save({"dims": dataclasses.asdict(model.dims), "state_dict": model.state_dict()}, tmp_path)
+        os.replace(tmp_path, path)
+        print(f"OK Modele quantifie enregistre : {path} ({os.path.getsize(path) / 1e6:.0f} Mo, "
+              f"poids fp32 : {fp32_bytes / 1e6:.0f} Mo)")
+    except OSError as e:
+        print(f"ATTENTION Impossible d'enregistrer le modele quantifie ({path}) : {e}")
+    return model
+
+
+def ensure_quantized_whisper(whisper_model_choice: str, quantize: str, cache_dir: str = None):
+    """Prépare le modèle quantifié en cache (une fois, avant de démarrer plusieurs processus)."""
+    if not os.path.exists(quantized_model_path(cache_dir, whisper_model_choice, quantize)):
+        load_quantized_whisper(whisper_model_choice, quantize, cache_dir)
+        release_memory()
+
+
+@traced("run_whisper_transcription", lambda out, *a, **k: {"segments": len(out["segments"])})
+@cpu_stage("transcription")
+def run_whisper_transcription(model, audio, language: str = None, device: str = None,
+                              word_timestamps: bool = False):
+    """
+    model : moteur de transcription chargé (cf. load_transcription_backend) ou modèle
+    openai-whisper déjà chargé ; audio : chemin de fichier ou tableau float32 mono 16kHz
+    (cf. decode_audio). Retourne {"language", "segments"} (cf. TranscriptionBackend).
+    """
+    if not isinstance(model, TranscriptionBackend):
+        model = WhisperBackend.from_model(model, device)
+    print("Transcription en cours... (cela peut prendre un moment)")
+    if language:
+        print(f"Langue forcee pour {model.label} : {language}")
+    return model.transcribe(audio, language=language, word_timestamps=word_timestamps)
 
 
 # =============================
-#   Parsing des arguments
+#   Moteurs de transcription (--backend)
 # =============================
 
-def parse_args():
-    parser = argparse.ArgumentParser(
-        description="Transcrire et/ou diariser un fichier audio ou vidéo."
-    )
-    parser.add_argument("input_path", help="Chemin du fichier audio ou vidéo à traiter")
-    parser.add_argument("output_file", help="Chemin du fichier texte de sortie")
+DEFAULT_BACKEND = "whisper"
 
-    parser.add_argument(
-        "--whisper_model",
-        default="turbo",
-        choices=["tiny", "base", "small", "medium", "large", "turbo"],
-        help="Modèle Whisper à utiliser (par défaut : turbo)"
-    )
-    parser.add_argument(
-        "--keep_temp",
-        action="store_true",
-        help="Ne pas supprimer les fichiers temporaires"
-    )
-    parser.add_argument(
-        "--hf_token",
-        help="Token Hugging Face passé directement en ligne de commande"
-    )
-    parser.add_argument(
-        "--ask_token",
-        action="store_true",
-        help="Forcer la demande interactive du token Hugging Face si absent"
-    )
-    parser.add_argument(
-        "--language",
-        help="Forcer la langue pour Whisper (ex: fr, en, de). Si omis, Whisper auto-détecte."
-    )
 
-    parser.add_argument(
-        "--json",
-        action="store_true",
-        help="Écrire en plus un fichier JSON à côté du fichier texte (output_file.json)."
-    )
+class TranscriptionBackend:
+    """
+    Interface d'un moteur de transcription : load() puis transcribe(), qui retourne le format
+    commun {"language": "fr", "segments": [{"id", "start", "end", "text", "words"?}]} où
+    "words" (si word_timestamps) est une liste de {"word", "start", "end", "probability"}.
 
-    # === AJOUT : options SRT / VTT ===
-    parser.add_argument(
-        "--srt",
-        action="store_true",
-        help="Écrire en plus un fichier .srt (même base que output_file)."
-    )
-    parser.add_argument(
-        "--vtt",
-        action="store_true",
-        help="Écrire en plus un fichier .vtt (même base que output_file)."
-    )
-    parser.add_argument(
-        "--subs_no_speaker",
-        action="store_true",
-        help="Ne pas préfixer les sous-titres avec le speaker (utile pour un SRT/VTT plus 'classique')."
-    )
+    Un nouveau moteur (ex: ONNX Runtime) est une sous-classe enregistrée dans
+    TRANSCRIPTION_BACKENDS : requires liste les modules Python nécessaires, package le paquet
+    dont la version entre dans la clé de cache, capabilities ce que le moteur sait faire.
+    """
 
-    mode_group = parser.add_mutually_exclusive_group()
-    mode_group.add_argument(
-        "--transcription_only",
-        action="store_true",
-        help="Ne faire que la transcription (pas de diarisation)."
-    )
-    mode_group.add_argument(
-        "--diarization_only",
-        action="store_true",
-        help="Ne faire que la diarisation (pas de transcription Whisper)."
-    )
+    name = None
+    label = None
+    package = None
+    requires = ()
+    capabilities = {
+        "word_timestamps": False,   # horodatages par mot (--word_speakers)
+        "quantize": (),             # modes --quantize acceptés
+        "prompt": False,            # texte de contexte (mode live)
+        "long_form": False,         # chunks parallèles (--long_form)
+        "devices": ("cpu",),
+    }
 
-    return parser.parse_args()
+    def __init__(self, model_name: str, quantize: str = None, cache_dir: str = None):
+        self.model_name = model_name
+        self.quantize = quantize
+        self.cache_dir = cache_dir
+        self.model = None
+        self.device = "cpu"
+
+    @classmethod
+    def missing_requirements(cls) -> list:
+        return [m for m in cls.requires if importlib.util.find_spec(m) is None]
+
+    @classmethod
+    def version(cls) -> str:
+        return _package_version(cls.package) if cls.package else "none"
+
+    def load(self):
+        """Charge le modèle ; retourne le moteur lui-même."""
+        raise NotImplementedError
+
+    def transcribe(self, audio, language: str = None, word_timestamps: bool = False,
+                   prompt: str = None, streaming: bool = False) -> dict:
+        """
+        audio : chemin ou tableau float32 mono 16kHz. prompt : texte précédent (ignoré si le
+        moteur ne le gère pas). streaming : fenêtre courte d'un flux live (pas de barre de
+        progression ni de conditionnement sur le texte déjà produit dans la fenêtre).
+        """
+        raise NotImplementedError
+
+
+class WhisperBackend(TranscriptionBackend):
+    """openai-whisper (PyTorch) : moteur par défaut, CUDA > MPS > CPU, quantification int8 sur CPU."""
+
+    name = "whisper"
+    label = "Whisper"
+    package = "openai-whisper"
+    requires = ("whisper", "torch")
+    capabilities = {
+        "word_timestamps": True,
+        "quantize": QUANTIZE_MODES,
+        "prompt": True,
+        "long_form": True,
+        "devices": ("cuda", "mps", "cpu"),
+    }
 
+    @classmethod
+    def from_model(cls, model, device: str = None):
+        """Enveloppe un modèle openai-whisper déjà chargé."""
+        backend = cls(None)
+        backend.model = model
+        if device is None:
+            try:
+                device = str(next(model.parameters()).device)
+            except Exception:
+                device = "cpu"
+        backend.device = device
+        return backend
+
+    def load(self):
+        self.model, self.device = load_whisper_model(self.model_name, quantize=self.quantize,
+                                                     cache_dir=self.cache_dir)
+        return self
+
+    def transcribe(self, audio, language=None, word_timestamps=False, prompt=None, streaming=False):
+        # Important: fp16 uniquement sur CUDA (plus stable sur CPU/MPS)
+        kwargs = {"fp16": self.device == "cuda"}
+        if language:
+            kwargs["language"] = language
+        if word_timestamps:
+            kwargs["word_timestamps"] = True
+        if prompt:
+            kwargs["initial_prompt"] = prompt
+        if streaming:
+            kwargs.update(condition_on_previous_text=False, verbose=None)
+        elif _PROGRESS is not None:
+            install_whisper_progress_hook()
+        return self.model.transcribe(audio, **kwargs)
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """
+    faster-whisper (CTranslate2) : mêmes modèles Whisper convertis, nettement plus rapide sur CPU.
+    --quantize int8 choisit le calcul int8 de CTranslate2 (pas de conversion à mettre en cache).
+    """
 
-# =============================
-#   Fonction principale
-# =============================
+    name = "faster-whisper"
+    label = "faster-whisper"
+    package = "faster-whisper"
+    requires = ("faster_whisper",)
+    capabilities = {
+        "word_timestamps": True,
+        "quantize": ("int8",),
+        "prompt": True,
+        "long_form": False,
+        "devices": ("cuda", "cpu"),
+    }
 
-def main():
-    args = parse_args()
+    @traced("load_faster_whisper")
+    @cpu_stage("transcription")
+    def load(self):
+        import ctranslate2
+        from faster_whisper import WhisperModel
 
-    execution_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+        if self.quantize:
+            compute_type = self.quantize
+        else:
+            compute_type = "float16" if self.device == "cuda" else "float32"
+        print(f"\nChargement du modele faster-whisper '{self.model_name}' "
+              f"(device={self.device}, calcul={compute_type})...")
+        self.model = WhisperModel(self.model_name, device=self.device, compute_type=compute_type,
+                                  cpu_threads=cpu_budget() if _CPU_SETTINGS is not None else 0,
+                                  download_root=os.path.join(self.cache_dir, "models") if self.cache_dir else None)
+        return self
+
+    def transcribe(self, audio, language=None, word_timestamps=False, prompt=None, streaming=False):
+        segments_iter, info = self.model.transcribe(
+            audio, language=language, word_timestamps=word_timestamps,
+            initial_prompt=prompt or None, condition_on_previous_text=not streaming,
+        )
+        segments = []
+        # Les segments sont produits au fil du décodage : l'avancement est publié au passage.
+        for seg in segments_iter:
+            item = {"id": len(segments), "start": seg.start, "end": seg.end, "text": seg.text}
+            if word_timestamps:
+                item["words"] = [{"word": w.word, "start": w.start, "end": w.end, "probability": w.probability}
+                                 for w in (seg.words or [])]
+            segments.append(item)
+            if not streaming:
+                report_progress("transcription", min(seg.end, info.duration), info.duration,
+                                segments=len(segments))
+        return {"language": info.language, "segments": segments}
+
+
+class FakeBackend(TranscriptionBackend):
+    """
+    Moteur factice sans modèle ni dépendance (tests, benchmarks) : un segment par zone voisée
+    (découpée à 8 s max), texte "mot mot ..." proportionnel à la durée, mots répartis à égalité.
+    """
 
-    input_path = args.input_path
-    output_file = args.output_file
-    whisper_model_choice = args.whisper_model
-    keep_temp = args.keep_temp
-    language = args.language
+    name = "fake"
+    label = "moteur factice"
+    voiced_dbfs = -34.0  # RMS 0.02
+    capabilities = {
+        "word_timestamps": True,
+        "quantize": (),
+        "prompt": False,
+        "long_form": False,
+        "devices": ("cpu",),
+    }
 
-    transcription_only = args.transcription_only
-    diarization_only = args.diarization_only
+    def load(self):
+        print("\nMoteur de transcription factice (aucun modele charge).")
+        return self
 
-    if not os.path.exists(input_path):
-        print(f"ATTENTION Fichier introuvable : {input_path}")
+    def transcribe(self, audio, language=None, word_timestamps=False, prompt=None, streaming=False):
+        if not isinstance(audio, np.ndarray):
+            audio = decode_audio_pipe(audio)
+        segments = []
+        for a, b in level_runs(frame_levels(audio), self.voiced_dbfs):
+            start, end = a * VAD_FRAME_SECONDS, b * VAD_FRAME_SECONDS
+            while start < end:
+                stop = min(end, start + 8.0)
+                n_words = max(1, int((stop - start) * 2.5))
+                item = {"id": len(segments), "start": start, "end": stop,
+                        "text": " " + " ".join(["mot"] * n_words)}
+                if word_timestamps:
+                    edges = np.linspace(start, stop, n_words + 1)
+                    item["words"] = [{"word": " mot", "start": float(a), "end": float(b), "probability": 1.0}
+                                     for a, b in zip(edges[:-1], edges[1:])]
+                segments.append(item)
+                start = stop
+        return {"language": language or "fr", "segments": segments}
+
+
+TRANSCRIPTION_BACKENDS = {
+    backend.name: backend for backend in (WhisperBackend, FasterWhisperBackend, FakeBackend)
+}
+
+
+def require_backend(name: str):
+    """Classe du moteur `name` ; quitte en erreur si ses modules Python ne sont pas installés."""
+    cls = TRANSCRIPTION_BACKENDS[name]
+    missing = cls.missing_requirements()
+    if missing:
+        print(f"ERREUR --backend {name} : module(s) Python introuvable(s) : {', '.join(missing)} "
+              f"(pip install {cls.package}).")
+        sys.exit(1)
+    return cls
+
+
+def check_backend_args(args):
+    """Options du job compatibles avec les capacités du moteur --backend (avant tout chargement)."""
+    name = getattr(args, "backend", DEFAULT_BACKEND)
+    caps = require_backend(name).capabilities
+    problems = []
+    if getattr(args, "quantize", None) and args.quantize not in caps["quantize"]:
+        problems.append(f"--quantize {args.quantize}")
+    if getattr(args, "long_form", False) and not caps["long_form"]:
+        problems.append("--long_form")
+    if getattr(args, "word_speakers", False) and not caps["word_timestamps"]:
+        problems.append("--word_speakers (horodatages par mot)")
+    if problems:
+        print(f"ERREUR --backend {name} ne gere pas : {', '.join(problems)}.")
         sys.exit(1)
 
-    original_input_path = input_path
-    temp_files = []
-
-    source_name = os.path.basename(original_input_path)
-    language_label = language if language else "auto-détection"
-    header = (
-        "Metadonnees de transcription\n"
-        f"- Fichier source : {source_name}\n"
-        f"- Modèle Whisper : {whisper_model_choice}\n"
-        f"- Langue Whisper : {language_label}\n"
-        f"- Date d'exécution : {execution_time}\n"
-        "\n"
-        "----------------------------------------\n\n"
-    )
 
-    json_meta = {
-        "source_file": source_name,
-        "source_path": original_input_path,
-        "whisper_model": whisper_model_choice,
-        "whisper_language": language_label,
-        "execution_time": execution_time,
-    }
+def load_transcription_backend(name: str, whisper_model_choice: str, quantize: str = None,
+                               cache_dir: str = None) -> TranscriptionBackend:
+    cls = require_backend(name)
+    return cls(whisper_model_choice, quantize=quantize, cache_dir=cache_dir).load()
 
-    if is_video(input_path):
-        input_path = extract_audio(input_path)
-        temp_files.append(input_path)
 
-    if not is_valid_audio(input_path):
-        converted = convert_audio(input_path)
-        temp_files.append(converted)
-        input_path = converted
+def load_job_backend(args) -> TranscriptionBackend:
+    """Moteur selon les options d'un job : --backend, modèle, --quantize et --cache_dir."""
+    return load_transcription_backend(getattr(args, "backend", DEFAULT_BACKEND), args.whisper_model,
+                                      quantize=getattr(args, "quantize", None),
+                                      cache_dir=getattr(args, "cache_dir", None))
 
-    audio_total_duration = get_audio_duration_seconds(input_path)
 
-    transcript_segments = None
-    speaker_segments = []
-    waveform = None
-    sample_rate = None
-
-    if not diarization_only:
-        model, whisper_device = load_whisper_model(whisper_model_choice)
-        result = run_whisper_transcription(model, input_path, language=language, device=whisper_device)
-        transcript_segments = result["segments"]
-
-    if not transcription_only:
-        hf_token = get_hf_token(args)
-        speaker_segments, waveform, sample_rate = run_diarization(input_path, hf_token)
-
-    include_speaker_in_subs = not args.subs_no_speaker
-
-    # =========================
-    #   MODE TRANSCRIPTION SEULE
-    # =========================
-    if transcription_only and not diarization_only:
-        print("\nMode : TRANSCRIPTION SEULE (pas de diarisation).")
-
-        print("\nApercu de la transcription :")
-        for seg in (transcript_segments or [])[:10]:
-            print(f"[{format_time(seg['start'])} - {format_time(seg['end'])}] {seg['text']}")
-        if transcript_segments and len(transcript_segments) > 10:
-            print("... (voir fichier pour le reste)")
-
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(header)
-            f.write("Transcription (sans diarisation) :\n\n")
-            if not transcript_segments:
-                f.write("(Aucun segment de transcription.)\n")
-            else:
-                for t in transcript_segments:
-                    f.write(f"[{hhmmss(float(t['start']))}-{hhmmss(float(t['end']))}] {t.get('text', '').strip()}\n")
+def backend_model_label(args) -> str:
+    """Modèle affiché dans les en-têtes de sortie : 'small', ou 'small (faster-whisper)' hors moteur par défaut."""
+    name = getattr(args, "backend", DEFAULT_BACKEND)
+    return args.whisper_model if name == DEFAULT_BACKEND else f"{args.whisper_model} ({name})"
 
-        print(f"\nOK Transcription sauvegardee dans : {output_file}")
 
-        # Sous-titres (basés sur Whisper)
-        subs_segments = [
-            {"start": float(t["start"]), "end": float(t["end"]), "text": (t.get("text", "") or "").strip(), "speaker": None}
-            for t in (transcript_segments or [])
-        ]
-        write_subtitles_if_requested(args, output_file, subs_segments, include_speaker=include_speaker_in_subs)
-
-        json_payload = {
-            "meta": {**json_meta, "mode": "transcription_only", "audio_duration_seconds": audio_total_duration},
-            "transcription": [
-                {
-                    "start": float(t["start"]),
-                    "end": float(t["end"]),
-                    "start_hhmmss": hhmmss(float(t["start"])),
-                    "end_hhmmss": hhmmss(float(t["end"])),
-                    "text": (t.get("text", "") or "").strip(),
-                }
-                for t in (transcript_segments or [])
-            ],
-        }
-        write_json_if_requested(args, output_file, json_payload)
+# =============================
+#   Détection de parole (--vad)
+# =============================
 
-        print(f"\nResume global :")
-        print(f"- Duree totale de l'audio analyse : {str(datetime.timedelta(seconds=int(audio_total_duration)))}")
-        print(f"- Nombre de segments de transcription : {len(transcript_segments) if transcript_segments else 0}")
+DEFAULT_VAD_THRESHOLD_DB = 12.0
+DEFAULT_VAD_MIN_SILENCE = 1.0
+VAD_FRAME_SECONDS = 0.03
+VAD_PADDING_SECONDS = 0.2
+VAD_MIN_SPEECH_SECONDS = 0.25
+VAD_FLOOR_DBFS = -55.0
+# En dessous de cette part de silence, découper coûte plus (copie, raccords) que cela ne rapporte.
+VAD_MIN_SKIPPED_RATIO = 0.05
 
-    # =========================
-    #   MODE DIARISATION SEULE
-    # =========================
-    elif diarization_only and not transcription_only:
-        print("\nMode : DIARISATION SEULE (pas de transcription Whisper).")
 
-        speaker_durations = {}
-        for s in speaker_segments:
-            speaker_durations[s["speaker"]] = speaker_durations.get(s["speaker"], 0.0) + (s["end"] - s["start"])
+def frame_levels(audio: np.ndarray, frame_seconds: float = VAD_FRAME_SECONDS) -> np.ndarray:
+    """Niveau RMS en dB (0 dB = pleine échelle) de chaque trame complète de frame_seconds."""
+    frame = max(1, int(frame_seconds * SAMPLE_RATE))
+    n = len(audio) // frame
+    frames = np.asarray(audio[:n * frame]).reshape(n, frame)
+    return 10.0 * np.log10(np.mean(np.square(frames, dtype=np.float64), axis=1) + 1e-20)
 
-        speaker_durations_formatted = {
-            speaker: str(datetime.timedelta(seconds=int(duration)))
-            for speaker, duration in speaker_durations.items()
-        }
 
-        print("\nTemps de parole par speaker :")
-        for speaker, duration in speaker_durations_formatted.items():
-            print(f"Speaker {speaker}: {duration}")
-
-        print("\nApercu des segments de diarisation (sans texte) :")
-        for seg in speaker_segments[:10]:
-            print(f"[{hhmmss(seg['start'])}-{hhmmss(seg['end'])}] {seg['speaker']}")
-        if len(speaker_segments) > 10:
-            print("... (voir fichier pour le reste)")
-
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(header)
-            f.write("Temps de parole par speaker :\n")
-            for speaker, duration in speaker_durations_formatted.items():
-                f.write(f"Speaker {speaker}: {duration}\n")
-
-            f.write("\nSegments de diarisation (sans transcription) :\n\n")
-            if not speaker_segments:
-                f.write("(Aucun segment de diarisation.)\n")
-            else:
-                for s in speaker_segments:
-                    f.write(f"[{hhmmss(s['start'])}-{hhmmss(s['end'])}] {s['speaker']}\n")
+def level_runs(levels: np.ndarray, threshold_db: float) -> np.ndarray:
+    """Suites de trames au-dessus de threshold_db : tableau (n, 2) de (début, fin) en trames."""
+    voiced = np.concatenate(([False], levels > threshold_db, [False]))
+    edges = np.flatnonzero(voiced[1:] != voiced[:-1])
+    return edges.reshape(-1, 2)
 
-        print(f"\nOK Diarisation sauvegardee dans : {output_file}")
 
-        # Pas de SRT/VTT possible ici (pas de texte)
-        if args.srt or args.vtt:
-            print("\nATTENTION SRT/VTT non generes en mode diarisation seule (pas de transcription/texte).")
+def speech_regions(audio: np.ndarray, threshold_db: float = DEFAULT_VAD_THRESHOLD_DB,
+                   min_silence: float = DEFAULT_VAD_MIN_SILENCE) -> np.ndarray:
+    """
+    Zones de parole par énergie : une trame est voisée si son niveau RMS dépasse le bruit de
+    fond (10e centile des trames) de threshold_db, et au moins VAD_FLOOR_DBFS. Sans partie
+    calme (écart 10e-90e centile sous threshold_db), seul VAD_FLOOR_DBFS s'applique.
+    Les silences plus courts que min_silence sont gardés (pauses entre phrases), les zones
+    trop courtes ignorées et chaque zone élargie de VAD_PADDING_SECONDS.
+    Retourne un tableau (n, 2) de (début, fin) en échantillons.
+    """
+    frame = int(VAD_FRAME_SECONDS * SAMPLE_RATE)
+    level = frame_levels(audio)
+    if len(level) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    floor, loud = np.percentile(level, [10, 90])
+    threshold = max(floor + threshold_db, VAD_FLOOR_DBFS) if loud - floor > threshold_db else VAD_FLOOR_DBFS
+
+    runs = level_runs(level, threshold)
+    starts, ends = runs[:, 0], runs[:, 1]
+    if len(starts) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    # Pauses courtes comblées, puis zones trop brèves écartées
+    keep = np.concatenate(([True], (starts[1:] - ends[:-1]) * VAD_FRAME_SECONDS >= min_silence))
+    starts, ends = starts[keep], np.concatenate((ends[np.flatnonzero(keep)[1:] - 1], ends[-1:]))
+    long_enough = (ends - starts) * VAD_FRAME_SECONDS >= VAD_MIN_SPEECH_SECONDS
+    starts, ends = starts[long_enough], ends[long_enough]
+    if len(starts) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    pad = int(VAD_PADDING_SECONDS * SAMPLE_RATE)
+    starts = np.maximum(starts * frame - pad, 0)
+    ends = np.minimum(ends * frame + pad, len(audio))
+    # Les marges peuvent faire se chevaucher deux zones voisines
+    keep = np.concatenate(([True], starts[1:] > ends[:-1]))
+    ends = np.concatenate((ends[np.flatnonzero(keep)[1:] - 1], ends[-1:]))
+    return np.stack((starts[keep], ends), axis=1).astype(np.int64)
+
+
+def vad_compact(audio: np.ndarray, regions: np.ndarray):
+    """
+    Audio réduit aux zones de parole mises bout à bout, et table de correspondance
+    (n, 2) : début de chaque zone en secondes dans l'audio réduit et dans l'original.
+    """
+    lengths = regions[:, 1] - regions[:, 0]
+    compact_starts = np.cumsum(lengths) - lengths
+    timeline = np.stack((compact_starts, regions[:, 0]), axis=1) / SAMPLE_RATE
+    compact = np.concatenate([audio[a:b] for a, b in regions]) if len(regions) else audio[:0]
+    return np.ascontiguousarray(compact, dtype=np.float32), timeline
 
-        json_payload = {
-            "meta": {**json_meta, "mode": "diarization_only", "audio_duration_seconds": audio_total_duration},
-            "speakers": [
-                {"speaker": spk, "duration_seconds": float(dur), "duration_hhmmss": speaker_durations_formatted[spk]}
-                for spk, dur in speaker_durations.items()
-            ],
-            "segments": [
-                {
-                    "speaker": s["speaker"],
-                    "start": float(s["start"]),
-                    "end": float(s["end"]),
-                    "start_hhmmss": hhmmss(float(s["start"])),
-                    "end_hhmmss": hhmmss(float(s["end"])),
-                }
-                for s in (speaker_segments or [])
-            ],
-        }
-        write_json_if_requested(args, output_file, json_payload)
 
-        total_speech_duration = sum(speaker_durations.values())
-        average_duration = total_speech_duration / len(speaker_durations) if speaker_durations else 0.0
+def remap_timestamps(times: np.ndarray, timeline: np.ndarray, ends: bool = False) -> np.ndarray:
+    """
+    Temps de l'audio réduit -> temps de l'audio original. Un instant situé pile sur un raccord
+    appartient à la zone suivante s'il commence un segment, à la précédente s'il le termine.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    side = "left" if ends else "right"
+    idx = np.clip(np.searchsorted(timeline[:, 0], times, side=side) - 1, 0, len(timeline) - 1)
+    return times - timeline[idx, 0] + timeline[idx, 1]
+
+
+def remap_transcription(result: dict, timeline: np.ndarray) -> dict:
+    """Replace les horodatages (segments et mots) d'une transcription de l'audio réduit sur l'original."""
+    segments = result["segments"]
+    words = [w for s in segments for w in s.get("words") or []]
+    for items in (segments, words):
+        if not items:
+            continue
+        starts = remap_timestamps([x["start"] for x in items], timeline)
+        ends = remap_timestamps([x["end"] for x in items], timeline, ends=True)
+        for x, start, end in zip(items, starts.tolist(), ends.tolist()):
+            x["start"], x["end"] = start, max(start, end)
+    return result
 
-        print(f"\nResume global :")
-        print(f"- Duree totale de l'audio analyse : {str(datetime.timedelta(seconds=int(audio_total_duration)))}")
-        print(f"- Somme des temps de parole (tous speakers cumules) : {str(datetime.timedelta(seconds=int(total_speech_duration)))}")
-        print(f"- Nombre de speakers : {len(speaker_durations)}")
-        print(f"- Duree moyenne par speaker : {str(datetime.timedelta(seconds=int(average_duration)))}")
 
-    # =========================
-    #   MODE COMPLET
-    # =========================
+def run_vad(audio: np.ndarray, threshold_db: float = DEFAULT_VAD_THRESHOLD_DB,
+            min_silence: float = DEFAULT_VAD_MIN_SILENCE):
+    """
+    Pré-passe VAD avant transcription. Retourne (audio à transcrire, table de correspondance
+    ou None si l'audio est transcrit en entier, secondes ignorées).
+    """
+    started = time.perf_counter()
+    regions = speech_regions(audio, threshold_db, min_silence)
+    total = len(audio) / SAMPLE_RATE
+    speech = float(np.sum(regions[:, 1] - regions[:, 0])) / SAMPLE_RATE
+    skipped = total - speech
+    elapsed = time.perf_counter() - started
+    print(f"VAD : {hhmmss(speech)} de parole en {len(regions)} zone(s) sur {hhmmss(total)} "
+          f"({hhmmss(skipped)} de silence, {100.0 * skipped / total if total else 0.0:.0f}%) en {elapsed:.2f}s")
+    if len(regions) and skipped < VAD_MIN_SKIPPED_RATIO * total:
+        print("VAD : peu de silence, audio transcrit en entier.")
+        return audio, None, 0.0
+    compact, timeline = vad_compact(audio, regions)
+    if len(regions):
+        print(f"VAD : transcription de {hhmmss(speech)} au lieu de {hhmmss(total)} "
+              f"(acceleration attendue ~x{total / speech:.1f}).")
     else:
-        print("\nMode : TRANSCRIPTION + DIARISATION.")
+        print("ATTENTION VAD : aucune parole detectee (ajuster --vad_threshold).")
+    return compact, timeline, skipped
 
-        formatted_output = []
-        assigned_speakers = []
 
-        OVERLAP_THRESHOLD = 0.01
+# =============================
+#   Transcription longue durée (chunks parallèles)
+# =============================
 
-        print("\nAssociation des segments transcription <-> speakers...")
-        for t_segment in tqdm(transcript_segments, desc="Matching segments"):
-            best_speaker = "inconnu"
-            best_score = 0.0
-
-            for s_segment in speaker_segments:
-                score = segment_score(t_segment, s_segment)
-                if score > best_score and score > OVERLAP_THRESHOLD:
-                    best_score = score
-                    best_speaker = s_segment["speaker"]
-
-            start_time = format_time(t_segment["start"])
-            end_time = format_time(t_segment["end"])
-            text = t_segment["text"]
-
-            formatted_output.append(
-                f"[{start_time} - {end_time}] Speaker {best_speaker}: {text}"
-            )
-            assigned_speakers.append(best_speaker)
+DEFAULT_CHUNK_SECONDS = 300.0
+DEFAULT_CHUNK_THREADS = 2
 
-        speaker_durations = {}
-        for s in speaker_segments:
-            speaker_durations[s["speaker"]] = speaker_durations.get(s["speaker"], 0.0) + (s["end"] - s["start"])
+# Modèle chargé une fois par processus worker (cf. _chunk_worker_init)
+_CHUNK_WORKER = {}
+# Pools réutilisés d'un fichier à l'autre (mode batch) : clé (modèle, workers, threads, quantification)
+_CHUNK_POOLS = {}
 
-        speaker_durations_formatted = {
-            speaker: str(datetime.timedelta(seconds=int(duration)))
-            for speaker, duration in speaker_durations.items()
-        }
 
-        print("\nTemps de parole par speaker :")
-        for speaker, duration in speaker_durations_formatted.items():
-            print(f"Speaker {speaker}: {duration}")
+def find_chunk_boundaries(audio: np.ndarray, chunk_seconds: float, search_seconds: float = None):
+    """
+    Découpe audio en morceaux d'environ chunk_seconds, en coupant au creux d'énergie
+    (silence / pause) le plus proche de chaque frontière cible.
+    Seules les fenêtres de recherche autour des frontières sont analysées.
+    Retourne une liste de (début, fin) en échantillons.
+    """
+    n = len(audio)
+    chunk = int(chunk_seconds * SAMPLE_RATE)
+    if chunk <= 0 or n <= chunk:
+        return [(0, n)]
+
+    if search_seconds is None:
+        search_seconds = min(10.0, chunk_seconds / 4)
+    search = int(search_seconds * SAMPLE_RATE)
+    frame = int(VAD_FRAME_SECONDS * SAMPLE_RATE)
+
+    boundaries = []
+    start = 0
+    while n - start > chunk:
+        target = start + chunk
+        lo = max(start + frame, target - search)
+        hi = min(n - frame, target + search)
+        levels = frame_levels(audio[lo:hi])
+        if len(levels) == 0:
+            cut = target
+        else:
+            cut = lo + int(np.argmin(levels)) * frame + frame // 2
+        boundaries.append((start, cut))
+        start = cut
+    boundaries.append((start, n))
+    return boundaries
+
+
+def _chunk_worker_init(whisper_model_choice: str, threads: int, quantize: str = None, cache_dir: str = None):
+    import torch
+    import whisper
+
+    torch.set_num_threads(max(1, threads))
+    if quantize:
+        with contextlib.redirect_stdout(io.StringIO()):
+            _CHUNK_WORKER["model"] = load_quantized_whisper(whisper_model_choice, quantize, cache_dir)
+    else:
+        _CHUNK_WORKER["model"] = whisper.load_model(whisper_model_choice, device="cpu")
+
+
+def _chunk_worker_detect_language(audio: np.ndarray) -> str:
+    import whisper
+
+    model = _CHUNK_WORKER["model"]
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=model.dims.n_mels).to(model.device)
+    _, probs = model.detect_language(mel)
+    return max(probs, key=probs.get)
+
+
+def _chunk_worker_transcribe(audio: np.ndarray, offset: float, language: str, word_timestamps: bool = False):
+    started = time.perf_counter()
+    kwargs = {"word_timestamps": True} if word_timestamps else {}
+    result = _CHUNK_WORKER["model"].transcribe(audio, language=language, fp16=False, **kwargs)
+    chunk_end = offset + len(audio) / SAMPLE_RATE
+    segments = []
+    for seg in result["segments"]:
+        seg = dict(seg)
+        seg["start"] = offset + float(seg["start"])
+        seg["end"] = min(chunk_end, offset + float(seg["end"]))
+        if seg.get("words"):
+            # Comme les segments : pas de mot qui déborde sur le morceau suivant
+            seg["words"] = [
+                {**word,
+                 "start": min(chunk_end, offset + float(word["start"])),
+                 "end": min(chunk_end, offset + float(word["end"]))}
+                for word in seg["words"]
+            ]
+        segments.append(seg)
+    return segments, time.perf_counter() - started
+
+
+def get_chunk_pool(whisper_model_choice: str, workers: int, threads: int, quantize: str = None,
+                   cache_dir: str = None):
+    key = (whisper_model_choice, workers, threads, quantize)
+    pool = _CHUNK_POOLS.get(key)
+    if pool is None:
+        if quantize:
+            ensure_quantized_whisper(whisper_model_choice, quantize, cache_dir)
+        print(f"\nDemarrage de {workers} worker(s) Whisper ({threads} thread(s) chacun, "
+              f"modele '{whisper_model_choice}'{' ' + quantize if quantize else ''} sur CPU)...")
+        pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            # spawn : pas de fork d'un processus qui a déjà initialisé torch
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_chunk_worker_init,
+            initargs=(whisper_model_choice, threads, quantize, cache_dir),
+        )
+        _CHUNK_POOLS[key] = pool
+    return pool
+
+
+@traced("run_long_form_transcription", lambda out, *a, **k: {"segments": len(out["segments"])})
+def run_long_form_transcription(audio: np.ndarray, whisper_model_choice: str, language: str = None,
+                                workers: int = None, threads: int = DEFAULT_CHUNK_THREADS,
+                                chunk_seconds: float = DEFAULT_CHUNK_SECONDS, word_timestamps: bool = False,
+                                quantize: str = None, cache_dir: str = None):
+    """
+    Transcrit un long enregistrement en parallèle : découpage aux pauses, un modèle
+    Whisper par processus worker, puis recollage des segments avec les horodatages
+    globaux. Retourne un dict au format de model.transcribe() ("segments", "language").
+    """
+    threads = max(1, threads)
+    if not workers:
+        workers = max(1, cpu_budget() // threads)
+
+    bounds = find_chunk_boundaries(audio, chunk_seconds)
+    workers = min(workers, len(bounds))
+    print(f"Transcription longue duree : {len(bounds)} morceau(x) d'environ {hhmmss(chunk_seconds)} "
+          f"sur {workers} worker(s)")
+
+    pool = get_chunk_pool(whisper_model_choice, workers, threads, quantize, cache_dir)
+    started = time.perf_counter()
+
+    # Langue détectée une seule fois pour que tous les morceaux soient cohérents.
+    if not language:
+        language = pool.submit(_chunk_worker_detect_language, audio[:30 * SAMPLE_RATE]).result()
+        print(f"Langue detectee : {language}")
+    else:
+        print(f"Langue forcee pour Whisper : {language}")
+
+    futures = [
+        pool.submit(_chunk_worker_transcribe, audio[a:b], a / SAMPLE_RATE, language, word_timestamps)
+        for a, b in bounds
+    ]
+    segments = []
+    chunk_seconds_total = 0.0
+    for idx, future in enumerate(futures, 1):
+        chunk_segments, chunk_elapsed = future.result()
+        segments.extend(chunk_segments)
+        chunk_seconds_total += chunk_elapsed
+        report_progress("transcription", bounds[idx - 1][1], len(audio), segments=len(segments))
+        print(f"  morceau {idx}/{len(futures)} : {len(chunk_segments)} segment(s) en {chunk_elapsed:.1f}s")
+
+    segments.sort(key=lambda seg: (seg["start"], seg["end"]))
+    for idx, seg in enumerate(segments):
+        seg["id"] = idx
+
+    wall = time.perf_counter() - started
+    speedup = chunk_seconds_total / wall if wall > 0 else 0.0
+    print(f"OK Transcription longue duree : {len(segments)} segments en {wall:.1f}s "
+          f"(somme des morceaux : {chunk_seconds_total:.1f}s, acceleration estimee vs appel unique : x{speedup:.1f})")
+
+    return {"segments": segments, "language": language}
+
+
+# =============================
+#   Diarisation Pyannote
+# =============================
+
+def prepare_safe_globals():
+    from torch.serialization import add_safe_globals
+    from pyannote.audio.core.task import Specifications, Problem, Resolution
+
+    try:
+        add_safe_globals([Specifications, Problem, Resolution])
+    except Exception as e:
+        print("ATTENTION Impossible d'ajouter Specifications/Problem/Resolution aux safe_globals :", e)
+
+
+DIARIZATION_MODEL = "pyannote/speaker-diarization-community-1"
+
+
+def diarization_device():
+    import torch
+
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+
+@cpu_stage("diarization")
+def load_diarization_pipeline(hf_token: str):
+    """Charge la pipeline Pyannote (une seule fois, réutilisable pour plusieurs fichiers)."""
+    from pyannote.audio import Pipeline
+
+    print(f"\nChargement de la pipeline {DIARIZATION_MODEL}...")
+
+    prepare_safe_globals()
+
+    try:
+        with trace_span("Pipeline.from_pretrained"):
+            pipeline = Pipeline.from_pretrained(
+                DIARIZATION_MODEL,
+                token=hf_token,
+            )
+    except Exception as e:
+        print(f"ERREUR lors du chargement de la pipeline {DIARIZATION_MODEL} :")
+        print(e)
+        sys.exit(1)
+
+    try:
+        pipeline.to(diarization_device())
+    except Exception:
+        pass
+
+    return pipeline
+
+
+@traced("run_diarization", lambda out, *a, **k: {"segments": len(out)})
+@cpu_stage("diarization")
+def run_diarization(audio, hf_token: str = None, pipeline=None, bounded_memory: bool = False):
+    """
+    Diarise `audio` : chemin de fichier ou tableau float32 mono 16kHz (cf. decode_audio),
+    partagé sans copie avec la transcription.
+    Si `pipeline` est fourni (mode batch), il est réutilisé au lieu d'être rechargé.
+
+    bounded_memory : le signal reste sur CPU (éventuellement memory-mappé) et Pyannote
+    n'en lit que des fenêtres ; seuls les lots de calcul passent sur le device.
+    Le waveform est libéré dès la fin de la diarisation (seuls les segments sont retournés).
+    """
+    if pipeline is None:
+        pipeline = load_diarization_pipeline(hf_token)
+
+    print("\nDiarisation avec Pyannote en cours...")
+
+    # Une pipeline Pyannote attend un tenseur torch ; une autre pipeline (ex: substitut
+    # hors-ligne de whisperpyannote_bench.py) reçoit le tableau numpy, sans dépendre de torch.
+    pyannote_audio = sys.modules.get("pyannote.audio")
+    torch_input = pyannote_audio is not None and isinstance(pipeline, pyannote_audio.Pipeline)
+
+    if isinstance(audio, np.ndarray) and not torch_input:
+        waveform, sample_rate = audio.reshape(1, -1), SAMPLE_RATE
+    elif isinstance(audio, np.ndarray):
+        import torch
+
+        waveform, sample_rate = torch.from_numpy(audio).unsqueeze(0), SAMPLE_RATE
+    else:
+        import torchaudio
+
+        try:
+            waveform, sample_rate = torchaudio.load(audio)
+        except Exception as e:
+            print("ERREUR lors du chargement audio avec torchaudio :")
+            print(e)
+            sys.exit(1)
+
+    if torch_input and not bounded_memory:
+        try:
+            waveform = waveform.to(diarization_device())
+        except Exception:
+            pass
+
+    pipeline_kwargs = {"hook": pyannote_progress_hook} if _PROGRESS is not None else {}
+    diarization = pipeline({"waveform": waveform, "sample_rate": sample_rate}, **pipeline_kwargs)
+    del waveform
+
+    speaker_segments = []
+
+    annotation = getattr(diarization, "speaker_diarization", diarization)
+
+    for segment, _, speaker in annotation.itertracks(yield_label=True):
+        speaker_segments.append({
+            "speaker": speaker,
+            "start": segment.start,
+            "end": segment.end,
+        })
+
+    del diarization, annotation
+    release_memory()
+
+    print(f"OK {len(speaker_segments)} segments de speakers detectes.")
+    return speaker_segments
+
+
+# =============================
+#   Cache des résultats
+# =============================
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_MAX_MB = 2048
+# Une éviction redescend à cette fraction de la taille max, pour ne pas reparcourir le cache
+# à chaque écriture une fois la limite atteinte.
+CACHE_EVICT_TARGET = 0.9
+
+
+def default_cache_dir() -> str:
+    env_dir = os.environ.get("WHISPERPYANNOTE_CACHE_DIR")
+    if env_dir:
+        return env_dir
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "whisperpyannote")
+
+
+def _package_version(name: str) -> str:
+    try:
+        return importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def audio_fingerprint(audio: np.ndarray) -> str:
+    """Empreinte SHA-256 de l'audio décodé (indépendante du conteneur/nom du fichier source)."""
+    return hashlib.sha256(np.ascontiguousarray(audio).data).hexdigest()
+
+
+def cache_key(kind: str, **params) -> str:
+    """Clé de cache : hash de l'empreinte audio + des paramètres qui influencent le résultat."""
+    payload = json.dumps({"kind": kind, "format": CACHE_FORMAT_VERSION, **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def transcription_cache_key(fingerprint: str, whisper_model_choice: str, language: str = None,
+                            backend: str = DEFAULT_BACKEND, **options) -> str:
+    """
+    Clé liée à la version du paquet du moteur `backend` (openai-whisper pour le moteur par défaut).
+    options : paramètres supplémentaires qui changent le résultat (ex: découpage longue durée).
+    """
+    engine = TRANSCRIPTION_BACKENDS[backend]
+    if backend == DEFAULT_BACKEND:
+        options["whisper_version"] = engine.version()
+    else:
+        options["backend"] = f"{engine.name}-{engine.version()}"
+    return cache_key(
+        "transcription",
+        audio=fingerprint,
+        model=whisper_model_choice,
+        language=language or "auto",
+        **options,
+    )
+
+
+def diarization_cache_key(fingerprint: str) -> str:
+    return cache_key(
+        "diarization",
+        audio=fingerprint,
+        pipeline=DIARIZATION_MODEL,
+        pyannote_version=_package_version("pyannote.audio"),
+    )
+
+
+def _cache_path(cache_dir: str, kind: str, key: str) -> str:
+    return os.path.join(cache_dir, kind, key[:2], key + ".json")
+
+
+@traced("cache_load", lambda out, *a, **k: {"segments": len(out) if out else 0})
+def cache_load(cache_dir: str, kind: str, key: str):
+    """Retourne les segments en cache (ou None). Un accès rafraîchit la date LRU de l'entrée."""
+    path = _cache_path(cache_dir, kind, key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+    return entry.get("segments")
+
+
+# Taille totale des entrées par dossier de cache : mesurée une fois (première écriture du processus),
+# puis tenue à jour à chaque écriture ; le dossier n'est reparcouru que pour une éviction.
+_CACHE_SIZES = {}
+_CACHE_SIZES_LOCK = threading.Lock()
+
+
+@traced("cache_store", lambda _, cache_dir, kind, key, segments, *a, **k: {"segments": len(segments)})
+def cache_store(cache_dir: str, kind: str, key: str, segments, max_bytes: int):
+    path = _cache_path(cache_dir, kind, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            old_size = os.stat(path).st_size  # entrée remplacée
+        except OSError:
+            old_size = 0
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            # default=float : valeurs numpy éventuelles dans les segments Whisper
+            json.dump({"kind": kind, "key": key, "segments": segments}, f, ensure_ascii=False, default=float)
+        os.replace(tmp_path, path)
+        size = os.stat(path).st_size
+    except OSError as e:
+        print(f"ATTENTION Impossible d'ecrire dans le cache ({path}) : {e}")
+        return
+
+    with _CACHE_SIZES_LOCK:
+        if cache_dir in _CACHE_SIZES:
+            _CACHE_SIZES[cache_dir] += size - old_size
+        else:
+            _CACHE_SIZES[cache_dir] = sum(entry[1] for entry in _cache_entries(cache_dir))
+        if _CACHE_SIZES[cache_dir] > max_bytes:
+            _CACHE_SIZES[cache_dir] = cache_evict(cache_dir, max_bytes, int(max_bytes * CACHE_EVICT_TARGET))
+
+
+def _cache_entries(cache_dir: str):
+    """(date d'accès LRU, taille, chemin) de chaque entrée du cache."""
+    entries = []
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+
+def cache_evict(cache_dir: str, max_bytes: int, target_bytes: int = None) -> int:
+    """
+    Si le cache dépasse max_bytes, supprime les entrées les moins récemment utilisées
+    jusqu'à repasser sous target_bytes (max_bytes par défaut).
+    Retourne la taille restante du cache (octets).
+    """
+    entries = _cache_entries(cache_dir)
+    total = sum(entry[1] for entry in entries)
+    if total <= max_bytes:
+        return total
+    if target_bytes is None:
+        target_bytes = max_bytes
+
+    for _, size, path in sorted(entries):
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+        if total <= target_bytes:
+            break
+    return total
+
+
+# =============================
+#   Artefacts de reprise (--resume)
+# =============================
+
+ARTIFACTS_FORMAT_VERSION = 1
+ARTIFACTS_MANIFEST = "manifest.json"
+
+# Transcription et diarisation d'un même job peuvent se terminer en même temps (--parallel_stages, --scheduler)
+_ARTIFACTS_LOCK = threading.Lock()
+
+
+def artifacts_dir_for_output(output_file: str) -> str:
+    """Dossier des artefacts intermédiaires, à côté de la sortie : reunion.txt -> reunion.artifacts/"""
+    return os.path.splitext(output_file)[0] + ".artifacts"
+
+
+def load_artifacts_manifest(artifacts_dir: str) -> dict:
+    try:
+        with open(os.path.join(artifacts_dir, ARTIFACTS_MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = None
+    if not isinstance(manifest, dict) or manifest.get("format") != ARTIFACTS_FORMAT_VERSION:
+        manifest = {"format": ARTIFACTS_FORMAT_VERSION, "stages": {}}
+    return manifest
+
+
+def _write_json_atomic(path: str, payload):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2, default=float)
+    os.replace(tmp_path, path)
+
+
+def source_reference(input_path: str) -> dict:
+    """Identité du fichier source : si elle ne change pas, l'audio décodé non plus."""
+    st = os.stat(input_path)
+    return {"path": os.path.abspath(input_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def ingest_artifact_key(source: dict) -> str:
+    return cache_key("ingest", sample_rate=SAMPLE_RATE, **source)
+
+
+def alignment_artifact_key(transcription_key: str, diarization_key: str, args) -> str:
+    return cache_key(
+        "alignment",
+        transcription=transcription_key,
+        diarization=diarization_key,
+        strategy=args.alignment,
+        threshold=args.overlap_threshold,
+        **({"word_speakers": True} if args.word_speakers else {}),
+    )
+
+
+def write_rttm(speaker_segments, out_path: str, uri: str):
+    """Segments de diarisation au format RTTM (lisible par pyannote.metrics, dscore...)."""
+    uri = re.sub(r"\s+", "_", uri) or "audio"
+    with open(out_path, "w", encoding="utf-8") as f:
+        for s in speaker_segments:
+            duration = float(s["end"]) - float(s["start"])
+            f.write(f"SPEAKER {uri} 1 {float(s['start']):.3f} {duration:.3f} <NA> <NA> {s['speaker']} <NA> <NA>\n")
+
+
+def artifact_load(job, stage: str, key: str):
+    """
+    Contenu de l'artefact de `stage` si le manifeste l'a enregistré avec la même clé
+    (mêmes entrées et options), sinon None. Utilisé seulement avec --resume.
+    """
+    artifacts_dir = job["artifacts_dir"]
+    if artifacts_dir is None or not getattr(job["args"], "resume", False):
+        return None
+    with _ARTIFACTS_LOCK:
+        entry = job["manifest"]["stages"].get(stage)
+    if not entry or entry.get("key") != key:
+        return None
+    try:
+        with open(os.path.join(artifacts_dir, entry["file"]), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def artifact_store(job, stage: str, key: str, file_name: str, payload, params: dict = None, extra_files=()):
+    """Écrit l'artefact d'une étape terminée puis met à jour le manifeste (sur disque aussitôt)."""
+    artifacts_dir = job["artifacts_dir"]
+    if artifacts_dir is None:
+        return
+    try:
+        os.makedirs(artifacts_dir, exist_ok=True)
+        if payload is not None:
+            _write_json_atomic(os.path.join(artifacts_dir, file_name), payload)
+        with _ARTIFACTS_LOCK:
+            manifest = job["manifest"]
+            manifest["input"] = os.path.abspath(job["input"])
+            manifest["output"] = os.path.abspath(job["output"])
+            manifest["stages"][stage] = {
+                "key": key,
+                "file": file_name,
+                "extra_files": list(extra_files),
+                "params": params or {},
+                "completed_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            }
+            _write_json_atomic(os.path.join(artifacts_dir, ARTIFACTS_MANIFEST), manifest)
+    except OSError as e:
+        print(f"ATTENTION Impossible d'ecrire l'artefact {stage} dans {artifacts_dir} : {e}")
+
+
+# =============================
+#   Parsing des arguments
+# =============================
+
+def add_output_arguments(parser):
+    """Options de présentation des sorties, communes au traitement et à la sous-commande render."""
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Écrire en plus un fichier JSON à côté du fichier texte (output_file.json)."
+    )
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help="Écrire en plus un fichier JSON Lines, un segment par ligne (même base que output_file, .jsonl)."
+    )
+    parser.add_argument(
+        "--output_format",
+        default="txt",
+        choices=list(OUTPUT_FORMATS),
+        help="Format du fichier de sortie principal (par défaut : txt). Avec output_file '-', c'est ce "
+             "format qui est écrit sur la sortie standard (ex: jsonl pour un pipeline avec jq)."
+    )
+
+    # === AJOUT : options SRT / VTT ===
+    parser.add_argument(
+        "--srt",
+        action="store_true",
+        help="Écrire en plus un fichier .srt (même base que output_file)."
+    )
+    parser.add_argument(
+        "--vtt",
+        action="store_true",
+        help="Écrire en plus un fichier .vtt (même base que output_file)."
+    )
+    parser.add_argument(
+        "--subs_no_speaker",
+        action="store_true",
+        help="Ne pas préfixer les sous-titres avec le speaker (utile pour un SRT/VTT plus 'classique')."
+    )
+
+    parser.add_argument(
+        "--alignment",
+        default="accumulate",
+        choices=list(ALIGNMENT_STRATEGIES),
+        help="Association transcription <-> speakers : 'accumulate' cumule le recouvrement par speaker, "
+             "'best_segment' garde le meilleur segment Pyannote unique (ancien comportement). Par défaut : accumulate."
+    )
+    parser.add_argument(
+        "--overlap_threshold",
+        type=float,
+        default=OVERLAP_THRESHOLD,
+        help=f"Fraction minimale du segment Whisper couverte par un speaker pour l'attribuer (par défaut : {OVERLAP_THRESHOLD})."
+    )
+    parser.add_argument(
+        "--word_speakers",
+        action="store_true",
+        help="Attribuer les speakers mot par mot (horodatages par mot de Whisper) et couper le texte "
+             "aux changements de speaker, au lieu d'un speaker par segment Whisper."
+    )
+    parser.add_argument(
+        "--merge_max_gap",
+        type=float,
+        help="Ne pas fusionner deux segments consécutifs du même speaker séparés par un silence plus long "
+             "que cette durée en secondes (par défaut : fusion sans limite)."
+    )
+
+
+def add_backend_argument(parser, preload: bool = False):
+    parser.add_argument(
+        "--backend",
+        default=DEFAULT_BACKEND,
+        choices=sorted(TRANSCRIPTION_BACKENDS),
+        help=("Moteur du modèle préchargé (les jobs le choisissent avec --backend). " if preload else
+              "Moteur de transcription : 'whisper' (openai-whisper, par défaut), 'faster-whisper' "
+              "(CTranslate2, plus rapide sur CPU, paquet faster-whisper) ou 'fake' (factice, pour tests "
+              "et benchmarks). ")
+        + "Les modèles --whisper_model sont les mêmes."
+    )
+
+
+def add_processing_arguments(parser):
+    """Options communes au mode fichier unique et au mode batch."""
+    parser.add_argument(
+        "--whisper_model",
+        default="turbo",
+        choices=["tiny", "base", "small", "medium", "large", "turbo"],
+        help="Modèle Whisper à utiliser (par défaut : turbo)"
+    )
+    add_backend_argument(parser)
+    parser.add_argument(
+        "--quantize",
+        choices=list(QUANTIZE_MODES),
+        help="Whisper quantifié pour l'inférence CPU : 'int8' quantifie dynamiquement les couches linéaires (plus rapide, précision légèrement moindre). Le modèle quantifié est gardé dans le cache (<cache_dir>/models)."
+    )
+    parser.add_argument(
+        "--keep_temp",
+        action="store_true",
+        help="Ne pas supprimer les fichiers temporaires"
+    )
+    parser.add_argument(
+        "--hf_token",
+        help="Token Hugging Face passé directement en ligne de commande"
+    )
+    parser.add_argument(
+        "--ask_token",
+        action="store_true",
+        help="Forcer la demande interactive du token Hugging Face si absent"
+    )
+    parser.add_argument(
+        "--language",
+        help="Forcer la langue pour Whisper (ex: fr, en, de). Si omis, Whisper auto-détecte."
+    )
+
+    add_output_arguments(parser)
+
+    parser.add_argument(
+        "--ingest",
+        default="pipe",
+        choices=list(INGEST_MODES),
+        help="Décodage audio : 'pipe' lit ffmpeg directement en mémoire (par défaut), "
+             "'tempfile' passe par un WAV temporaire (ancien comportement, utilisé aussi en repli), "
+             "'mmap' décode vers un fichier brut memory-mappé (mémoire bornée)."
+    )
+    parser.add_argument(
+        "--max_memory",
+        type=float,
+        help="Budget mémoire en Mo : active le décodage memory-mappé (--ingest mmap), garde le signal "
+             "sur CPU pour Pyannote et compare le pic RSS final à ce budget."
+    )
+    parser.add_argument(
+        "--parallel_stages",
+        action="store_true",
+        help="Exécuter la transcription Whisper et la diarisation Pyannote en parallèle "
+             "(threads séparés, budget de threads torch partagé entre les deux)."
+    )
+    add_cpu_arguments(parser)
+    parser.add_argument(
+        "--progress_json", "--progress-json",
+        dest="progress_json",
+        action="store_true",
+        help="Émettre la progression en JSON (une ligne par événement : début/fin d'étape, pourcentage "
+             "d'audio traité, segments, ETA) sur un flux dédié (cf. --progress_stream)."
+    )
+    parser.add_argument(
+        "--progress_stream",
+        default="stderr",
+        metavar="FLUX",
+        help="Flux des événements --progress_json : stderr (par défaut), stdout, fd:N ou chemin de fichier."
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FICHIER",
+        help="Enregistrer une trace des étapes (début/fin, pid/tid, octets, segments) au format "
+             "Chrome trace-event dans FICHIER, plus un résumé FICHIER.summary.json."
+    )
+    parser.add_argument(
+        "--trace_profile",
+        metavar="ETAPES",
+        help="Avec --trace : profiler ces étapes avec cProfile, séparées par des virgules "
+             "(ex: run_diarization,alignment ; 'all' pour toutes). Un fichier .prof par étape."
+    )
+
+    parser.add_argument(
+        "--no_cache", "--no-cache",
+        dest="no_cache",
+        action="store_true",
+        help="Ne pas lire ni écrire le cache des résultats Whisper/Pyannote (inférence toujours relancée)."
+    )
+    parser.add_argument(
+        "--cache_dir",
+        help="Dossier du cache des résultats (par défaut : $WHISPERPYANNOTE_CACHE_DIR ou ~/.cache/whisperpyannote)."
+    )
+    parser.add_argument(
+        "--cache_max_mb",
+        type=float,
+        default=DEFAULT_CACHE_MAX_MB,
+        help=f"Taille maximale du cache en Mo, les entrées les moins récemment utilisées sont supprimées "
+             f"au-delà (par défaut : {DEFAULT_CACHE_MAX_MB})."
+    )
+
+    resume_group = parser.add_mutually_exclusive_group()
+    resume_group.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reprendre un traitement interrompu : les étapes dont l'artefact (dossier <sortie>.artifacts) "
+             "correspond aux mêmes entrées et options ne sont pas relancées."
+    )
+    resume_group.add_argument(
+        "--no_artifacts", "--no-artifacts",
+        dest="no_artifacts",
+        action="store_true",
+        help="Ne pas écrire les artefacts intermédiaires (audio, segments Whisper, diarisation, alignement) "
+             "à côté de la sortie."
+    )
+
+    parser.add_argument(
+        "--vad",
+        action="store_true",
+        help="Pré-passe de détection de parole : ne transcrire que les zones de parole (silences longs "
+             "ignorés) puis replacer les horodatages sur l'audio original. Accélère les enregistrements "
+             "avec beaucoup de silence."
+    )
+    parser.add_argument(
+        "--vad_threshold",
+        type=float,
+        default=DEFAULT_VAD_THRESHOLD_DB,
+        help=f"Seuil de parole pour --vad, en dB au-dessus du bruit de fond (par défaut : {DEFAULT_VAD_THRESHOLD_DB:g}). "
+             "Plus bas : garde davantage d'audio."
+    )
+    parser.add_argument(
+        "--vad_min_silence",
+        type=float,
+        default=DEFAULT_VAD_MIN_SILENCE,
+        help=f"Durée minimale en secondes d'un silence ignoré par --vad (par défaut : {DEFAULT_VAD_MIN_SILENCE:g})."
+    )
+    parser.add_argument(
+        "--long_form",
+        action="store_true",
+        help="Transcription longue durée : découpage aux pauses et transcription des morceaux "
+             "en parallèle dans plusieurs processus (CPU)."
+    )
+    parser.add_argument(
+        "--chunk_seconds",
+        type=float,
+        default=DEFAULT_CHUNK_SECONDS,
+        help=f"Durée cible des morceaux en secondes pour --long_form (par défaut : {DEFAULT_CHUNK_SECONDS:g})."
+    )
+    parser.add_argument(
+        "--chunk_workers",
+        type=int,
+        help="Nombre de processus workers pour --long_form (par défaut : CPU alloués (--threads) / --chunk_threads)."
+    )
+    parser.add_argument(
+        "--chunk_threads",
+        type=int,
+        default=DEFAULT_CHUNK_THREADS,
+        help=f"Threads torch par worker pour --long_form (par défaut : {DEFAULT_CHUNK_THREADS})."
+    )
+
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument(
+        "--transcription_only",
+        action="store_true",
+        help="Ne faire que la transcription (pas de diarisation)."
+    )
+    mode_group.add_argument(
+        "--diarization_only",
+        action="store_true",
+        help="Ne faire que la diarisation (pas de transcription Whisper)."
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Transcrire et/ou diariser un fichier audio ou vidéo.",
+        epilog="Sous-commandes : 'whisperpyannote.py batch -h' (plusieurs fichiers, modèles chargés une fois), "
+               "'whisperpyannote.py live -h' (direct : micro, flux réseau ou stdin), "
+               "'whisperpyannote.py render -h' (régénérer les sorties sans inférence), "
+               "'whisperpyannote.py serve -h' (service local avec modèles résidents), "
+               "'whisperpyannote.py worker -h' (processus piloté par stdin/stdout pour les interfaces).",
+    )
+    parser.add_argument("input_path", help="Chemin du fichier audio ou vidéo à traiter")
+    parser.add_argument("output_file", help="Chemin du fichier texte de sortie ('-' pour la sortie standard)")
+
+    add_processing_arguments(parser)
+
+    parser.add_argument(
+        "--capabilities",
+        action="store_true",
+        help="Afficher en JSON les options, sous-commandes et le protocole de progression supportés, puis quitter."
+    )
+    return parser
+
+
+def parse_args(argv=None):
+    return build_parser().parse_args(argv)
+
+
+def capabilities() -> dict:
+    """Description JSON du CLI pour les interfaces (sans import de torch/whisper/pyannote)."""
+    options = {}
+    for action in build_parser()._actions:
+        if not action.option_strings or action.help == argparse.SUPPRESS:
+            continue
+        long_flags = [o for o in action.option_strings if o.startswith("--")]
+        name = long_flags[0] if long_flags else action.option_strings[0]
+        default = action.default
+        if default == argparse.SUPPRESS or not isinstance(default, (str, int, float, bool, type(None))):
+            default = None
+        options[name] = {
+            "aliases": [o for o in action.option_strings if o != name],
+            "dest": action.dest,
+            "takes_value": action.nargs != 0,
+            "choices": list(action.choices) if action.choices else None,
+            "default": default,
+            "help": action.help,
+        }
+    return {
+        "program": "whisperpyannote",
+        "capabilities_version": 1,
+        "subcommands": ["batch", "live", "render", "serve", "worker"],
+        "options": options,
+        "output_formats": ["txt", "json", "jsonl", "srt", "vtt"],
+        "backends": {
+            name: {**backend.capabilities, "default": name == DEFAULT_BACKEND,
+                   "available": not backend.missing_requirements()}
+            for name, backend in TRANSCRIPTION_BACKENDS.items()
+        },
+        "progress": {
+            "protocol": PROGRESS_PROTOCOL_VERSION,
+            "flag": "--progress_json",
+            "stream_flag": "--progress_stream",
+            "events": list(PROGRESS_EVENTS),
+            "stages": list(PROGRESS_STAGES),
+        },
+    }
+
+
+def parse_batch_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="whisperpyannote.py batch",
+        description="Transcrire et/ou diariser plusieurs fichiers en chargeant Whisper et Pyannote une seule fois.",
+    )
+    parser.add_argument(
+        "source",
+        help="Dossier, motif glob (ex: 'audios/*.mp3') ou fichier manifeste "
+             "(une ligne par fichier : 'entree' ou 'entree<TAB>sortie', '#' pour commenter)."
+    )
+    parser.add_argument(
+        "--output_dir",
+        help="Dossier des fichiers de sortie (par défaut : à côté de chaque fichier d'entrée). "
+             "Ignoré pour les lignes du manifeste qui précisent leur sortie."
+    )
+    parser.add_argument(
+        "--recursive",
+        action="store_true",
+        help="Parcourir aussi les sous-dossiers quand la source est un dossier."
+    )
+    parser.add_argument(
+        "--summary",
+        help="Écrire en plus le tableau récapitulatif au format CSV dans ce fichier."
+    )
+
+    sched = parser.add_argument_group("ordonnanceur (--scheduler)")
+    sched.add_argument(
+        "--scheduler",
+        action="store_true",
+        help="Traiter les fichiers en pipeline : décodage, transcription, diarisation et export "
+             "dans des files séparées, avec une concurrence bornée par étape."
+    )
+    sched.add_argument("--ingest_workers", type=int, default=1,
+                       help="Décodages ffmpeg simultanés (par défaut : 1).")
+    sched.add_argument("--transcription_workers", type=int, default=1,
+                       help="Transcriptions Whisper simultanées, un modèle chargé par worker (par défaut : 1).")
+    sched.add_argument("--diarization_workers", type=int, default=1,
+                       help="Diarisations Pyannote simultanées, une pipeline chargée par worker (par défaut : 1).")
+    sched.add_argument("--export_workers", type=int, default=1,
+                       help="Alignements/exports simultanés (par défaut : 1).")
+    sched.add_argument(
+        "--queue_size",
+        type=int,
+        default=2,
+        help="Nombre maximal de fichiers en attente entre deux étapes ; au-delà l'étape précédente "
+             "attend (contre-pression, borne aussi le nombre de buffers audio en mémoire). Par défaut : 2."
+    )
+    sched.add_argument(
+        "--schedule_order",
+        default="fifo",
+        choices=["fifo", "shortest", "longest"],
+        help="Priorité des fichiers : ordre d'arrivée, plus petits fichiers d'abord ou plus gros d'abord "
+             "(par défaut : fifo)."
+    )
+
+    add_processing_arguments(parser)
+
+    return parser.parse_args(argv)
+
+
+# =============================
+#   Exécution des étapes d'inférence
+# =============================
+
+def run_inference_stages(stages: dict, parallel: bool = False):
+    """
+    Exécute les étapes d'inférence indépendantes (ex: transcription, diarisation).
+
+    stages : dict nom -> fonction sans argument.
+    En mode parallèle, chaque étape tourne dans son propre thread et le budget
+    de threads torch est partagé entre elles pour éviter la sur-souscription.
+    Retourne (résultats par étape, durées par étape, durée murale totale).
+    """
+    results = {}
+    timings = {}
+    started = time.perf_counter()
+
+    def timed(name, fn):
+        t0 = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            timings[name] = time.perf_counter() - t0
+
+    if not parallel or len(stages) < 2:
+        for name, fn in stages.items():
+            results[name] = timed(name, fn)
+        return results, timings, time.perf_counter() - started
+
+    torch = torch_cpu_setup()
+    print(f"\nExecution parallele des etapes : {', '.join(stages)} "
+          f"({torch.get_num_threads()} thread(s) torch par etape)")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(stages), thread_name_prefix="stage") as executor:
+        futures = {name: executor.submit(timed, name, fn) for name, fn in stages.items()}
+        for name, future in futures.items():
+            results[name] = future.result()
+
+    return results, timings, time.perf_counter() - started
+
+
+def print_stage_timings(timings: dict, wall: float, parallel: bool):
+    print("\nTemps par etape :")
+    for name, seconds in timings.items():
+        print(f"- {name} : {seconds:.1f}s")
+    sequential = sum(timings.values())
+    if parallel:
+        print(f"- total (parallele) : {wall:.1f}s (somme des etapes : {sequential:.1f}s, "
+              f"gain de recouvrement : {max(0.0, sequential - wall):.1f}s)")
+    else:
+        print(f"- total (sequentiel) : {wall:.1f}s")
+
+
+# =============================
+#   Traitement d'un fichier
+# =============================
+
+def cleanup_temp_files(temp_files, keep_temp: bool):
+    if keep_temp:
+        for p in temp_files:
+            print(f"\nFichier temporaire conserve : {p}")
+    else:
+        for p in temp_files:
+            try:
+                if p and os.path.exists(p) and p.startswith(tempfile.gettempdir()):
+                    os.unlink(p)
+                    print(f"\nFichier temporaire supprime : {p}")
+            except OSError as e:
+                print(f"\nATTENTION Impossible de supprimer le fichier temporaire {p} : {e}")
+
+
+def compute_speaker_durations(speaker_segments):
+    speaker_durations = {}
+    for s in speaker_segments:
+        speaker_durations[s["speaker"]] = speaker_durations.get(s["speaker"], 0.0) + (s["end"] - s["start"])
+
+    speaker_durations_formatted = {
+        speaker: str(datetime.timedelta(seconds=int(duration)))
+        for speaker, duration in speaker_durations.items()
+    }
+    return speaker_durations, speaker_durations_formatted
+
+
+def print_speaker_summary(audio_total_duration: float, speaker_durations: dict):
+    total_speech_duration = sum(speaker_durations.values())
+    average_duration = total_speech_duration / len(speaker_durations) if speaker_durations else 0.0
+
+    print("\nResume global :")
+    print(f"- Duree totale de l'audio analyse : {str(datetime.timedelta(seconds=int(audio_total_duration)))}")
+    print(f"- Somme des temps de parole (tous speakers cumules) : {str(datetime.timedelta(seconds=int(total_speech_duration)))}")
+    print(f"- Nombre de speakers : {len(speaker_durations)}")
+    print(f"- Duree moyenne par speaker : {str(datetime.timedelta(seconds=int(average_duration)))}")
+
+
+def _speaker_durations_text(speaker_durations_formatted: dict) -> str:
+    lines = "".join(f"Speaker {speaker}: {duration}\n" for speaker, duration in speaker_durations_formatted.items())
+    return "Temps de parole par speaker :\n" + lines
+
+
+def _speakers_json(speaker_durations: dict, speaker_durations_formatted: dict) -> list:
+    return [
+        {"speaker": spk, "duration_seconds": float(dur), "duration_hhmmss": speaker_durations_formatted[spk]}
+        for spk, dur in speaker_durations.items()
+    ]
+
+
+def _sorted_by_time(segments) -> bool:
+    return all((a["start"], a["end"]) <= (b["start"], b["end"])
+               for a, b in zip(segments, itertools.islice(segments, 1, None)))
+
+
+def export_transcription_only(args, output_file: str, header: str, json_meta: dict,
+                              audio_total_duration: float, transcript_segments):
+    print("\nMode : TRANSCRIPTION SEULE (pas de diarisation).")
+    transcript_segments = transcript_segments or []
+
+    print("\nApercu de la transcription :")
+    for seg in itertools.islice(transcript_segments, 10):
+        print(f"[{format_time(seg['start'])} - {format_time(seg['end'])}] {seg['text']}")
+    if len(transcript_segments) > 10:
+        print("... (voir fichier pour le reste)")
+
+    # Sorties (TXT, sous-titres basés sur Whisper, JSON/JSONL) écrites en une seule passe
+    segments = (
+        {"start": float(t["start"]), "end": float(t["end"]), "text": (t.get("text", "") or ""), "speaker": None}
+        for t in transcript_segments
+    )
+    writers = build_writers(
+        args, output_file, "transcription_only",
+        preamble=header + "Transcription (sans diarisation) :\n\n",
+        format_line=lambda s: f"[{hhmmss(s['start'])}-{hhmmss(s['end'])}] {s['text'].strip()}",
+        empty_line="(Aucun segment de transcription.)",
+        json_fields={"meta": {**json_meta, "mode": "transcription_only",
+                              "audio_duration_seconds": audio_total_duration}},
+        json_list_key="transcription",
+    )
+    write_segments(segments, writers, "Transcription sauvegardee")
+
+    print("\nResume global :")
+    print(f"- Duree totale de l'audio analyse : {str(datetime.timedelta(seconds=int(audio_total_duration)))}")
+    print(f"- Nombre de segments de transcription : {len(transcript_segments)}")
+
+
+def export_diarization_only(args, output_file: str, header: str, json_meta: dict,
+                            audio_total_duration: float, speaker_segments):
+    print("\nMode : DIARISATION SEULE (pas de transcription Whisper).")
+    speaker_segments = speaker_segments or []
+
+    speaker_durations, speaker_durations_formatted = compute_speaker_durations(speaker_segments)
+
+    print("\nTemps de parole par speaker :")
+    for speaker, duration in speaker_durations_formatted.items():
+        print(f"Speaker {speaker}: {duration}")
+
+    print("\nApercu des segments de diarisation (sans texte) :")
+    for seg in itertools.islice(speaker_segments, 10):
+        print(f"[{hhmmss(seg['start'])}-{hhmmss(seg['end'])}] {seg['speaker']}")
+    if len(speaker_segments) > 10:
+        print("... (voir fichier pour le reste)")
+
+    # Pas de SRT/VTT possible ici (pas de texte)
+    if args.srt or args.vtt:
+        print("\nATTENTION SRT/VTT non generes en mode diarisation seule (pas de transcription/texte).")
+
+    writers = build_writers(
+        args, output_file, "diarization_only",
+        preamble=header + _speaker_durations_text(speaker_durations_formatted)
+        + "\nSegments de diarisation (sans transcription) :\n\n",
+        format_line=lambda s: f"[{hhmmss(s['start'])}-{hhmmss(s['end'])}] {s['speaker']}",
+        empty_line="(Aucun segment de diarisation.)",
+        json_fields={
+            "meta": {**json_meta, "mode": "diarization_only", "audio_duration_seconds": audio_total_duration},
+            "speakers": _speakers_json(speaker_durations, speaker_durations_formatted),
+        },
+        json_list_key="segments",
+    )
+    write_segments(speaker_segments, writers, "Diarisation sauvegardee")
+
+    print_speaker_summary(audio_total_duration, speaker_durations)
+
+
+def align_words(args, transcript_segments, speaker_segments):
+    """Attribution mot par mot (--word_speakers), avec repli par segment si Whisper n'a pas donné les mots."""
+    if not has_word_timestamps(transcript_segments):
+        print("ATTENTION Pas d'horodatage par mot dans la transcription (relancer la transcription "
+              "avec --word_speakers) : attribution par segment.")
+    else:
+        print("\nAttribution des speakers mot par mot...")
+    return assign_word_speakers(
+        transcript_segments,
+        speaker_segments,
+        threshold=args.overlap_threshold,
+        strategy=args.alignment,
+    )
+
+
+def export_full(args, output_file: str, header: str, json_meta: dict,
+                audio_total_duration: float, transcript_segments, speaker_segments,
+                assigned_speakers=None, word_segments=None):
+    """
+    assigned_speakers : un speaker par segment Whisper (calculé ici si absent).
+    word_segments : avec --word_speakers, segments déjà redécoupés par assign_word_speakers().
+    """
+    print("\nMode : TRANSCRIPTION + DIARISATION.")
+
+    if word_segments is None and getattr(args, "word_speakers", False):
+        word_segments = align_words(args, transcript_segments, speaker_segments)
+    if word_segments is None and assigned_speakers is None:
+        print("\nAssociation des segments transcription <-> speakers...")
+        assigned_speakers = assign_speakers(
+            transcript_segments,
+            speaker_segments,
+            threshold=args.overlap_threshold,
+            strategy=args.alignment,
+        )
+
+    speaker_durations, speaker_durations_formatted = compute_speaker_durations(speaker_segments)
+
+    print("\nTemps de parole par speaker :")
+    for speaker, duration in speaker_durations_formatted.items():
+        print(f"Speaker {speaker}: {duration}")
+
+    if word_segments is not None:
+        preview = ((s, s["speaker"]) for s in word_segments)
+        segments = iter(word_segments)
+        sorted_input = _sorted_by_time(word_segments)
+    else:
+        preview = zip(transcript_segments, assigned_speakers)
+        segments = (
+            {"start": float(t["start"]), "end": float(t["end"]), "speaker": spk, "text": t.get("text", "")}
+            for t, spk in zip(transcript_segments, assigned_speakers)
+        )
+        sorted_input = _sorted_by_time(transcript_segments)
+
+    print("\nApercu de la transcription (non fusionnee) :")
+    for t_segment, best_speaker in itertools.islice(preview, 10):
+        start_time = format_time(t_segment["start"])
+        end_time = format_time(t_segment["end"])
+        print(f"[{start_time} - {end_time}] Speaker {best_speaker}: {t_segment['text']}")
+    if len(word_segments if word_segments is not None else transcript_segments) > 10:
+        print("... (voir fichier pour le reste)")
+
+    if not sorted_input:
+        segments = sorted(segments, key=lambda s: (s["start"], s["end"]))
+
+    # Segments fusionnés par speaker produits un par un et envoyés à toutes les sorties
+    writers = build_writers(
+        args, output_file, "full",
+        preamble=header + _speaker_durations_text(speaker_durations_formatted)
+        + "\nTranscription fusionnee par speaker :\n\n",
+        format_line=lambda s: f"[{hhmmss(s['start'])}-{hhmmss(s['end'])}] {s['speaker']}: {s['text'].strip()}",
+        empty_line=None,
+        json_fields={
+            "meta": {**json_meta, "mode": "transcription_and_diarization",
+                     "audio_duration_seconds": audio_total_duration},
+            "speakers": _speakers_json(speaker_durations, speaker_durations_formatted),
+        },
+        json_list_key="segments_merged",
+    )
+    write_segments(iter_runs(segments, max_gap=getattr(args, "merge_max_gap", None)), writers,
+                   "Transcription complete sauvegardee")
+
+    print_speaker_summary(audio_total_duration, speaker_durations)
+
+
+def new_job(args, input_path: str, output_file: str) -> dict:
+    """
+    Prépare l'état d'un traitement (un fichier), partagé par les étapes
+    ingest_job / transcribe_job / diarize_job / export_job / finish_job.
+    """
+    if not os.path.exists(input_path):
+        print(f"ATTENTION Fichier introuvable : {input_path}")
+        sys.exit(1)
+
+    header, json_meta = build_output_header(input_path, backend_model_label(args), args.language)
+
+    return {
+        "args": args,
+        "input": input_path,
+        "output": output_file,
+        "header": header,
+        "json_meta": json_meta,
+        "temp_files": [],
+        "audio": None,
+        "audio_duration_seconds": 0.0,
+        "fingerprint": None,
+        "cached_transcript": None,
+        "cached_speakers": None,
+        "artifacts_dir": None if getattr(args, "no_artifacts", False) or output_file == STDOUT_PATH
+        else artifacts_dir_for_output(output_file),
+        "manifest": None,
+        "resumed": set(),
+        "transcript_segments": None,
+        "speaker_segments": [],
+        "stage_seconds": {},
+        "started": time.perf_counter(),
+    }
+
+
+def build_output_header(input_path: str, whisper_model: str, language: str = None):
+    """En-tête du fichier texte et métadonnées JSON (communs au traitement et à render)."""
+    execution_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    source_name = os.path.basename(input_path)
+    language_label = language if language else "auto-détection"
+    header = (
+        "Metadonnees de transcription\n"
+        f"- Fichier source : {source_name}\n"
+        f"- Modèle Whisper : {whisper_model}\n"
+        f"- Langue Whisper : {language_label}\n"
+        f"- Date d'exécution : {execution_time}\n"
+        "\n"
+        "----------------------------------------\n\n"
+    )
+
+    json_meta = {
+        "source_file": source_name,
+        "source_path": input_path,
+        "whisper_model": whisper_model,
+        "whisper_language": language_label,
+        "execution_time": execution_time,
+    }
+    return header, json_meta
+
+
+def _job_cache_settings(args):
+    use_cache = not getattr(args, "no_cache", False)
+    cache_dir = getattr(args, "cache_dir", None) or default_cache_dir()
+    cache_max_bytes = int(getattr(args, "cache_max_mb", DEFAULT_CACHE_MAX_MB) * 1024 * 1024)
+    return use_cache, cache_dir, cache_max_bytes
+
+
+def _wants_word_timestamps(args) -> bool:
+    """Horodatages par mot : utiles seulement pour l'attribution des speakers mot par mot."""
+    return args.word_speakers and not args.transcription_only
+
+
+def _transcription_key(job) -> str:
+    args = job["args"]
+    t_options = {"long_form_chunk": args.chunk_seconds} if getattr(args, "long_form", False) else {}
+    if _wants_word_timestamps(args):
+        t_options["word_timestamps"] = True
+    if args.quantize:
+        t_options["quantize"] = args.quantize
+    if args.vad:
+        t_options["vad"] = [args.vad_threshold, args.vad_min_silence]
+    return transcription_cache_key(job["fingerprint"], args.whisper_model, args.language,
+                                   backend=args.backend, **t_options)
+
+
+def _lookup_previous_results(job):
+    """Résultats déjà calculés : artefacts de reprise (--resume) en priorité, puis cache."""
+    args = job["args"]
+    use_cache, cache_dir, _ = _job_cache_settings(args)
+    if not args.diarization_only:
+        key = _transcription_key(job)
+        resumed = artifact_load(job, "transcription", key)
+        if resumed is not None:
+            job["resumed"].add("transcription")
+            job["cached_transcript"] = resumed["segments"]
+        elif use_cache:
+            job["cached_transcript"] = cache_load(cache_dir, "transcription", key)
+    if not args.transcription_only:
+        key = diarization_cache_key(job["fingerprint"])
+        resumed = artifact_load(job, "diarization", key)
+        if resumed is not None:
+            job["resumed"].add("diarization")
+            job["cached_speakers"] = resumed["segments"]
+        elif use_cache:
+            job["cached_speakers"] = cache_load(cache_dir, "diarization", key)
+
+
+def _needs_audio(job) -> bool:
+    args = job["args"]
+    return (not args.diarization_only and job["cached_transcript"] is None) or \
+        (not args.transcription_only and job["cached_speakers"] is None)
+
+
+@report_stage("ingest")
+def ingest_job(job):
+    """
+    Étape 1 : décodage unique de l'audio, empreinte et consultation du cache.
+    Avec --resume, le décodage est évité si le fichier source n'a pas changé et que
+    transcription et diarisation sont déjà disponibles.
+    """
+    args = job["args"]
+    use_cache, _, _ = _job_cache_settings(args)
+    if job["artifacts_dir"] is not None:
+        job["manifest"] = load_artifacts_manifest(job["artifacts_dir"])
+        source = source_reference(job["input"])
+        ingest_key = ingest_artifact_key(source)
+        reference = artifact_load(job, "ingest", ingest_key)
+        if reference is not None:
+            job["resumed"].add("ingest")
+            job["fingerprint"] = reference["fingerprint"]
+            job["audio_duration_seconds"] = reference["duration_seconds"]
+            _lookup_previous_results(job)
+            if not _needs_audio(job):
+                print("OK Reprise : fichier source inchange, decodage audio evite.")
+                return
+
+    ingest = "mmap" if getattr(args, "max_memory", None) else getattr(args, "ingest", "pipe")
+    job["audio"] = decode_audio(job["input"], job["temp_files"], ingest=ingest)
+    job["audio_duration_seconds"] = len(job["audio"]) / SAMPLE_RATE
+    if "ingest" in job["resumed"]:
+        return
+
+    if not use_cache and job["artifacts_dir"] is None:
+        return
+    job["fingerprint"] = audio_fingerprint(job["audio"])
+    if job["artifacts_dir"] is not None:
+        reference = {
+            **source,
+            "fingerprint": job["fingerprint"],
+            "sample_rate": SAMPLE_RATE,
+            "duration_seconds": job["audio_duration_seconds"],
+        }
+        artifact_store(job, "ingest", ingest_key, "audio.json", reference)
+    _lookup_previous_results(job)
+
+
+def needs_hf_token(job) -> bool:
+    return not job["args"].transcription_only and job["cached_speakers"] is None
+
+
+@report_stage("transcription", skip=lambda job: job["args"].diarization_only)
+def transcribe_job(job, backend: TranscriptionBackend = None):
+    """Étape 2 : transcription par le moteur --backend (ou résultat en cache)."""
+    args = job["args"]
+    if args.diarization_only:
+        return
+    if job["cached_transcript"] is not None:
+        if "transcription" in job["resumed"]:
+            print("OK Reprise : transcription deja faite (Whisper non execute).")
+        else:
+            print("OK Transcription chargee depuis le cache (Whisper non execute).")
+            _store_transcription_artifact(job, job["cached_transcript"])
+        job["transcript_segments"] = job["cached_transcript"]
+        return
+
+    audio, timeline = job["audio"], None
+    if args.vad:
+        audio, timeline, job["vad_skipped_seconds"] = run_vad(audio, args.vad_threshold, args.vad_min_silence)
+
+    if timeline is not None and len(audio) == 0:
+        result = {"segments": [], "language": args.language}
+    elif getattr(args, "long_form", False):
+        result = run_long_form_transcription(
+            audio, args.whisper_model, language=args.language,
+            workers=args.chunk_workers, threads=args.chunk_threads,
+            chunk_seconds=args.chunk_seconds, word_timestamps=_wants_word_timestamps(args),
+            quantize=args.quantize, cache_dir=args.cache_dir,
+        )
+    else:
+        if backend is None:
+            backend = load_job_backend(args)
+        result = run_whisper_transcription(backend, audio, language=args.language,
+                                           word_timestamps=_wants_word_timestamps(args))
+    if timeline is not None:
+        remap_transcription(result, timeline)
+        print(f"OK VAD : horodatages replaces sur l'audio original ({len(result['segments'])} segment(s)).")
+
+    use_cache, cache_dir, cache_max_bytes = _job_cache_settings(args)
+    if use_cache:
+        cache_store(cache_dir, "transcription", _transcription_key(job), result["segments"], cache_max_bytes)
+    _store_transcription_artifact(job, result["segments"])
+    job["transcript_segments"] = result["segments"]
+
+
+def _store_transcription_artifact(job, segments):
+    if job["fingerprint"] is None:
+        return
+    args = job["args"]
+    params = {"whisper_model": args.whisper_model, "language": args.language or "auto"}
+    if getattr(args, "long_form", False):
+        params["chunk_seconds"] = args.chunk_seconds
+    if _wants_word_timestamps(args):
+        params["word_timestamps"] = True
+    if args.quantize:
+        params["quantize"] = args.quantize
+    if args.backend != DEFAULT_BACKEND:
+        params["backend"] = args.backend
+    if args.vad:
+        params["vad"] = {"threshold_db": args.vad_threshold, "min_silence": args.vad_min_silence}
+    artifact_store(job, "transcription", _transcription_key(job), "transcription.json",
+                   {"segments": segments}, params)
+
+
+def _store_diarization_artifact(job, speaker_segments):
+    if job["fingerprint"] is None or job["artifacts_dir"] is None:
+        return
+    rttm_name = "diarization.rttm"
+    try:
+        os.makedirs(job["artifacts_dir"], exist_ok=True)
+        write_rttm(speaker_segments, os.path.join(job["artifacts_dir"], rttm_name),
+                   os.path.splitext(os.path.basename(job["input"]))[0])
+    except OSError as e:
+        print(f"ATTENTION Impossible d'ecrire {rttm_name} : {e}")
+    artifact_store(job, "diarization", diarization_cache_key(job["fingerprint"]), "diarization.json",
+                   {"segments": speaker_segments}, {"pipeline": DIARIZATION_MODEL}, extra_files=[rttm_name])
+
+
+@report_stage("diarization", skip=lambda job: job["args"].transcription_only)
+def diarize_job(job, pipeline=None, hf_token: str = None):
+    """Étape 3 : diarisation Pyannote (ou résultat en cache)."""
+    args = job["args"]
+    if args.transcription_only:
+        return
+    if job["cached_speakers"] is not None:
+        if "diarization" in job["resumed"]:
+            print("OK Reprise : diarisation deja faite (Pyannote non execute).")
+        else:
+            print("OK Diarisation chargee depuis le cache (Pyannote non execute).")
+            _store_diarization_artifact(job, job["cached_speakers"])
+        job["speaker_segments"] = job["cached_speakers"]
+        return
+
+    speaker_segments = run_diarization(job["audio"], hf_token, pipeline=pipeline,
+                                       bounded_memory=bool(getattr(args, "max_memory", None)))
+    use_cache, cache_dir, cache_max_bytes = _job_cache_settings(args)
+    if use_cache:
+        cache_store(cache_dir, "diarization", diarization_cache_key(job["fingerprint"]), speaker_segments,
+                    cache_max_bytes)
+    _store_diarization_artifact(job, speaker_segments)
+    job["speaker_segments"] = speaker_segments
+
+
+@report_stage("export")
+def export_job(job):
+    """Étape 4 : alignement et écriture des sorties TXT/JSON/SRT/VTT."""
+    args = job["args"]
+
+    # Le signal n'est plus utile pour l'alignement et les exports : on le libère tout de suite.
+    job["audio"] = None
+    release_memory()
+
+    export_key = None
+    if job["fingerprint"] is not None:
+        export_key = cache_key(
+            "export",
+            transcription=None if args.diarization_only else _transcription_key(job),
+            diarization=None if args.transcription_only else diarization_cache_key(job["fingerprint"]),
+            output=os.path.abspath(job["output"]),
+            **_export_params(args),
+        )
+        previous = artifact_load(job, "export", export_key)
+        if previous is not None and all(os.path.exists(p) for p in previous["files"]):
+            job["resumed"].add("export")
+            print(f"OK Reprise : sorties deja a jour ({job['output']}).")
+            return
+
+    common = (args, job["output"], job["header"], job["json_meta"], job["audio_duration_seconds"])
+    if args.transcription_only and not args.diarization_only:
+        export_transcription_only(*common, job["transcript_segments"])
+    elif args.diarization_only and not args.transcription_only:
+        export_diarization_only(*common, job["speaker_segments"])
+    else:
+        export_full(*common, job["transcript_segments"], job["speaker_segments"],
+                    **_alignment_from_artifact(job))
+
+    if export_key is not None:
+        files = [a["path"] for a in collect_artifacts(args, job["output"], include_content=False).values()]
+        artifact_store(job, "export", export_key, "export.json", {"files": files}, _export_params(args))
+
+
+def _export_params(args) -> dict:
+    return {
+        "mode": "transcription_only" if args.transcription_only else
+                "diarization_only" if args.diarization_only else "full",
+        "json": bool(args.json),
+        "jsonl": bool(args.jsonl),
+        "output_format": args.output_format,
+        "srt": bool(args.srt),
+        "vtt": bool(args.vtt),
+        "subs_no_speaker": bool(args.subs_no_speaker),
+        "alignment": args.alignment,
+        "overlap_threshold": args.overlap_threshold,
+        "merge_max_gap": args.merge_max_gap,
+        "word_speakers": bool(args.word_speakers),
+    }
+
+
+def _alignment_from_artifact(job) -> dict:
+    """
+    Attribution des speakers : reprise de l'artefact si possible, sinon calculée ici
+    puis enregistrée (alignment.json) pour une reprise ultérieure.
+    Retourne les arguments nommés correspondants de export_full().
+    """
+    if job["fingerprint"] is None:
+        return {}
+    args = job["args"]
+    key = alignment_artifact_key(_transcription_key(job), diarization_cache_key(job["fingerprint"]), args)
+    resumed = artifact_load(job, "alignment", key)
+    if resumed is not None:
+        job["resumed"].add("alignment")
+        print("OK Reprise : association transcription <-> speakers deja faite.")
+        if args.word_speakers:
+            return {"word_segments": resumed["segments"]}
+        return {"assigned_speakers": resumed["speakers"]}
+
+    params = {"strategy": args.alignment, "threshold": args.overlap_threshold}
+    if args.word_speakers:
+        word_segments = align_words(args, job["transcript_segments"], job["speaker_segments"])
+        artifact_store(job, "alignment", key, "alignment.json", {"segments": word_segments},
+                       {**params, "word_speakers": True})
+        return {"word_segments": word_segments}
+
+    print("\nAssociation des segments transcription <-> speakers...")
+    assigned = assign_speakers(
+        job["transcript_segments"],
+        job["speaker_segments"],
+        threshold=args.overlap_threshold,
+        strategy=args.alignment,
+    )
+    artifact_store(job, "alignment", key, "alignment.json", {"speakers": list(assigned)}, params)
+    return {"assigned_speakers": assigned}
+
+
+def finish_job(job):
+    """Libère l'audio (ferme un éventuel memmap) et supprime les fichiers temporaires."""
+    job["audio"] = None
+    cleanup_temp_files(job["temp_files"], job["args"].keep_temp)
+
+
+def job_summary(job) -> dict:
+    return {
+        "input": job["input"],
+        "output": job["output"],
+        "audio_duration_seconds": job["audio_duration_seconds"],
+        "processing_seconds": time.perf_counter() - job["started"],
+        "stage_seconds": dict(job["stage_seconds"]),
+        **({"vad_skipped_seconds": job["vad_skipped_seconds"]} if "vad_skipped_seconds" in job else {}),
+    }
+
+
+def process_file(args, input_path: str, output_file: str,
+                 backend: TranscriptionBackend = None,
+                 pipeline=None, hf_token: str = None) -> dict:
+    """
+    Traite un fichier de bout en bout (audio, transcription, diarisation, exports).
+
+    Les modèles déjà chargés (backend de transcription, pipeline) sont réutilisés s'ils sont
+    fournis ; sinon ils sont chargés ici, comme dans le mode fichier unique.
+    Retourne un résumé {"input", "output", "audio_duration_seconds", "processing_seconds", "stage_seconds"}.
+    """
+    with trace_session(args), progress_session(args):
+        return _process_file(args, input_path, output_file, backend, pipeline, hf_token)
+
+
+def _process_file(args, input_path, output_file, backend, pipeline, hf_token) -> dict:
+    job = new_job(args, input_path, output_file)
+
+    try:
+        ingest_job(job)
+
+        # Le token est demandé avant le lancement des étapes (saisie interactive possible).
+        if needs_hf_token(job) and pipeline is None and hf_token is None:
+            hf_token = get_hf_token(args)
+
+        stages = {}
+        if not args.diarization_only:
+            stages["transcription"] = lambda: transcribe_job(job, backend)
+        if not args.transcription_only:
+            stages["diarisation"] = lambda: diarize_job(job, pipeline, hf_token)
+
+        parallel = getattr(args, "parallel_stages", False)
+        _, stage_timings, stages_wall = run_inference_stages(stages, parallel=parallel)
+        job["stage_seconds"].update(stage_timings)
+        if len(stages) > 1:
+            print_stage_timings(stage_timings, stages_wall, parallel)
+
+        export_job(job)
+    finally:
+        # --- Nettoyage fichiers temporaires (TOUS) ---
+        finish_job(job)
+
+    print_memory_report(getattr(args, "max_memory", None))
+
+    return job_summary(job)
+
+
+# =============================
+#   Ordonnanceur multi-étapes
+# =============================
+
+class StageScheduler:
+    """
+    Ordonnanceur en pipeline : chaque étape (décodage, transcription, diarisation,
+    export...) a sa propre file à priorité et son propre nombre de workers.
+
+    Les files entre étapes sont bornées : quand l'étape suivante est saturée,
+    l'étape courante attend (contre-pression) au lieu d'accumuler des buffers audio.
+    Le décodage du fichier suivant recouvre ainsi l'inférence du fichier courant
+    sans sur-souscrire la machine.
+
+    stages : liste de (nom, fonction(job, worker_state), nombre de workers).
+    worker_state est un dict propre à chaque worker (ex: modèle chargé une fois par worker).
+    """
+
+    def __init__(self, stages, queue_size: int = 2, on_error=None):
+        self.stages = stages
+        self.on_error = on_error
+        # File d'entrée non bornée (le backlog), files intermédiaires bornées.
+        self.queues = [queue.PriorityQueue()] + [
+            queue.PriorityQueue(maxsize=max(1, queue_size)) for _ in stages[1:]
+        ]
+        self.done = []
+        self._done_lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def submit(self, job: dict, priority: float = 0.0):
+        job.setdefault("status", "OK")
+        job["priority"] = priority
+        self.queues[0].put((priority, next(self._seq), job))
+
+    def _finish(self, job: dict):
+        with self._done_lock:
+            self.done.append(job)
+
+    def _worker(self, index: int):
+        name, fn, _ = self.stages[index]
+        worker_state = {}
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            priority, seq, job = inbox.get()
+            if job is None:
+                break
+            started = time.perf_counter()
+            try:
+                fn(job, worker_state)
+            except (Exception, SystemExit) as e:
+                # Un job en erreur quitte le pipeline sans bloquer les autres.
+                print(f"ERREUR Etape {name} impossible pour {job.get('input')} : {e}")
+                job["status"] = "ERREUR"
+                job["stage_seconds"][name] = time.perf_counter() - started
+                if self.on_error:
+                    self.on_error(job)
+                self._finish(job)
+                continue
+            job["stage_seconds"][name] = time.perf_counter() - started
+            if outbox is None:
+                self._finish(job)
+            else:
+                outbox.put((priority, seq, job))  # bloquant si l'étape suivante est saturée
+
+    def run(self):
+        """Traite tous les jobs soumis et retourne la liste des jobs terminés."""
+        threads = []
+        for index, (name, _, workers) in enumerate(self.stages):
+            stage_threads = [
+                threading.Thread(target=self._worker, args=(index,), name=f"{name}-{k}", daemon=True)
+                for k in range(max(1, workers))
+            ]
+            for t in stage_threads:
+                t.start()
+            threads.append(stage_threads)
+
+        # Fin d'une étape : une sentinelle par worker de l'étape, après tous les vrais jobs.
+        for index, stage_threads in enumerate(threads):
+            for _ in stage_threads:
+                self.queues[index].put((float("inf"), next(self._seq), None))
+            for t in stage_threads:
+                t.join()
+
+        return self.done
+
+
+def scheduled_stages(args, hf_token: str = None):
+    """Étapes de process_file() pour StageScheduler, avec un modèle par worker."""
+
+    def ingest(job, state):
+        print(f"\n[{job['index']}] decodage : {job['input']}")
+        ingest_job(job)
+
+    def transcribe(job, state):
+        if args.diarization_only:
+            return
+        print(f"\n[{job['index']}] transcription : {os.path.basename(job['input'])}")
+        if "backend" not in state and not args.long_form and job["cached_transcript"] is None:
+            state["backend"] = load_job_backend(args)
+        transcribe_job(job, state.get("backend"))
+
+    def diarize(job, state):
+        if args.transcription_only:
+            return
+        print(f"\n[{job['index']}] diarisation : {os.path.basename(job['input'])}")
+        if "pipeline" not in state and job["cached_speakers"] is None:
+            state["pipeline"] = load_diarization_pipeline(hf_token)
+        diarize_job(job, state.get("pipeline"), hf_token)
+
+    def export(job, state):
+        print(f"\n[{job['index']}] export : {job['output']}")
+        try:
+            export_job(job)
+        finally:
+            finish_job(job)
 
-        print("\nApercu de la transcription (non fusionnee) :")
-        for line in formatted_output[:10]:
-            print(line)
-        if len(formatted_output) > 10:
-            print("... (voir fichier pour le reste)")
+    return [
+        ("decodage", ingest, args.ingest_workers),
+        ("transcription", transcribe, args.transcription_workers),
+        ("diarisation", diarize, args.diarization_workers),
+        ("export", export, args.export_workers),
+    ]
 
-        segments = []
-        for t, spk in zip(transcript_segments, assigned_speakers):
-            segments.append({
-                "start": float(t["start"]),
-                "end": float(t["end"]),
-                "speaker": spk,
-                "text": t.get("text", "")
-            })
 
-        segments_merged = merge_by_runs(segments)
+def run_scheduled_batch(args, jobs):
+    """Mode batch ordonnancé : étapes en pipeline avec concurrence bornée par étape."""
+    torch = torch_cpu_setup()
 
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(header)
-            f.write("Temps de parole par speaker :\n")
-            for speaker, duration in speaker_durations_formatted.items():
-                f.write(f"Speaker {speaker}: {duration}\n")
+    hf_token = get_hf_token(args) if not args.transcription_only else None
 
-            f.write("\nTranscription fusionnee par speaker :\n\n")
-            for s in segments_merged:
-                f.write(f"[{hhmmss(s['start'])}-{hhmmss(s['end'])}] {s['speaker']}: {s['text'].strip()}\n")
+    print(f"Ordonnanceur : decodage x{args.ingest_workers}, transcription x{args.transcription_workers}, "
+          f"diarisation x{args.diarization_workers}, export x{args.export_workers}, "
+          f"files de {args.queue_size} job(s), {torch.get_num_threads()} thread(s) torch par worker")
 
-        print(f"\nOK Transcription complete sauvegardee dans : {output_file}")
+    scheduler = StageScheduler(scheduled_stages(args, hf_token), queue_size=args.queue_size, on_error=finish_job)
 
-        # Sous-titres (basés sur segments fusionnés)
-        subs_segments = [
-            {"start": float(s["start"]), "end": float(s["end"]), "text": (s.get("text", "") or "").strip(), "speaker": s.get("speaker")}
-            for s in (segments_merged or [])
-        ]
-        write_subtitles_if_requested(args, output_file, subs_segments, include_speaker=include_speaker_in_subs)
-
-        json_payload = {
-            "meta": {**json_meta, "mode": "transcription_and_diarization", "audio_duration_seconds": audio_total_duration},
-            "speakers": [
-                {"speaker": spk, "duration_seconds": float(dur), "duration_hhmmss": speaker_durations_formatted[spk]}
-                for spk, dur in speaker_durations.items()
-            ],
-            "segments_merged": [
-                {
-                    "speaker": s["speaker"],
-                    "start": float(s["start"]),
-                    "end": float(s["end"]),
-                    "start_hhmmss": hhmmss(float(s["start"])),
-                    "end_hhmmss": hhmmss(float(s["end"])),
-                    "text": (s.get("text", "") or "").strip(),
-                }
-                for s in (segments_merged or [])
-            ],
-        }
-        write_json_if_requested(args, output_file, json_payload)
+    prepared = []
+    for idx, (inp, outp) in enumerate(jobs, 1):
+        try:
+            job = new_job(args, inp, outp)
+        except SystemExit:
+            job = {"input": inp, "output": outp, "audio_duration_seconds": 0.0, "stage_seconds": {},
+                   "started": time.perf_counter(), "status": "ERREUR"}
+            prepared.append(job)
+            continue
+        job["index"] = f"{idx}/{len(jobs)}"
+        size = os.path.getsize(inp)
+        priority = {"fifo": idx, "shortest": size, "longest": -size}[args.schedule_order]
+        scheduler.submit(job, priority=priority)
+
+    started = time.perf_counter()
+    done = scheduler.run() + prepared
+    wall = time.perf_counter() - started
+
+    # Ordre du batch d'origine dans le récapitulatif
+    order = {inp: k for k, (inp, _) in enumerate(jobs)}
+    done.sort(key=lambda job: order.get(job["input"], 0))
+    rows = []
+    for job in done:
+        row = job_summary(job)
+        row["status"] = job.get("status", "OK")
+        rows.append(row)
+
+    busy = {}
+    for job in done:
+        for name, seconds in job["stage_seconds"].items():
+            busy[name] = busy.get(name, 0.0) + seconds
+    print("\nTemps cumules par etape (tous fichiers) :")
+    for name, seconds in busy.items():
+        print(f"- {name} : {seconds:.1f}s")
+    print(f"- mur total : {wall:.1f}s")
+
+    return rows
 
-        total_speech_duration = sum(speaker_durations.values())
-        average_duration = total_speech_duration / len(speaker_durations) if speaker_durations else 0.0
 
-        print(f"\nResume global :")
-        print(f"- Duree totale de l'audio analyse : {str(datetime.timedelta(seconds=int(audio_total_duration)))}")
-        print(f"- Somme des temps de parole (tous speakers cumules) : {str(datetime.timedelta(seconds=int(total_speech_duration)))}")
-        print(f"- Nombre de speakers : {len(speaker_durations)}")
-        print(f"- Duree moyenne par speaker : {str(datetime.timedelta(seconds=int(average_duration)))}")
+# =============================
+#   Mode batch
+# =============================
 
-    # --- Nettoyage fichiers temporaires (TOUS) ---
-    if keep_temp:
-        for p in temp_files:
-            print(f"\nFichier temporaire conserve : {p}")
+MEDIA_EXTENSIONS = (
+    ".wav", ".mp3", ".m4a", ".aac", ".flac", ".ogg", ".opus", ".wma",
+    ".mp4", ".mkv", ".mov", ".avi", ".flv", ".webm",
+)
+
+
+def _default_output_for(input_path: str, output_dir: str = None) -> str:
+    base = os.path.splitext(os.path.basename(input_path))[0] + ".txt"
+    return os.path.join(output_dir or os.path.dirname(os.path.abspath(input_path)), base)
+
+
+def read_manifest(manifest_path: str):
+    """Lit un manifeste : 'entree' ou 'entree<TAB>sortie' (ou 'entree,sortie') par ligne."""
+    pairs = []
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for raw in f:
+            line = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split("\t") if "\t" in line else line.split(",")
+            inp = parts[0].strip()
+            outp = parts[1].strip() if len(parts) > 1 and parts[1].strip() else None
+            if not os.path.isabs(inp):
+                inp = os.path.join(base_dir, inp)
+            if outp and not os.path.isabs(outp):
+                outp = os.path.join(base_dir, outp)
+            pairs.append((inp, outp))
+    return pairs
+
+
+def collect_batch_jobs(source: str, output_dir: str = None, recursive: bool = False):
+    """Retourne la liste des couples (entree, sortie) à traiter pour le mode batch."""
+    if os.path.isdir(source):
+        inputs = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(MEDIA_EXTENSIONS):
+                    inputs.append(os.path.join(root, name))
+            if not recursive:
+                break
+        pairs = [(p, None) for p in inputs]
+    elif os.path.isfile(source) and not source.lower().endswith(MEDIA_EXTENSIONS):
+        pairs = read_manifest(source)
     else:
-        for p in temp_files:
+        pairs = [(p, None) for p in sorted(glob.glob(source, recursive=recursive)) if os.path.isfile(p)]
+
+    return [(inp, outp or _default_output_for(inp, output_dir)) for inp, outp in pairs]
+
+
+def print_batch_summary(rows, summary_path: str = None):
+    print("\n" + "=" * 88)
+    print("Recapitulatif batch :")
+    print(f"{'Fichier':<40} {'Duree audio':>12} {'Traitement':>12} {'RTF':>7}  Statut")
+    print("-" * 88)
+    total_audio = 0.0
+    total_proc = 0.0
+    for r in rows:
+        rtf = (r["processing_seconds"] / r["audio_duration_seconds"]) if r["audio_duration_seconds"] else 0.0
+        r["rtf"] = rtf
+        total_audio += r["audio_duration_seconds"]
+        total_proc += r["processing_seconds"]
+        name = os.path.basename(r["input"])
+        if len(name) > 40:
+            name = "..." + name[-37:]
+        print(f"{name:<40} {hhmmss(r['audio_duration_seconds']):>12} {r['processing_seconds']:>11.1f}s {rtf:>7.3f}  {r['status']}")
+    print("-" * 88)
+    total_rtf = (total_proc / total_audio) if total_audio else 0.0
+    print(f"{'TOTAL (' + str(len(rows)) + ' fichiers)':<40} {hhmmss(total_audio):>12} {total_proc:>11.1f}s {total_rtf:>7.3f}")
+
+    if summary_path:
+        with open(summary_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["input", "output", "audio_duration_seconds", "processing_seconds", "rtf", "status"])
+            for r in rows:
+                writer.writerow([
+                    r["input"], r["output"],
+                    f"{r['audio_duration_seconds']:.3f}", f"{r['processing_seconds']:.3f}",
+                    f"{r['rtf']:.4f}", r["status"],
+                ])
+        print(f"\nOK Recapitulatif sauvegarde dans : {summary_path}")
+
+
+def batch_main(argv=None):
+    args = parse_batch_args(argv)
+    check_backend_args(args)
+    configure_cpu(args)
+    with trace_session(args), progress_session(args):
+        run_batch(args)
+
+
+def run_batch(args):
+    jobs = collect_batch_jobs(args.source, output_dir=args.output_dir, recursive=args.recursive)
+    if not jobs:
+        print(f"ATTENTION Aucun fichier a traiter pour : {args.source}")
+        sys.exit(1)
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    print(f"Mode batch : {len(jobs)} fichier(s) a traiter.")
+
+    if args.scheduler:
+        rows = run_scheduled_batch(args, jobs)
+        print_batch_summary(rows, args.summary)
+        if any(r["status"] != "OK" for r in rows):
+            sys.exit(1)
+        return
+
+    # Chargement unique des modèles
+    load_started = time.perf_counter()
+    backend = None
+    pipeline = None
+    if not args.diarization_only and not args.long_form:
+        backend = load_job_backend(args)
+    if not args.transcription_only:
+        pipeline = load_diarization_pipeline(get_hf_token(args))
+    load_seconds = time.perf_counter() - load_started
+    print(f"OK Modeles charges en {load_seconds:.1f}s (une seule fois pour tout le batch).")
+
+    rows = []
+    for idx, (inp, outp) in enumerate(jobs, 1):
+        print("\n" + "=" * 88)
+        print(f"[{idx}/{len(jobs)}] {inp} -> {outp}")
+        started = time.perf_counter()
+        try:
+            row = process_file(args, inp, outp, backend=backend, pipeline=pipeline)
+            row["status"] = "OK"
+        except (Exception, SystemExit) as e:
+            # Un fichier en erreur ne doit pas interrompre le reste du batch.
+            print(f"ERREUR Traitement impossible pour {inp} : {e}")
+            row = {
+                "input": inp,
+                "output": outp,
+                "audio_duration_seconds": 0.0,
+                "processing_seconds": time.perf_counter() - started,
+                "status": "ERREUR",
+            }
+        rows.append(row)
+
+    print(f"\nChargement des modeles : {load_seconds:.1f}s")
+    print_batch_summary(rows, args.summary)
+
+    if any(r["status"] != "OK" for r in rows):
+        sys.exit(1)
+
+
+# =============================
+#   Mode render (sorties depuis les artefacts)
+# =============================
+
+def parse_render_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="whisperpyannote.py render",
+        description="Régénérer les sorties TXT/JSON/SRT/VTT à partir des segments bruts enregistrés "
+                    "(dossier <sortie>.artifacts), sans relancer Whisper ni Pyannote.",
+    )
+    parser.add_argument(
+        "source",
+        help="Fichier de sortie d'un traitement précédent (ex: reunion.txt) ou son dossier .artifacts."
+    )
+    parser.add_argument(
+        "output_file",
+        nargs="?",
+        help="Nouveau fichier texte de sortie, '-' pour la sortie standard (par défaut : celui du traitement d'origine)."
+    )
+    add_output_arguments(parser)
+
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument(
+        "--transcription_only",
+        action="store_true",
+        help="Rendre uniquement la transcription (sans speakers)."
+    )
+    mode_group.add_argument(
+        "--diarization_only",
+        action="store_true",
+        help="Rendre uniquement la diarisation (sans texte)."
+    )
+    return parser.parse_args(argv)
+
+
+def _read_artifact(artifacts_dir: str, manifest: dict, stage: str):
+    entry = manifest["stages"].get(stage)
+    if not entry:
+        return None
+    try:
+        with open(os.path.join(artifacts_dir, entry["file"]), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"ATTENTION Artefact {stage} illisible : {e}")
+        return None
+
+
+def render_main(argv=None):
+    args = parse_render_args(argv)
+    started = time.perf_counter()
+
+    artifacts_dir = args.source if os.path.isdir(args.source) else artifacts_dir_for_output(args.source)
+    manifest = load_artifacts_manifest(artifacts_dir)
+    if not manifest["stages"]:
+        print(f"ERREUR Aucun artefact trouve dans {artifacts_dir} (traitement lance avec --no_artifacts ?).")
+        sys.exit(1)
+
+    transcription = _read_artifact(artifacts_dir, manifest, "transcription")
+    diarization = _read_artifact(artifacts_dir, manifest, "diarization")
+    reference = _read_artifact(artifacts_dir, manifest, "ingest") or {}
+    transcript_segments = transcription["segments"] if transcription else None
+    speaker_segments = diarization["segments"] if diarization else None
+
+    # Sans mode explicite : le rendu le plus complet permis par les artefacts disponibles
+    if not args.transcription_only and not args.diarization_only:
+        args.transcription_only = speaker_segments is None
+        args.diarization_only = transcript_segments is None
+    if (not args.diarization_only and transcript_segments is None) or \
+            (not args.transcription_only and speaker_segments is None):
+        missing = "transcription" if transcript_segments is None else "diarisation"
+        print(f"ERREUR Artefact de {missing} absent de {artifacts_dir}.")
+        sys.exit(1)
+
+    output_file = args.output_file or manifest.get("output")
+    input_path = manifest.get("input") or reference.get("path") or output_file
+    t_params = manifest["stages"].get("transcription", {}).get("params", {})
+    language = t_params.get("language")
+    header, json_meta = build_output_header(input_path, t_params.get("whisper_model", "-"),
+                                            None if language == "auto" else language)
+
+    check_output_args(args, output_file)
+    common = (args, output_file, header, json_meta, float(reference.get("duration_seconds") or 0.0))
+    with stdout_reserved_for(output_file):
+        if args.transcription_only:
+            export_transcription_only(*common, transcript_segments)
+        elif args.diarization_only:
+            export_diarization_only(*common, speaker_segments)
+        else:
+            export_full(*common, transcript_segments, speaker_segments)
+        print(f"\nOK Rendu depuis {artifacts_dir} en {time.perf_counter() - started:.2f}s (sans inference).")
+
+
+# =============================
+#   Mode live (micro, flux réseau, stdin)
+# =============================
+
+LIVE_EMBEDDING_MODEL = "pyannote/wespeaker-voxceleb-resnet34-LM"
+DEFAULT_LIVE_LATENCY = 3.0
+LIVE_READ_SECONDS = 0.1          # granularité de lecture de ffmpeg
+LIVE_TAIL_SILENCE = 1.0          # audio gardé en fin de fenêtre quand rien n'est reconnu
+LIVE_MIN_EMBEDDING_SECONDS = 0.5  # en dessous, le segment garde le speaker précédent
+LIVE_PROMPT_CHARS = 200
+RAW_PCM_FORMATS = ("s16le", "f32le")
+
+
+def parse_live_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="whisperpyannote.py live",
+        description="Transcription et diarisation en direct : micro, stdin ou flux lu par ffmpeg. "
+                    "Les segments sont émis au fil de l'eau avec une latence bornée.",
+    )
+    parser.add_argument(
+        "source",
+        nargs="?",
+        help="Flux ou fichier lu par ffmpeg (rtsp://, udp://, srt://, http://, chemin...) ou '-' pour stdin."
+    )
+    parser.add_argument(
+        "--device",
+        help="Périphérique de capture ffmpeg 'pilote:nom' (ex: pulse:default, alsa:hw:0, "
+             "avfoundation::0, 'dshow:audio=Microphone'). Remplace source."
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Lire source à la vitesse réelle (ffmpeg -re) : rejoue un fichier comme un flux, pour tester hors ligne."
+    )
+    parser.add_argument(
+        "--input_format",
+        help="Format d'entrée forcé pour ffmpeg (-f), nécessaire pour du PCM brut sur stdin (s16le, f32le)."
+    )
+    parser.add_argument(
+        "--input_rate",
+        type=int,
+        default=SAMPLE_RATE,
+        help=f"Fréquence d'échantillonnage du PCM brut (avec --input_format s16le/f32le, par défaut : {SAMPLE_RATE})."
+    )
+    parser.add_argument(
+        "--output_file",
+        help="Fichier texte mis à jour à chaque segment validé, puis réécrit en fin de session avec la "
+             "transcription finale fusionnée par speaker (même format que le mode fichier)."
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=DEFAULT_LIVE_LATENCY,
+        help="Latence cible en secondes entre la fin d'une phrase et son émission ; au-delà, le texte "
+             f"est validé même s'il n'est pas encore stable (par défaut : {DEFAULT_LIVE_LATENCY:g})."
+    )
+    parser.add_argument(
+        "--step",
+        type=float,
+        help="Intervalle en secondes d'audio entre deux passes Whisper (par défaut : la moitié de --latency)."
+    )
+    parser.add_argument(
+        "--max_duration",
+        type=float,
+        help="Arrêter après cette durée d'audio en secondes (par défaut : jusqu'à la fin du flux ou Ctrl+C)."
+    )
+    parser.add_argument(
+        "--whisper_model",
+        default="small",
+        choices=["tiny", "base", "small", "medium", "large", "turbo"],
+        help="Modèle Whisper (par défaut : small, pour tenir la latence sur CPU)."
+    )
+    add_backend_argument(parser)
+    parser.add_argument(
+        "--quantize",
+        choices=list(QUANTIZE_MODES),
+        help="Whisper quantifié pour l'inférence CPU ('int8'), cf. le mode fichier."
+    )
+    parser.add_argument(
+        "--language",
+        help="Forcer la langue (recommandé en direct : évite une détection sur quelques secondes d'audio)."
+    )
+    parser.add_argument(
+        "--no_diarization",
+        action="store_true",
+        help="Ne pas attribuer de speakers (transcription seule)."
+    )
+    parser.add_argument(
+        "--speaker_threshold",
+        type=float,
+        default=0.5,
+        help="Distance cosinus maximale entre un segment et un speaker connu pour le lui attribuer ; "
+             "au-delà un nouveau speaker est créé (par défaut : 0.5)."
+    )
+    parser.add_argument(
+        "--max_speakers",
+        type=int,
+        help="Nombre maximal de speakers : ensuite chaque segment va au speaker le plus proche."
+    )
+    parser.add_argument(
+        "--hf_token",
+        help="Token Hugging Face pour le modèle d'embedding des speakers."
+    )
+    parser.add_argument(
+        "--ask_token",
+        action="store_true",
+        help="Forcer la demande interactive du token Hugging Face si absent"
+    )
+    add_output_arguments(parser)
+    add_cpu_arguments(parser)
+
+    args = parser.parse_args(argv)
+    if bool(args.source) == bool(args.device):
+        parser.error("indiquer soit une source (fichier, URL ou '-'), soit --device")
+    if args.output_format not in ("txt", "jsonl"):
+        parser.error("--output_format doit valoir txt ou jsonl en mode live (SRT/VTT : --srt / --vtt)")
+    if args.output_file is None and (args.json or args.jsonl or args.srt or args.vtt):
+        parser.error("--json, --jsonl, --srt et --vtt demandent --output_file")
+    if args.word_speakers:
+        parser.error("--word_speakers n'est pas disponible en mode live (un speaker par segment)")
+    # Mêmes attributs que les autres modes pour les fonctions d'export
+    args.transcription_only = args.no_diarization
+    args.diarization_only = False
+    return args
+
+
+def live_source_command(args) -> list:
+    """Commande ffmpeg qui produit le flux mono 16 kHz float32 sur stdout."""
+    command = ["ffmpeg", "-loglevel", "error"]
+    if args.source != "-":
+        command.append("-nostdin")
+    command += ffmpeg_thread_args()
+    if args.device:
+        driver, _, name = args.device.partition(":")
+        if not driver or not name:
+            print(f"ERREUR --device attendu sous la forme 'pilote:nom' (recu : {args.device}).")
+            sys.exit(1)
+        command += ["-f", driver, "-i", name]
+    else:
+        if args.replay:
+            command.append("-re")
+        if args.input_format:
+            command += ["-f", args.input_format]
+            if args.input_format in RAW_PCM_FORMATS:
+                command += ["-ar", str(args.input_rate), "-ac", "1"]
+        command += ["-i", "pipe:0" if args.source == "-" else args.source]
+    command += ["-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "f32le", "-"]
+    return command
+
+
+class LiveAudioSource:
+    """
+    Lit ffmpeg en continu dans un thread. Seul l'audio non encore validé est gardé :
+    release() libère tout ce qui précède un échantillon donné.
+    """
+
+    def __init__(self, command, from_stdin: bool = False):
+        self.proc = subprocess.Popen(
+            command,
+            stdin=None if from_stdin else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self.cond = threading.Condition()
+        self.audio = np.zeros(0, dtype=np.float32)
+        self.offset = 0           # index (en échantillons depuis le début du flux) de self.audio[0]
+        self.received = 0
+        self.eof = False
+        self.arrivals = []        # (échantillons reçus, instant de réception) pour mesurer la latence
+        self.errors = []
+        threading.Thread(target=lambda: self.errors.append(self.proc.stderr.read()), daemon=True).start()
+        self.reader = threading.Thread(target=self._read, name="live-source", daemon=True)
+        self.reader.start()
+
+    def _read(self):
+        block = int(SAMPLE_RATE * LIVE_READ_SECONDS) * 4
+        pending = b""
+        try:
+            while True:
+                data = self.proc.stdout.read(block)
+                if not data:
+                    break
+                pending += data
+                usable = len(pending) - len(pending) % 4
+                samples = np.frombuffer(pending[:usable], dtype=np.float32)
+                pending = pending[usable:]
+                with self.cond:
+                    self.audio = np.concatenate([self.audio, samples])
+                    self.received += len(samples)
+                    self.arrivals.append((self.received, time.monotonic()))
+                    self.cond.notify_all()
+        finally:
+            with self.cond:
+                self.eof = True
+                self.cond.notify_all()
+
+    def wait_for(self, samples: int) -> bool:
+        """Attend que `samples` échantillons soient reçus ; False si le flux s'est terminé avant."""
+        with self.cond:
+            while self.received < samples and not self.eof:
+                self.cond.wait(0.5)
+            return self.received >= samples
+
+    def window(self, start: int) -> np.ndarray:
+        """Audio reçu depuis l'échantillon `start` (copie, le thread de lecture continue d'ajouter)."""
+        with self.cond:
+            return self.audio[max(0, start - self.offset):].copy()
+
+    def release(self, before: int):
+        with self.cond:
+            drop = min(max(0, before - self.offset), len(self.audio))
+            self.audio = self.audio[drop:]
+            self.offset += drop
+            keep = bisect.bisect_left(self.arrivals, (before, 0.0))
+            del self.arrivals[:max(0, keep - 1)]
+
+    def arrival_time(self, sample: int) -> float:
+        """Instant où l'échantillon `sample` est arrivé (base de la mesure de latence)."""
+        with self.cond:
+            i = bisect.bisect_left(self.arrivals, (sample, 0.0))
+            return self.arrivals[min(i, len(self.arrivals) - 1)][1] if self.arrivals else time.monotonic()
+
+    def close(self) -> int:
+        if self.proc.poll() is None:
+            self.proc.terminate()
+        code = self.proc.wait()
+        self.reader.join()  # ffmpeg arrêté : le thread de lecture voit la fin du flux
+        self.proc.stdout.close()
+        return code
+
+
+class OnlineSpeakerClustering:
+    """
+    Diarisation incrémentale : chaque segment validé est représenté par un embedding de voix
+    et rattaché au speaker dont le centroïde est le plus proche (distance cosinus), sinon à un
+    nouveau speaker. Les centroïdes sont mis à jour au fil de la session.
+    """
+
+    def __init__(self, embed, threshold: float = 0.5, max_speakers: int = None):
+        self.embed = embed
+        self.threshold = threshold
+        self.max_speakers = max_speakers
+        self.centroids = []
+        self.counts = []
+        self.last = None
+
+    @cpu_stage("diarization")
+    def assign(self, audio: np.ndarray) -> str:
+        if len(audio) < LIVE_MIN_EMBEDDING_SECONDS * SAMPLE_RATE:
+            return self.last or self._new(None)
+        vector = np.asarray(self.embed(audio), dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vector))
+        if not np.isfinite(norm) or norm == 0.0:
+            return self.last or self._new(None)
+        vector /= norm
+
+        if self.centroids:
+            distances = 1.0 - np.stack(self.centroids) @ vector
+            best = int(np.argmin(distances))
+            full = self.max_speakers is not None and len(self.centroids) >= self.max_speakers
+            if distances[best] <= self.threshold or full:
+                n = self.counts[best]
+                centroid = self.centroids[best] * n + vector
+                self.centroids[best] = centroid / (np.linalg.norm(centroid) or 1.0)
+                self.counts[best] = n + 1
+                self.last = f"SPEAKER_{best:02d}"
+                return self.last
+        return self._new(vector)
+
+    def _new(self, vector):
+        if vector is None:
+            vector = np.zeros(0, dtype=np.float32)
+        if vector.size:
+            self.centroids.append(vector)
+            self.counts.append(1)
+            index = len(self.centroids) - 1
+        else:
+            index = max(0, len(self.centroids) - 1)
+        self.last = f"SPEAKER_{index:02d}"
+        return self.last
+
+
+@cpu_stage("diarization")
+def load_speaker_embedding(hf_token: str):
+    """Modèle d'embedding de voix Pyannote : fonction audio float32 16 kHz -> vecteur."""
+    import torch
+    from pyannote.audio import Inference, Model
+
+    print(f"\nChargement du modele d'embedding {LIVE_EMBEDDING_MODEL}...")
+    prepare_safe_globals()
+    try:
+        model = Model.from_pretrained(LIVE_EMBEDDING_MODEL, token=hf_token)
+    except Exception as e:
+        print(f"ERREUR lors du chargement de {LIVE_EMBEDDING_MODEL} :")
+        print(e)
+        sys.exit(1)
+    inference = Inference(model, window="whole", device=diarization_device())
+
+    def embed(audio: np.ndarray):
+        return inference({"waveform": torch.from_numpy(np.ascontiguousarray(audio))[None], "sample_rate": SAMPLE_RATE})
+
+    return embed
+
+
+class LiveTranscriber:
+    """
+    Whisper sur une fenêtre glissante qui commence au dernier texte validé.
+    Un segment est validé quand il est suivi d'un autre segment, quand deux passes successives
+    donnent le même texte, ou quand attendre davantage dépasserait la latence cible.
+    """
+
+    def __init__(self, backend: TranscriptionBackend, language: str = None, latency: float = DEFAULT_LIVE_LATENCY):
+        self.backend = backend
+        self.language = language
+        self.latency = latency
+        self.committed_until = 0.0   # secondes depuis le début du flux
+        self.previous = []            # hypothèse non validée de la passe précédente
+        self.prompt = ""
+        self.passes = 0
+        self.inference_seconds = 0.0
+
+    @staticmethod
+    def _same_text(a: str, b: str) -> bool:
+        return re.sub(r"\W+", " ", a).strip().lower() == re.sub(r"\W+", " ", b).strip().lower()
+
+    def _agrees(self, seg) -> bool:
+        return any(self._same_text(seg["text"], p["text"]) and abs(seg["start"] - p["start"]) < 0.5
+                   for p in self.previous)
+
+    @cpu_stage("transcription")
+    def step(self, window: np.ndarray, window_start: float, final: bool = False):
+        """Transcrit la fenêtre et retourne la liste des segments nouvellement validés."""
+        window_end = window_start + len(window) / SAMPLE_RATE
+        started = time.perf_counter()
+        result = self.backend.transcribe(window, language=self.language, prompt=self.prompt, streaming=True)
+        self.inference_seconds += time.perf_counter() - started
+        self.passes += 1
+
+        hypothesis = []
+        for s in result.get("segments", []):
+            text = (s.get("text", "") or "").strip()
+            if not text:
+                continue
+            start = max(self.committed_until, window_start + float(s["start"]))
+            end = min(window_end, max(start, window_start + float(s["end"])))
+            hypothesis.append({"start": start, "end": end, "text": text})
+
+        committed = []
+        for i, seg in enumerate(hypothesis):
+            followed = i < len(hypothesis) - 1
+            overdue = window_end - seg["start"] >= self.latency
+            if final or followed or overdue or self._agrees(seg):
+                committed.append(seg)
+            else:
+                break
+        self.previous = hypothesis[len(committed):]
+
+        if committed:
+            self.committed_until = committed[-1]["end"]
+            text = " ".join(s["text"] for s in committed)
+            self.prompt = (self.prompt + " " + text)[-LIVE_PROMPT_CHARS:]
+        elif not hypothesis and window_end - self.committed_until > self.latency:
+            # Silence : on avance en gardant un peu d'audio au cas où une phrase commence
+            self.committed_until = max(self.committed_until, window_end - LIVE_TAIL_SILENCE)
+        if final:
+            self.committed_until = window_end
+        return committed
+
+
+def _embedding_slice(window: np.ndarray, a: int, b: int) -> np.ndarray:
+    """Audio d'un segment, élargi à la fenêtre voisine s'il est trop court pour un embedding fiable."""
+    min_len = int(LIVE_MIN_EMBEDDING_SECONDS * SAMPLE_RATE)
+    if b - a < min_len:
+        a = max(0, min(a - (min_len - (b - a)) // 2, len(window) - min_len))
+        b = min(len(window), a + min_len)
+    return window[a:b]
+
+
+def _percentile(values, q: float) -> float:
+    return float(np.percentile(np.asarray(values, dtype=np.float64), q)) if values else 0.0
+
+
+def live_main(argv=None):
+    args = parse_live_args(argv)
+    check_backend_args(args)
+    with stdout_reserved_for(STDOUT_PATH):
+        configure_cpu(args)
+        run_live(args)
+
+
+def run_live(args, backend: TranscriptionBackend = None, embed=None) -> dict:
+    """
+    Boucle live. backend (moteur de transcription chargé) et embed (audio -> vecteur de voix)
+    peuvent être fournis, sinon ils sont chargés ici. Retourne le bilan de la session.
+    """
+    step = args.step or max(0.5, args.latency / 2)
+    if backend is None:
+        backend = load_job_backend(args)
+    transcriber = LiveTranscriber(backend, language=args.language, latency=args.latency)
+    speakers = None
+    if not args.no_diarization:
+        if embed is None:
+            embed = load_speaker_embedding(get_hf_token(args))
+        speakers = OnlineSpeakerClustering(embed, threshold=args.speaker_threshold, max_speakers=args.max_speakers)
+
+    mode = "transcription_only" if args.no_diarization else "full"
+    if args.no_diarization:
+        format_line = lambda s: f"[{hhmmss(s['start'])}-{hhmmss(s['end'])}] {s['text'].strip()}"
+    else:
+        format_line = lambda s: f"[{hhmmss(s['start'])}-{hhmmss(s['end'])}] {s['speaker']}: {s['text'].strip()}"
+
+    def live_writer(path: str, kind: str):
+        if kind == "jsonl":
+            return JsonlWriter(path, mode)
+        if kind in ("srt", "vtt"):
+            return (SrtWriter if kind == "srt" else VttWriter)(path, include_speaker=not args.subs_no_speaker)
+        return TxtWriter(path, "", format_line)
+
+    # Sorties au fil de l'eau : stdout, le fichier de sortie et les sous-titres éventuels
+    writers = [live_writer(STDOUT_PATH, args.output_format)]
+    if args.output_file:
+        writers.append(live_writer(args.output_file, args.output_format))
+        for kind in ("srt", "vtt"):
+            if getattr(args, kind):
+                writers.append(live_writer(replace_ext(args.output_file, "." + kind), kind))
+
+    source_label = f"peripherique {args.device}" if args.device else ("stdin" if args.source == "-" else args.source)
+    print(f"\nOK Live : {source_label} (latence cible {args.latency:g}s, passe Whisper toutes les {step:g}s). "
+          f"Ctrl+C pour arreter.")
+    source = LiveAudioSource(live_source_command(args), from_stdin=args.source == "-")
+
+    segments = []
+    latencies = []
+
+    def commit(end_sample: int, final: bool):
+        start_sample = int(round(transcriber.committed_until * SAMPLE_RATE))
+        window = source.window(start_sample)[:max(0, end_sample - start_sample)]
+        if len(window):
+            window_start = start_sample / SAMPLE_RATE
+            for seg in transcriber.step(window, window_start, final=final):
+                seg["speaker"] = None
+                if speakers is not None:
+                    a = int((seg["start"] - window_start) * SAMPLE_RATE)
+                    b = int((seg["end"] - window_start) * SAMPLE_RATE)
+                    seg["speaker"] = speakers.assign(_embedding_slice(window, a, b))
+                segments.append(seg)
+                for w in writers:
+                    w.write(seg)
+                    w.f.flush()
+                latencies.append(time.monotonic() - source.arrival_time(int(seg["end"] * SAMPLE_RATE)))
+        source.release(int(transcriber.committed_until * SAMPLE_RATE))
+
+    limit = int(args.max_duration * SAMPLE_RATE) if args.max_duration else None
+    next_pass = 0
+    final = False
+    try:
+        while not final:
+            target = next_pass + int(step * SAMPLE_RATE)
+            if limit is not None:
+                target = min(target, limit)
+            final = not source.wait_for(target) or (limit is not None and target >= limit)
+            # Si l'inférence a pris du retard, la passe couvre tout l'audio arrivé entre-temps
+            next_pass = max(target, source.received)
+            if limit is not None:
+                next_pass = min(next_pass, limit)
+            commit(next_pass, final)
+    except KeyboardInterrupt:
+        print("\nArret demande, validation du texte en attente...")
+        commit(source.received, True)
+    finally:
+        code = source.close()
+        for w in writers:
+            w.close()
+
+    audio_seconds = source.received / SAMPLE_RATE
+    if source.received == 0 and code != 0:
+        message = b"".join(source.errors).decode("utf-8", "replace").strip()
+        print(f"ERREUR ffmpeg n'a produit aucun audio (code={code}) : {message}")
+        sys.exit(1)
+
+    # Transcription finale : mêmes fusion par speaker et formats que le mode fichier
+    if args.output_file:
+        input_label = args.device or args.source
+        header, json_meta = build_output_header(input_label, backend_model_label(args), args.language)
+        transcript = [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in segments]
+        common = (args, args.output_file, header, {**json_meta, "live": True}, audio_seconds)
+        if args.no_diarization:
+            export_transcription_only(*common, transcript)
+        else:
+            speaker_segments = [{"start": s["start"], "end": s["end"], "speaker": s["speaker"]} for s in segments]
+            export_full(*common, transcript, speaker_segments, assigned_speakers=[s["speaker"] for s in segments])
+
+    print("\nBilan live :")
+    print(f"- Audio recu : {hhmmss(audio_seconds)} ; segments valides : {len(segments)}"
+          + (f" ; speakers : {len({s['speaker'] for s in segments})}" if speakers is not None else ""))
+    if transcriber.passes:
+        rtf = transcriber.inference_seconds / audio_seconds if audio_seconds else 0.0
+        print(f"- Passes Whisper : {transcriber.passes} "
+              f"({transcriber.inference_seconds / transcriber.passes:.2f}s en moyenne, RTF {rtf:.2f})")
+    if latencies:
+        p50, p95 = _percentile(latencies, 50), _percentile(latencies, 95)
+        print(f"- Latence fin de phrase -> emission : mediane {p50:.1f}s, p95 {p95:.1f}s, max {max(latencies):.1f}s")
+        if p95 > args.latency + step:
+            print("ATTENTION Latence au-dela de la cible : modele plus petit (--whisper_model), --step plus grand "
+                  "ou GPU conseilles.")
+
+    return {
+        "audio_seconds": audio_seconds,
+        "segments": segments,
+        "passes": transcriber.passes,
+        "inference_seconds": transcriber.inference_seconds,
+        "latencies": latencies,
+    }
+
+
+# =============================
+#   Mode serveur (modèles résidents)
+# =============================
+
+DEFAULT_SERVE_PORT = 8765
+
+
+class WarmModels:
+    """Modèles gardés en mémoire d'un job à l'autre (mode serveur)."""
+
+    def __init__(self, hf_token: str = None):
+        self.hf_token = hf_token
+        self.whisper = {}
+        self.pipeline = None
+
+    def get_backend(self, name: str, whisper_model_choice: str, quantize: str = None, cache_dir: str = None):
+        key = f"{whisper_model_choice}-{quantize}" if quantize else whisper_model_choice
+        if name != DEFAULT_BACKEND:
+            key = f"{name}:{key}"
+        if key not in self.whisper:
+            self.whisper[key] = load_transcription_backend(name, whisper_model_choice, quantize=quantize,
+                                                           cache_dir=cache_dir)
+        return self.whisper[key]
+
+    def get_pipeline(self, args=None):
+        if self.pipeline is None:
+            token = self.hf_token or (getattr(args, "hf_token", None) or "").strip() or None
+            if not token:
+                raise RuntimeError("Aucun token Hugging Face : demarrer le serveur avec HF_TOKEN ou --hf_token.")
+            self.hf_token = token
+            self.pipeline = load_diarization_pipeline(token)
+        return self.pipeline
+
+
+def collect_artifacts(args, output_file: str, include_content: bool = True) -> dict:
+    """Fichiers produits par process_file() (sortie principale toujours, JSON/JSONL/SRT/VTT si demandés)."""
+    paths = {getattr(args, "output_format", "txt"): output_file}
+    if getattr(args, "json", False):
+        paths["json"] = json_path_for_output(output_file)
+    if getattr(args, "jsonl", False):
+        paths["jsonl"] = replace_ext(output_file, ".jsonl")
+    if getattr(args, "srt", False) and not args.diarization_only:
+        paths["srt"] = replace_ext(output_file, ".srt")
+    if getattr(args, "vtt", False) and not args.diarization_only:
+        paths["vtt"] = replace_ext(output_file, ".vtt")
+
+    artifacts = {}
+    for kind, path in paths.items():
+        if not os.path.exists(path):
+            continue
+        entry = {"path": os.path.abspath(path)}
+        if include_content:
+            with open(path, "r", encoding="utf-8") as f:
+                entry["content"] = f.read()
+        artifacts[kind] = entry
+    return artifacts
+
+
+def _job_cpu_options(args) -> list:
+    """Options CPU (cf. add_cpu_arguments) passées avec une valeur autre que celle par défaut."""
+    parser = argparse.ArgumentParser(add_help=False)
+    add_cpu_arguments(parser)
+    defaults = vars(parser.parse_args([]))
+    return [f"--{name}" for name, default in defaults.items() if getattr(args, name) != default]
+
+
+def run_job(job_args, warm: WarmModels, include_content: bool = True) -> dict:
+    """
+    Exécute un job décrit par les mêmes arguments que la ligne de commande
+    (cf. parse_args), avec les modèles déjà chargés de `warm`.
+    Le placement CPU est celui du serveur / worker, fixé à son démarrage : un job qui
+    passe des options CPU est refusé.
+    """
+    args = parse_args(job_args)
+    if args.output_file == STDOUT_PATH:
+        raise ValueError("la sortie '-' n'est pas disponible ici (stdout est reserve au protocole)")
+    cpu_options = _job_cpu_options(args)
+    if cpu_options:
+        raise ValueError(f"options CPU refusees pour un job ({', '.join(cpu_options)}) : le placement CPU "
+                         f"est fixe au demarrage du serveur / worker (a passer sur sa ligne de commande)")
+
+    check_backend_args(args)
+
+    backend = None
+    if not args.diarization_only and not args.long_form:
+        backend = warm.get_backend(args.backend, args.whisper_model, args.quantize, args.cache_dir)
+    pipeline = warm.get_pipeline(args) if not args.transcription_only else None
+
+    summary = process_file(args, args.input_path, args.output_file, backend=backend, pipeline=pipeline)
+    summary["artifacts"] = collect_artifacts(args, args.output_file, include_content=include_content)
+    return summary
+
+
+class _LineForwarder(io.TextIOBase):
+    """Flux texte qui transforme chaque ligne écrite en événement {"event": "log"}."""
+
+    def __init__(self, emit):
+        self._emit = emit
+        self._buffer = ""
+
+    def write(self, text):
+        self._buffer += text
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            if line.strip():
+                self._emit({"event": "log", "line": line})
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class JobRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    POST /jobs  {"args": [...mêmes arguments que la CLI...], "include_content": true}
+      -> flux NDJSON : queued / started / log... / done (artefacts) ou error
+    GET /health -> état du serveur et modèles chargés
+    """
+
+    server_version = "whisperpyannote"
+
+    def address_string(self):
+        # Socket Unix : client_address n'est pas un couple (hôte, port)
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def _send_json(self, code: int, payload: dict):
+        body = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/health":
+            self._send_json(404, {"error": "not found"})
+            return
+        warm = self.server.warm
+        self._send_json(200, {
+            "status": "ok",
+            "whisper_models": sorted(warm.whisper),
+            "diarization_pipeline": warm.pipeline is not None,
+            "jobs_waiting": self.server.jobs_waiting,
+        })
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+            job_args = [str(a) for a in request["args"]]
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"requete invalide : {e}"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.end_headers()
+
+        connected = [True]
+
+        def emit(event: dict):
+            if not connected[0]:
+                return
             try:
-                if p and os.path.exists(p) and p.startswith(tempfile.gettempdir()):
-                    os.unlink(p)
-                    print(f"\nFichier temporaire supprime : {p}")
-            except OSError as e:
-                print(f"\nATTENTION Impossible de supprimer le fichier temporaire {p} : {e}")
+                self.wfile.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # Le client est parti : le job continue, ses fichiers seront écrits.
+                connected[0] = False
+
+        server = self.server
+        with server.state_lock:
+            server.job_counter += 1
+            job_id = server.job_counter
+            server.jobs_waiting += 1
+            position = server.jobs_waiting
+        emit({"event": "queued", "job": job_id, "position": position})
+
+        # Un seul job à la fois : modèles partagés et sorties redirigées.
+        with server.job_lock:
+            with server.state_lock:
+                server.jobs_waiting -= 1
+            emit({"event": "started", "job": job_id})
+            forwarder = _LineForwarder(emit)
+            started = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(forwarder), contextlib.redirect_stderr(forwarder):
+                    result = run_job(job_args, server.warm,
+                                     include_content=bool(request.get("include_content", True)))
+            except SystemExit as e:
+                emit({"event": "error", "job": job_id, "message": f"job interrompu (code={e.code})"})
+            except Exception as e:
+                emit({"event": "error", "job": job_id, "message": str(e)})
+            else:
+                result["wall_seconds"] = time.perf_counter() - started
+                emit({"event": "done", "job": job_id, "result": result})
+
+    def log_message(self, format, *args):
+        # sys.__stdout__ : stdout peut être redirigé vers le flux d'un job en cours
+        print(f"[{self.address_string()}] {format % args}", file=sys.__stdout__, flush=True)
+
+
+class JobHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, warm: WarmModels):
+        super().__init__(address, JobRequestHandler)
+        self.warm = warm
+        self.job_lock = threading.Lock()
+        self.state_lock = threading.Lock()
+        self.job_counter = 0
+        self.jobs_waiting = 0
+
+
+if hasattr(socket, "AF_UNIX"):
+    class JobUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def __init__(self, path: str, warm: WarmModels):
+            super().__init__(path, JobRequestHandler)
+            self.warm = warm
+            self.job_lock = threading.Lock()
+            self.state_lock = threading.Lock()
+            self.job_counter = 0
+            self.jobs_waiting = 0
+
+
+def parse_serve_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="whisperpyannote.py serve",
+        description="Service local de transcription/diarisation gardant Whisper et Pyannote en mémoire.",
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Adresse d'écoute HTTP (par défaut : 127.0.0.1, accès local uniquement)."
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_SERVE_PORT,
+        help=f"Port HTTP (par défaut : {DEFAULT_SERVE_PORT})."
+    )
+    parser.add_argument(
+        "--socket",
+        help="Écouter sur ce socket Unix au lieu de TCP (Linux/macOS)."
+    )
+    parser.add_argument(
+        "--whisper_model",
+        default="turbo",
+        choices=["tiny", "base", "small", "medium", "large", "turbo"],
+        help="Modèle Whisper préchargé au démarrage (par défaut : turbo). Les autres sont chargés au premier job."
+    )
+    add_backend_argument(parser, preload=True)
+    parser.add_argument(
+        "--quantize",
+        choices=list(QUANTIZE_MODES),
+        help="Précharger la version quantifiée ('int8') du modèle Whisper (les jobs la demandent avec --quantize)."
+    )
+    parser.add_argument(
+        "--no_diarization",
+        action="store_true",
+        help="Ne pas précharger la pipeline Pyannote (chargée au premier job qui en a besoin)."
+    )
+    parser.add_argument(
+        "--hf_token",
+        help="Token Hugging Face passé directement en ligne de commande"
+    )
+    parser.add_argument(
+        "--ask_token",
+        action="store_true",
+        help="Forcer la demande interactive du token Hugging Face si absent"
+    )
+    add_cpu_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def serve_main(argv=None):
+    args = parse_serve_args(argv)
+    configure_cpu(args)
+
+    warm = WarmModels()
+    check_backend_args(args)
+    warm.get_backend(args.backend, args.whisper_model, args.quantize)
+    if not args.no_diarization:
+        warm.hf_token = get_hf_token(args)
+        warm.get_pipeline()
+
+    if args.socket:
+        if not hasattr(socket, "AF_UNIX"):
+            print("ERREUR Les sockets Unix ne sont pas disponibles sur cette plateforme.")
+            sys.exit(1)
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        server = JobUnixHTTPServer(args.socket, warm)
+        where = f"unix:{args.socket}"
+    else:
+        server = JobHTTPServer((args.host, args.port), warm)
+        where = f"http://{args.host}:{args.port}"
+
+    print(f"\nOK Serveur pret sur {where} (POST /jobs, GET /health). Ctrl+C pour arreter.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nArret du serveur.")
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+# =============================
+#   Mode worker (stdin/stdout, pour les interfaces)
+# =============================
+
+WORKER_PROTOCOL_VERSION = 1
+
+
+class _LockedStream:
+    """Flux partagé par plusieurs émetteurs : chaque write() est atomique et vidé aussitôt."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        with self.lock:
+            self.stream.write(text)
+            self.stream.flush()
+
+    def flush(self):
+        pass
+
+
+def parse_worker_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="whisperpyannote.py worker",
+        description="Processus de travail longue durée : lit des jobs JSON sur stdin (un par ligne) et "
+                    "répond en NDJSON sur stdout, en gardant les modèles chargés entre les jobs.",
+    )
+    parser.add_argument(
+        "--whisper_model",
+        choices=["tiny", "base", "small", "medium", "large", "turbo"],
+        help="Modèle Whisper à précharger au démarrage (par défaut : chargé au premier job)."
+    )
+    add_backend_argument(parser, preload=True)
+    parser.add_argument(
+        "--quantize",
+        choices=list(QUANTIZE_MODES),
+        help="Précharger la version quantifiée ('int8') du modèle Whisper (les jobs la demandent avec --quantize)."
+    )
+    parser.add_argument(
+        "--hf_token",
+        help="Token Hugging Face pour la diarisation (sinon HF_TOKEN, ou --hf_token dans les arguments du job)."
+    )
+    add_cpu_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def worker_main(argv=None):
+    """
+    Protocole (une ligne JSON par message) :
+      stdin  : {"id": "...", "args": [...mêmes arguments que la CLI...]}, {"cmd": "ping"}, {"cmd": "shutdown"}
+      stdout : ready, pong, puis pour chaque job started / log / stage_start / progress / stage_end / done ou error
+    Les messages texte du traitement deviennent des événements "log" : stdout reste réservé au protocole.
+    """
+    args = parse_worker_args(argv)
+    out = _LockedStream(sys.stdout)
+    base = ProgressReporter(out)
+
+    warm = WarmModels(hf_token=args.hf_token or os.environ.get("HF_TOKEN") or os.environ.get("HUGGINGFACE_TOKEN"))
+    with contextlib.redirect_stdout(_LineForwarder(lambda event: base.emit(**event))):
+        configure_cpu(args)
+        if args.whisper_model:
+            check_backend_args(args)
+            warm.get_backend(args.backend, args.whisper_model, args.quantize)
+    base.emit("ready", protocol=WORKER_PROTOCOL_VERSION, pid=os.getpid())
+
+    global _PROGRESS
+    for raw in sys.stdin:
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            request = json.loads(raw)
+        except ValueError as e:
+            base.emit("error", message=f"requete invalide : {e}")
+            continue
+
+        cmd = request.get("cmd")
+        if cmd == "shutdown":
+            break
+        if cmd == "ping":
+            base.emit("pong", whisper_models=sorted(warm.whisper), diarization_pipeline=warm.pipeline is not None)
+            continue
+
+        job_id = request.get("id")
+        reporter = ProgressReporter(out, id=job_id)
+        forwarder = _LineForwarder(lambda event: reporter.emit(**event))
+        reporter.emit("started")
+        started = time.perf_counter()
+        _PROGRESS = reporter  # événements de progression du job, avec son id
+        try:
+            with contextlib.redirect_stdout(forwarder), contextlib.redirect_stderr(forwarder):
+                result = run_job([str(a) for a in request["args"]], warm, include_content=False)
+        except SystemExit as e:
+            reporter.emit("error", message=f"job interrompu (code={e.code})")
+        except Exception as e:
+            reporter.emit("error", message=str(e))
+        else:
+            result["wall_seconds"] = time.perf_counter() - started
+            audio = result.get("audio_duration_seconds") or 0.0
+            result["rtf"] = result["processing_seconds"] / audio if audio else None
+            reporter.emit("done", result=result)
+        finally:
+            _PROGRESS = None
+
+    base.emit("bye")
+
+
+# =============================
+#   Fonction principale
+# =============================
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    subcommands = {"batch": batch_main, "live": live_main, "render": render_main, "serve": serve_main,
+                   "worker": worker_main}
+    if argv and argv[0] in subcommands:
+        return subcommands[argv[0]](argv[1:])
+
+    if "--capabilities" in argv:
+        print(json.dumps(capabilities(), ensure_ascii=False, indent=2))
+        return
+
+    args = parse_args(argv)
+    check_output_args(args, args.output_file)
+    check_backend_args(args)
+    with stdout_reserved_for(args.output_file):
+        configure_cpu(args)
+        process_file(args, args.input_path, args.output_file)
 
 
 if __name__ == "__main__":
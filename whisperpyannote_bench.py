@@ -0,0 +1,1011 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de whisperpyannote (sans téléchargement de modèles)
+Auteur : marcdelage
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+import contextlib
+import io
+
+import numpy as np
+
+import whisperpyannote as wp
+
+
+# =========================
+#   Données synthétiques
+# =========================
+
+def synthetic_timelines(n_segments: int, n_speakers: int = 4, seed: int = 0):
+    """
+    Génère une transcription et une diarisation synthétiques de n_segments chacune,
+    avec des tours de parole qui ne coïncident pas avec les segments Whisper.
+    """
+    rng = random.Random(seed)
+
+    transcript = []
+    t = 0.0
+    for _ in range(n_segments):
+        start = t + rng.uniform(0.0, 0.5)
+        end = start + rng.uniform(1.0, 6.0)
+        transcript.append({"start": start, "end": end, "text": "x"})
+        t = end
+
+    total = t
+    speakers = []
+    t = 0.0
+    step = total / max(1, n_segments)
+    for _ in range(n_segments):
+        start = t
+        end = start + step * rng.uniform(0.8, 1.6)
+        speakers.append({"speaker": f"SPEAKER_{rng.randrange(n_speakers):02d}", "start": start, "end": end})
+        t = start + step
+
+    return transcript, speakers
+
+
+def synthetic_word_timelines(n_words: int, words_per_segment: int = 12, n_speakers: int = 4, seed: int = 0):
+    """
+    Comme synthetic_timelines(), avec environ n_words mots horodatés ("words" de Whisper)
+    répartis dans les segments de transcription.
+    """
+    rng = random.Random(seed)
+    transcript, speakers = synthetic_timelines(max(1, n_words // words_per_segment), n_speakers, seed)
+    for seg in transcript:
+        n = rng.randint(1, 2 * words_per_segment - 1)
+        step = (seg["end"] - seg["start"]) / n
+        seg["words"] = [
+            {"word": f" m{i}", "start": seg["start"] + i * step, "end": seg["start"] + (i + 0.9) * step}
+            for i in range(n)
+        ]
+        seg["text"] = "".join(w["word"] for w in seg["words"])
+    return transcript, speakers
+
+
+def random_tied_timelines(rng: random.Random, n_speakers: int = 4):
+    """
+    Petite timeline aléatoire sur une grille de 0,1 s : tours qui se chevauchent (aussi pour
+    un même speaker), segments vides et mots entièrement dans la parole superposée, donc
+    beaucoup d'égalités exactes de recouvrement entre speakers.
+    """
+    def grid(a: float, b: float) -> float:
+        return round(rng.uniform(a, b), 1)
+
+    speakers = []
+    for _ in range(rng.randint(1, 16)):
+        start = grid(0.0, 20.0)
+        end = start if rng.random() < 0.05 else round(start + grid(0.1, 6.0), 1)
+        speakers.append({"speaker": f"S{rng.randrange(n_speakers)}", "start": start, "end": end})
+    words = []
+    for _ in range(rng.randint(1, 30)):
+        start = grid(0.0, 22.0)
+        words.append({"word": " m", "start": start, "end": round(start + grid(0.0, 1.5), 1)})
+    return words, speakers
+
+
+# =========================
+#   Alignement
+# =========================
+
+def naive_assign(transcript_segments, speaker_segments, threshold: float = wp.OVERLAP_THRESHOLD):
+    """Ancienne double boucle O(N·M) de main(), conservée comme référence."""
+    assigned = []
+    for t_segment in transcript_segments:
+        best_speaker = "inconnu"
+        best_score = 0.0
+        for s_segment in speaker_segments:
+            score = wp.segment_score(t_segment, s_segment)
+            if score > best_score and score > threshold:
+                best_score = score
+                best_speaker = s_segment["speaker"]
+        assigned.append(best_speaker)
+    return assigned
+
+
+def bench_alignment(sizes, naive_max: int):
+    print("\nAlignement transcription <-> speakers (N segments Whisper = M segments Pyannote)")
+    print(f"{'N':>10} | {'naive (s)':>14} | {'sweep best (s)':>14} | {'sweep accu (s)':>14} | {'gain':>10}")
+    print("-" * 74)
+
+    naive_ref = None  # (n, secondes) pour extrapoler en N^2
+    for n in sizes:
+        transcript, speakers = synthetic_timelines(n)
+
+        t0 = time.perf_counter()
+        sweep_best = wp.assign_speakers(transcript, speakers, strategy="best_segment")
+        t_best = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        wp.assign_speakers(transcript, speakers, strategy="accumulate")
+        t_accu = time.perf_counter() - t0
+
+        if n <= naive_max:
+            t0 = time.perf_counter()
+            naive = naive_assign(transcript, speakers)
+            t_naive = time.perf_counter() - t0
+            naive_ref = (n, t_naive)
+            if naive != sweep_best:
+                print(f"ERREUR Resultats differents entre naive et sweep (N={n})")
+                sys.exit(1)
+            naive_label = f"{t_naive:14.3f}"
+        elif naive_ref:
+            t_naive = naive_ref[1] * (n / naive_ref[0]) ** 2
+            naive_label = f"{t_naive:13.0f}~"
+        else:
+            t_naive = None
+            naive_label = f"{'-':>14}"
+
+        gain = f"x{t_naive / t_best:9.0f}" if t_naive and t_best > 0 else f"{'-':>10}"
+        print(f"{n:>10} | {naive_label} | {t_best:14.3f} | {t_accu:14.3f} | {gain}")
+
+    print("~ : extrapole en N^2 depuis la plus grande taille mesuree en naive.")
+
+
+def check_word_ties(cases: int, seed: int = 0):
+    """
+    Equivalence SpeakerActivity.assign() / assign_speakers() mot par mot sur des timelines
+    aléatoires avec égalités et chevauchements (les données du bench n'en ont pas).
+    """
+    rng = random.Random(seed)
+    for case in range(cases):
+        words, speakers = random_tied_timelines(rng)
+        reference = wp.assign_speakers(words, speakers)
+        activity = wp.SpeakerActivity(speakers)
+        codes = activity.assign(np.array([w["start"] for w in words]), np.array([w["end"] for w in words]))
+        lookup = [activity.labels[c] if c >= 0 else "inconnu" for c in codes]
+        if lookup != reference:
+            i = next(i for i, (a, b) in enumerate(zip(lookup, reference)) if a != b)
+            print(f"ERREUR Egalite departagee differemment (cas {case}) : mot {words[i]['start']}-{words[i]['end']}, "
+                  f"balayage {reference[i]}, recherche vectorisee {lookup[i]}")
+            print(f"Speakers : {speakers}")
+            sys.exit(1)
+    print(f"OK {cases} timelines aleatoires (egalites, chevauchements) : meme attribution que le balayage")
+
+
+def bench_word_alignment(sizes, fuzz_cases: int = 3000):
+    if fuzz_cases:
+        check_word_ties(fuzz_cases)
+
+    print("\nAttribution des speakers par segment vs mot par mot (--word_speakers)")
+    print(f"{'mots':>10} | {'segment (s)':>11} | {'mot sweep (s)':>13} | {'mot numpy (s)':>13} | "
+          f"{'total (s)':>9} | {'segments':>9} | {'tours':>9}")
+    print("-" * 92)
+
+    for n in sizes:
+        transcript, speakers = synthetic_word_timelines(n)
+        words = [w for seg in transcript for w in seg["words"]]
+
+        t0 = time.perf_counter()
+        wp.assign_speakers(transcript, speakers)
+        t_segment = time.perf_counter() - t0
+
+        # Référence : balayage assign_speakers() appliqué à chaque mot
+        t0 = time.perf_counter()
+        reference = wp.assign_speakers(words, speakers)
+        t_sweep = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        activity = wp.SpeakerActivity(speakers)
+        codes = activity.assign(np.array([w["start"] for w in words]), np.array([w["end"] for w in words]))
+        t_lookup = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        turns = wp.assign_word_speakers(transcript, speakers)
+        t_words = time.perf_counter() - t0
+
+        lookup = [activity.labels[c] if c >= 0 else "inconnu" for c in codes]
+        if lookup != reference:
+            print(f"ERREUR Resultats differents entre balayage et recherche vectorisee ({len(words)} mots)")
+            sys.exit(1)
+
+        print(f"{len(words):>10} | {t_segment:11.3f} | {t_sweep:13.3f} | {t_lookup:13.3f} | "
+              f"{t_words:9.3f} | {len(transcript):>9} | {len(turns):>9}")
+
+    print("segment : assign_speakers() (un speaker par segment) ; mot sweep : assign_speakers() sur chaque mot ;")
+    print("mot numpy : SpeakerActivity (recherche vectorisee) ; total : assign_word_speakers(), redecoupage")
+    print("du texte aux changements de speaker compris (segments -> tours).")
+
+
+# =========================
+#   Ingestion audio
+# =========================
+
+def make_synthetic_video(duration: float, out_path: str):
+    """Vidéo de test (petite image, audio stéréo 44.1kHz) générée par ffmpeg."""
+    subprocess.run([
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc=size=160x120:rate=5:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={duration}",
+        "-ac", "2", "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac",
+        "-shortest", out_path,
+    ], check=True)
+
+
+def _measure_ingest(input_path: str, ingest: str):
+    temp_files = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        t0 = time.perf_counter()
+        audio = wp.decode_audio(input_path, temp_files, ingest=ingest)
+        elapsed = time.perf_counter() - t0
+        written = sum(os.path.getsize(p) for p in temp_files if os.path.exists(p))
+        wp.cleanup_temp_files(temp_files, keep_temp=False)
+    return {
+        "seconds": elapsed,
+        "samples": len(audio),
+        "temp_written": written,
+        # Chaque WAV temporaire est écrit par ffmpeg puis relu.
+        "disk_io": 2 * written,
+    }
+
+
+def bench_ingest(input_path: str = None, duration: float = 1800.0):
+    generated = None
+    if not input_path:
+        fd, generated = tempfile.mkstemp(suffix=".mp4")
+        os.close(fd)
+        print(f"Generation d'une video synthetique de {wp.hhmmss(duration)}...")
+        make_synthetic_video(duration, generated)
+        input_path = generated
+
+    try:
+        size_mb = os.path.getsize(input_path) / (1024 * 1024)
+        print(f"\nIngestion de {os.path.basename(input_path)} ({size_mb:.1f} Mo)")
+        print(f"{'mode':<10} | {'temps (s)':>10} | {'WAV temporaire (Mo)':>20} | {'E/S disque (Mo)':>16}")
+        print("-" * 66)
+        results = {}
+        for ingest in ("tempfile", "pipe"):
+            r = _measure_ingest(input_path, ingest)
+            results[ingest] = r
+            print(f"{ingest:<10} | {r['seconds']:>10.2f} | {r['temp_written'] / (1024 * 1024):>20.1f} | "
+                  f"{r['disk_io'] / (1024 * 1024):>16.1f}")
+
+        if results["tempfile"]["samples"] != results["pipe"]["samples"]:
+            print("ATTENTION Nombre d'echantillons different entre les deux modes.")
+        saved = results["tempfile"]["disk_io"] - results["pipe"]["disk_io"]
+        print(f"\nE/S disque economisees par le pipe : {saved / (1024 * 1024):.1f} Mo, "
+              f"temps : {results['tempfile']['seconds']:.2f}s -> {results['pipe']['seconds']:.2f}s")
+    finally:
+        if generated and os.path.exists(generated):
+            os.unlink(generated)
+
+
+# =========================
+#   Pipeline complète (modèles de substitution)
+# =========================
+
+STUB_SPEAKER_FREQS = (140.0, 220.0, 330.0, 480.0)
+
+
+def make_synthetic_speech(duration: float, out_path: str, n_speakers: int = 2, seed: int = 0,
+                          max_pause: float = 1.0):
+    """
+    Audio de test encodé par ffmpeg (stéréo 44.1kHz, donc ré-échantillonné à l'ingestion) :
+    tours de parole de 2 à 8 s, un "locuteur" = une fréquence modulée, silences de 0.2 à
+    max_pause secondes entre les tours.
+    """
+    rng = np.random.default_rng(seed)
+    sr = wp.SAMPLE_RATE
+    audio = np.zeros(int(duration * sr), dtype=np.float32)
+    t = 0.0
+    while t < duration:
+        turn = rng.uniform(2.0, 8.0)
+        speaker = int(rng.integers(n_speakers))
+        a, b = int(t * sr), min(len(audio), int((t + turn) * sr))
+        x = np.arange(b - a, dtype=np.float32) / sr
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3.0 * x)  # rythme syllabique
+        audio[a:b] = 0.3 * envelope * np.sin(2 * np.pi * STUB_SPEAKER_FREQS[speaker] * x)
+        t += turn + rng.uniform(0.2, max_pause)
+    audio += 0.003 * rng.standard_normal(len(audio)).astype(np.float32)
+
+    subprocess.run([
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+        "-f", "f32le", "-ar", str(sr), "-ac", "1", "-i", "-",
+        "-ar", "44100", "-ac", "2", out_path,
+    ], input=audio.tobytes(), check=True)
+
+
+class _StubSegment:
+    def __init__(self, start: float, end: float):
+        self.start, self.end = start, end
+
+
+class _StubAnnotation:
+    def __init__(self, tracks):
+        self.tracks = tracks
+
+    def itertracks(self, yield_label: bool = False):
+        for start, end, speaker in self.tracks:
+            yield _StubSegment(start, end), None, speaker
+
+
+class StubDiarizationPipeline:
+    """
+    Remplaçant hors-ligne de Pyannote : fréquence dominante par fenêtre de 0.5 s
+    (taux de passages par zéro) rapprochée des fréquences des locuteurs synthétiques.
+    """
+
+    window_seconds = 0.5
+
+    def __call__(self, inputs, **kwargs):
+        waveform = inputs["waveform"]
+        audio = np.asarray(waveform.numpy() if hasattr(waveform, "numpy") else waveform, dtype=np.float32)
+        audio = audio.reshape(-1)
+        sr = inputs["sample_rate"]
+        frame = int(self.window_seconds * sr)
+        n = len(audio) // frame
+        frames = audio[:n * frame].reshape(n, frame)
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+        crossings = np.count_nonzero(np.diff(np.signbit(frames), axis=1), axis=1)
+        freqs = crossings / (2 * self.window_seconds)
+        labels = np.abs(freqs[:, None] - np.array(STUB_SPEAKER_FREQS)[None, :]).argmin(axis=1)
+        labels[rms < 0.02] = -1
+
+        tracks = []
+        for i, label in enumerate(labels.tolist()):
+            if label < 0:
+                continue
+            start, end = i * self.window_seconds, (i + 1) * self.window_seconds
+            speaker = f"SPEAKER_{label:02d}"
+            if tracks and tracks[-1][2] == speaker and abs(tracks[-1][1] - start) < 1e-9:
+                tracks[-1] = (tracks[-1][0], end, speaker)
+            else:
+                tracks.append((start, end, speaker))
+        return _StubAnnotation(tracks)
+
+    def to(self, device):
+        return self
+
+
+def _load_backend(name: str):
+    return lambda args: wp.load_transcription_backend(name, args.whisper_model)
+
+
+def _load_real_pipeline(args):
+    return wp.load_diarization_pipeline(wp.get_hf_token(args))
+
+
+# Backends interchangeables : "stub" tourne hors-ligne sur CPU, "real" charge les vrais modèles.
+WHISPER_BACKENDS = {
+    "stub": _load_backend("fake"),
+    "real": _load_backend("whisper"),
+    "faster-whisper": _load_backend("faster-whisper"),
+}
+DIARIZATION_BACKENDS = {
+    "stub": lambda args: StubDiarizationPipeline(),
+    "real": _load_real_pipeline,
+}
+
+
+class StageMeter:
+    """Mesure temps mur et pic mémoire Python (tracemalloc, au-delà de l'existant) de chaque étape."""
+
+    def __init__(self, audio_seconds: float = 0.0):
+        self.audio_seconds = audio_seconds
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            _, peak = tracemalloc.get_traced_memory()
+            self.stages[name] = {"seconds": elapsed, "peak_mb": max(0, peak - before) / (1024 * 1024)}
+
+    def finalize(self):
+        for r in self.stages.values():
+            r["rtf"] = r["seconds"] / self.audio_seconds if self.audio_seconds else 0.0
+        return self.stages
+
+
+def run_pipeline_bench(input_path: str, args) -> dict:
+    """Exécute chaque étape de process_file() séparément et retourne les mesures."""
+    work_dir = tempfile.mkdtemp(prefix="wp_bench_")
+    output_file = os.path.join(work_dir, "bench.txt")
+    opts = wp.parse_args([input_path, output_file, "--json", "--srt", "--vtt", "--no_cache"])
+    meter = StageMeter()
+
+    tracemalloc.start()
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            temp_files = []
+            with meter.stage("ingest (ffmpeg)"):
+                audio = wp.decode_audio(input_path, temp_files, ingest=args.ingest)
+            meter.audio_seconds = len(audio) / wp.SAMPLE_RATE
+
+            with meter.stage("chargement whisper"):
+                backend = WHISPER_BACKENDS[args.whisper_backend](args)
+            with meter.stage("transcription"):
+                transcript = wp.run_whisper_transcription(backend, audio)["segments"]
+
+            with meter.stage("chargement pyannote"):
+                pipeline = DIARIZATION_BACKENDS[args.diarization_backend](opts)
+            with meter.stage("diarisation"):
+                speakers = wp.run_diarization(audio, pipeline=pipeline)
+            del audio
+
+            with meter.stage("alignement"):
+                assigned = wp.assign_speakers(transcript, speakers)
+            segments = [
+                {"start": float(t["start"]), "end": float(t["end"]), "speaker": spk, "text": t["text"]}
+                for t, spk in zip(transcript, assigned)
+            ]
+            with meter.stage("merge_by_runs"):
+                merged = wp.merge_by_runs(segments)
+
+            with meter.stage("ecriture SRT"):
+                wp.write_srt(merged, os.path.join(work_dir, "bench.srt"))
+            with meter.stage("ecriture VTT"):
+                wp.write_vtt(merged, os.path.join(work_dir, "bench.vtt"))
+            with meter.stage("ecriture JSON"):
+                wp.write_json_if_requested(opts, output_file, {"segments_merged": merged})
+            with meter.stage("export complet (TXT+JSON+SRT+VTT)"):
+                wp.export_full(opts, output_file, "", {}, meter.audio_seconds, transcript, speakers)
+
+            wp.cleanup_temp_files(temp_files, keep_temp=False)
+    finally:
+        tracemalloc.stop()
+        for name in os.listdir(work_dir):
+            os.unlink(os.path.join(work_dir, name))
+        os.rmdir(work_dir)
+
+    return {
+        "audio_seconds": meter.audio_seconds,
+        "segments": {"transcription": len(transcript), "diarisation": len(speakers), "fusionnes": len(merged)},
+        "backends": {"whisper": args.whisper_backend, "diarisation": args.diarization_backend},
+        "peak_rss_mb": wp.peak_rss_bytes() / (1024 * 1024) if wp.peak_rss_bytes() else None,
+        "machine": {"python": platform.python_version(), "cpu_count": os.cpu_count(), "platform": platform.platform()},
+        "stages": meter.finalize(),
+    }
+
+
+def print_pipeline_report(report: dict):
+    print(f"\nPipeline complete sur {wp.hhmmss(report['audio_seconds'])} d'audio "
+          f"(whisper={report['backends']['whisper']}, diarisation={report['backends']['diarisation']})")
+    print(f"{'etape':<36} | {'temps (s)':>10} | {'RTF':>9} | {'pic Python (Mo)':>15}")
+    print("-" * 80)
+    total = 0.0
+    for name, r in report["stages"].items():
+        total += r["seconds"]
+        print(f"{name:<36} | {r['seconds']:>10.3f} | {r['rtf']:>9.5f} | {r['peak_mb']:>15.1f}")
+    print("-" * 80)
+    rtf = total / report["audio_seconds"] if report["audio_seconds"] else 0.0
+    print(f"{'TOTAL':<36} | {total:>10.3f} | {rtf:>9.5f} |")
+    seg = report["segments"]
+    print(f"\nSegments : {seg['transcription']} transcrits, {seg['diarisation']} speakers, {seg['fusionnes']} fusionnes")
+    if report["peak_rss_mb"]:
+        print(f"Pic memoire du processus (RSS) : {report['peak_rss_mb']:.0f} Mo")
+
+
+def compare_with_baseline(report: dict, baseline: dict, tolerance: float, min_seconds: float) -> list:
+    """
+    Compare les RTF par étape à la référence (indépendant de la durée d'audio).
+    Une régression = RTF au-delà de (1 + tolerance) x référence, et au moins `min_seconds` de plus.
+    """
+    regressions = []
+    print(f"\nComparaison avec la reference (tolerance {tolerance:.0%}) :")
+    for name, r in report["stages"].items():
+        ref = baseline.get("stages", {}).get(name)
+        if not ref:
+            print(f"- {name} : pas de reference")
+            continue
+        ratio = r["rtf"] / ref["rtf"] if ref["rtf"] else float("inf")
+        extra = (r["rtf"] - ref["rtf"]) * report["audio_seconds"]
+        regressed = ratio > 1 + tolerance and extra > min_seconds
+        label = "REGRESSION" if regressed else "OK"
+        print(f"- {name} : RTF {ref['rtf']:.5f} -> {r['rtf']:.5f} (x{ratio:.2f}) {label}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def bench_pipeline(args):
+    input_path = args.input
+    generated = None
+    if not input_path:
+        fd, generated = tempfile.mkstemp(suffix=f".{args.format}")
+        os.close(fd)
+        print(f"Generation d'un audio synthetique de {wp.hhmmss(args.duration)} ({args.speakers} locuteurs)...")
+        make_synthetic_speech(args.duration, generated, n_speakers=args.speakers)
+        input_path = generated
+
+    try:
+        report = run_pipeline_bench(input_path, args)
+    finally:
+        if generated and os.path.exists(generated):
+            os.unlink(generated)
+
+    print_pipeline_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"OK Mesures sauvegardees dans : {args.output}")
+
+    if not args.baseline:
+        return
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"OK Reference enregistree dans : {args.baseline}")
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("backends") != report["backends"]:
+        print("ATTENTION Backends differents de ceux de la reference, comparaison indicative.")
+    regressions = compare_with_baseline(report, baseline, args.tolerance, args.min_seconds)
+    if regressions:
+        print(f"ERREUR Regression de performance : {', '.join(regressions)}")
+        sys.exit(1)
+
+
+# =========================
+#   Mode live (rejeu d'un fichier)
+# =========================
+
+def stub_speaker_embedding(audio: np.ndarray) -> np.ndarray:
+    """Remplaçant hors-ligne de l'embedding de voix : proximité de la fréquence dominante à chaque locuteur."""
+    spectrum = np.abs(np.fft.rfft(audio))
+    freq = np.fft.rfftfreq(len(audio), 1.0 / wp.SAMPLE_RATE)[int(np.argmax(spectrum))]
+    return np.exp(-((np.array(STUB_SPEAKER_FREQS) - freq) / 40.0) ** 2) + 1e-3
+
+
+def bench_live(args):
+    fd, generated = tempfile.mkstemp(suffix=".m4a")
+    os.close(fd)
+    print(f"Generation d'un audio synthetique de {wp.hhmmss(args.duration)} ({args.speakers} locuteurs)...")
+    make_synthetic_speech(args.duration, generated, n_speakers=args.speakers)
+
+    live_argv = [generated, "--latency", str(args.latency), "--language", "fr"]
+    if args.realtime:
+        live_argv.append("--replay")
+    live_args = wp.parse_live_args(live_argv)
+    backend = WHISPER_BACKENDS[args.whisper_backend](args)
+    embed = stub_speaker_embedding if args.embedding_backend == "stub" else \
+        wp.load_speaker_embedding(wp.get_hf_token(args))
+
+    print(f"Rejeu {'en temps reel' if args.realtime else 'aussi vite que possible'}, "
+          f"latence cible {args.latency:g}s...")
+    captured = io.StringIO()
+    t0 = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(captured):
+            summary = wp.run_live(live_args, backend=backend, embed=embed)
+    finally:
+        os.unlink(generated)
+    wall = time.perf_counter() - t0
+
+    latencies = summary["latencies"]
+    p95 = float(np.percentile(latencies, 95)) if latencies else 0.0
+    speakers = {s["speaker"] for s in summary["segments"]}
+    print(f"\nAudio : {summary['audio_seconds']:.1f}s ; temps mur : {wall:.2f}s")
+    print(f"Segments emis : {len(summary['segments'])} ; speakers : {len(speakers)} (attendus : {args.speakers})")
+    print(f"Passes Whisper : {summary['passes']} ; inference cumulee : {summary['inference_seconds']:.2f}s")
+    if latencies:
+        print(f"Latence fin de phrase -> emission : mediane {float(np.median(latencies)):.2f}s, "
+              f"p95 {p95:.2f}s, max {max(latencies):.2f}s")
+
+    if args.max_latency is not None and p95 > args.max_latency:
+        print(f"ERREUR Latence p95 {p95:.2f}s > {args.max_latency:.2f}s")
+        sys.exit(1)
+
+
+# =========================
+#   Whisper quantifié (int8) vs fp32
+# =========================
+
+def _wer_words(text: str) -> list:
+    """Mots normalisés pour le WER : minuscules, ponctuation ignorée."""
+    return re.findall(r"\w+(?:['’]\w+)*", text.lower())
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """WER = (substitutions + suppressions + insertions) / nombre de mots de la référence."""
+    ref, hyp = _wer_words(reference), _wer_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def _transcribe_text(model, audio: np.ndarray, language: str = None) -> tuple:
+    t0 = time.perf_counter()
+    result = wp.run_whisper_transcription(model, audio, language=language, device="cpu")
+    return "".join(seg["text"] for seg in result["segments"]).strip(), time.perf_counter() - t0
+
+
+def bench_quantize(args):
+    if not args.input:
+        print("ERREUR Indiquer un enregistrement de parole avec --input (et sa transcription de reference "
+              "avec --reference pour un WER absolu).")
+        sys.exit(1)
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix="wp_quant_")
+    temp_files = []
+    audio = wp.decode_audio(args.input, temp_files)
+    if args.max_seconds:
+        audio = audio[:int(args.max_seconds * wp.SAMPLE_RATE)]
+    audio_seconds = len(audio) / wp.SAMPLE_RATE
+    print(f"\nWhisper '{args.whisper_model}' fp32 vs int8 sur CPU : {args.input} ({audio_seconds:.0f}s d'audio)")
+
+    rows = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        t0 = time.perf_counter()
+        model, device = wp.load_whisper_model(args.whisper_model)
+        if device != "cpu":
+            model = model.cpu()  # comparaison à matériel égal
+        load_fp32 = time.perf_counter() - t0
+        fp32_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+        text_fp32, seconds_fp32 = _transcribe_text(model, audio, args.language)
+        rows["fp32"] = {"load_seconds": load_fp32, "seconds": seconds_fp32, "text": text_fp32}
+        del model
+        wp.release_memory()
+
+        t0 = time.perf_counter()
+        wp.load_whisper_model(args.whisper_model, quantize="int8", cache_dir=cache_dir)
+        load_build = time.perf_counter() - t0
+        wp.release_memory()
+        t0 = time.perf_counter()
+        model, _ = wp.load_whisper_model(args.whisper_model, quantize="int8", cache_dir=cache_dir)
+        load_cached = time.perf_counter() - t0
+        text_int8, seconds_int8 = _transcribe_text(model, audio, args.language)
+        rows["int8"] = {"load_seconds": load_cached, "first_load_seconds": load_build,
+                        "seconds": seconds_int8, "text": text_int8}
+        del model
+        wp.release_memory()
+    wp.cleanup_temp_files(temp_files, keep_temp=False)
+
+    int8_path = wp.quantized_model_path(cache_dir, args.whisper_model, "int8")
+    rows["fp32"]["model_mb"] = fp32_bytes / 1e6
+    rows["int8"]["model_mb"] = os.path.getsize(int8_path) / 1e6 if os.path.exists(int8_path) else None
+
+    reference = None
+    if args.reference:
+        with open(args.reference, "r", encoding="utf-8") as f:
+            reference = f.read()
+    for mode, r in rows.items():
+        r["rtf"] = r["seconds"] / audio_seconds if audio_seconds else 0.0
+        r["speedup"] = rows["fp32"]["seconds"] / r["seconds"] if r["seconds"] else 0.0
+        r["wer"] = word_error_rate(reference, r["text"]) if reference is not None else None
+    wer_delta = rows["int8"]["wer"] - rows["fp32"]["wer"] if reference is not None \
+        else word_error_rate(text_fp32, text_int8)
+
+    print(f"{'mode':>6} | {'chargement (s)':>14} | {'transcription (s)':>17} | {'RTF':>6} | {'gain':>6} | "
+          f"{'modele (Mo)':>11} | {'WER':>6}")
+    print("-" * 84)
+    for mode, r in rows.items():
+        wer = f"{r['wer'] * 100:5.1f}%" if r["wer"] is not None else f"{'-':>6}"
+        size = f"{r['model_mb']:11.0f}" if r["model_mb"] is not None else f"{'-':>11}"
+        print(f"{mode:>6} | {r['load_seconds']:14.2f} | {r['seconds']:17.2f} | {r['rtf']:6.3f} | "
+              f"x{r['speedup']:5.2f} | {size} | {wer}")
+    print(f"int8 : premier chargement (fp32 + quantification + ecriture du cache) {load_build:.2f}s, "
+          f"rechargement depuis le cache {load_cached:.2f}s.")
+    if reference is not None:
+        print(f"Ecart de WER int8 - fp32 (par rapport a --reference) : {wer_delta * 100:+.1f} point(s)")
+    else:
+        print(f"Ecart de WER int8 vs fp32 (fp32 pris comme reference) : {wer_delta * 100:.1f}%")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"input": args.input, "audio_seconds": audio_seconds, "whisper_model": args.whisper_model,
+                       "wer_delta": wer_delta, "modes": rows}, f, ensure_ascii=False, indent=2)
+        print(f"OK Mesures ecrites : {args.output}")
+    if args.max_wer_delta is not None and wer_delta > args.max_wer_delta:
+        print(f"ERREUR Ecart de WER {wer_delta * 100:.1f} > {args.max_wer_delta * 100:.1f} point(s).")
+        sys.exit(1)
+
+
+# =========================
+#   Pré-passe VAD (--vad)
+# =========================
+
+def bench_vad(args):
+    generated = None
+    if args.input:
+        input_path = args.input
+    else:
+        fd, generated = tempfile.mkstemp(suffix=".m4a")
+        os.close(fd)
+        print(f"Generation d'un audio synthetique de {wp.hhmmss(args.duration)} "
+              f"(silences de 0.2 a {args.max_pause:g}s entre les tours)...")
+        make_synthetic_speech(args.duration, generated, max_pause=args.max_pause)
+        input_path = generated
+
+    temp_files = []
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            audio = wp.decode_audio(input_path, temp_files)
+            backend = WHISPER_BACKENDS[args.whisper_backend](args)
+    finally:
+        wp.cleanup_temp_files(temp_files, keep_temp=False)
+        if generated:
+            os.unlink(generated)
+    audio_seconds = len(audio) / wp.SAMPLE_RATE
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        t0 = time.perf_counter()
+        full = wp.run_whisper_transcription(backend, audio, language=args.language)
+        full_seconds = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        compact, timeline, skipped = wp.run_vad(audio, args.vad_threshold, args.vad_min_silence)
+        vad_seconds = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        if timeline is None:
+            result = wp.run_whisper_transcription(backend, audio, language=args.language)
+        else:
+            result = wp.remap_transcription(
+                wp.run_whisper_transcription(backend, compact, language=args.language), timeline)
+        transcribe_seconds = time.perf_counter() - t0
+
+    text_full = "".join(s["text"] for s in full["segments"])
+    text_vad = "".join(s["text"] for s in result["segments"])
+    wer = word_error_rate(text_full, text_vad)
+    # Écart des débuts de segments : chaque segment VAD face au début complet le plus proche
+    full_starts = np.sort([s["start"] for s in full["segments"]])
+    offsets = [float(np.min(np.abs(full_starts - s["start"]))) for s in result["segments"]] if len(full_starts) else []
+    speedup = full_seconds / (vad_seconds + transcribe_seconds) if vad_seconds + transcribe_seconds else 0.0
+
+    print(f"\nAudio : {wp.hhmmss(audio_seconds)} ; silence ignore : {wp.hhmmss(skipped)} "
+          f"({100.0 * skipped / audio_seconds if audio_seconds else 0.0:.0f}%) ; pre-passe VAD : {vad_seconds:.2f}s")
+    print(f"{'mode':>8} | {'transcription (s)':>17} | {'RTF':>6} | {'segments':>8}")
+    print("-" * 48)
+    print(f"{'complet':>8} | {full_seconds:17.2f} | {full_seconds / audio_seconds:6.3f} | {len(full['segments']):8d}")
+    print(f"{'vad':>8} | {vad_seconds + transcribe_seconds:17.2f} | "
+          f"{(vad_seconds + transcribe_seconds) / audio_seconds:6.3f} | {len(result['segments']):8d}")
+    print(f"Gain : x{speedup:.2f} ; ecart de WER vad vs complet : {wer * 100:.1f}% ; "
+          f"decalage des debuts de segments : median {np.median(offsets) if offsets else 0.0:.2f}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"input": args.input, "audio_seconds": audio_seconds, "skipped_seconds": skipped,
+                       "vad_seconds": vad_seconds, "full_seconds": full_seconds,
+                       "vad_transcription_seconds": transcribe_seconds, "speedup": speedup, "wer": wer},
+                      f, ensure_ascii=False, indent=2)
+        print(f"OK Mesures ecrites : {args.output}")
+    if args.min_speedup is not None and speedup < args.min_speedup:
+        print(f"ERREUR Gain x{speedup:.2f} < x{args.min_speedup:.2f}.")
+        sys.exit(1)
+
+
+# =========================
+#   Démarrage du CLI
+# =========================
+
+HEAVY_MODULES = ("torch", "torchaudio", "whisper", "pyannote.audio")
+
+_PROBE = """
+import sys, runpy, json, contextlib, io
+sys.argv = [{script!r}] + {argv!r}
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        runpy.run_path({script!r}, run_name="__main__")
+    except SystemExit:
+        pass
+print(json.dumps([m for m in {heavy!r} if m in sys.modules]))
+"""
+
+
+def _time_command(command, repeat: int):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - t0)
+    return sorted(times)
+
+
+def bench_startup(repeat: int = 5, max_seconds: float = None):
+    script = os.path.abspath(wp.__file__)
+    cases = {"-h": ["-h"], "batch -h": ["batch", "-h"], "serve -h": ["serve", "-h"], "live -h": ["live", "-h"]}
+
+    print(f"\nDemarrage de {os.path.basename(script)} ({repeat} essais, nouveau processus a chaque fois)")
+    print(f"{'commande':<12} | {'median (s)':>10} | {'min (s)':>8} | modules lourds importes")
+    print("-" * 78)
+    medians = {}
+    for label, argv in cases.items():
+        times = _time_command([sys.executable, script] + argv, repeat)
+        medians[label] = times[len(times) // 2]
+        probe = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(script=script, argv=argv, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True,
+        )
+        loaded = probe.stdout.strip().splitlines()[-1] if probe.stdout.strip() else "?"
+        print(f"{label:<12} | {medians[label]:>10.3f} | {times[0]:>8.3f} | {loaded}")
+
+    # Coût qui était payé à chaque lancement quand ces imports étaient au niveau module.
+    reference = _time_command([sys.executable, "-c", "import " + ", ".join(HEAVY_MODULES)], 1)[0]
+    check = subprocess.run([sys.executable, "-c", "import " + ", ".join(HEAVY_MODULES)], capture_output=True)
+    if check.returncode == 0:
+        print(f"\nImport de {', '.join(HEAVY_MODULES)} (evite pour -h) : {reference:.2f}s")
+    else:
+        print(f"\nATTENTION {', '.join(HEAVY_MODULES)} non installes : cout des imports lourds non mesure.")
+
+    if max_seconds is not None and medians["-h"] > max_seconds:
+        print(f"ERREUR -h trop lent : {medians['-h']:.3f}s > {max_seconds:.3f}s")
+        sys.exit(1)
+
+
+# =========================
+#   Entrée
+# =========================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmarks de whisperpyannote (sans modèles).")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p_align = sub.add_parser("alignment", help="Passage à l'échelle de l'alignement transcription <-> speakers.")
+    p_align.add_argument(
+        "--sizes",
+        default="1000,10000,100000,1000000",
+        help="Tailles N à mesurer, séparées par des virgules (par défaut : 1000,10000,100000,1000000)."
+    )
+    p_align.add_argument(
+        "--naive_max",
+        type=int,
+        default=2000,
+        help="Taille maximale pour laquelle la double boucle naive est réellement exécutée (par défaut : 2000)."
+    )
+
+    p_words = sub.add_parser("words", help="Attribution des speakers mot par mot vs par segment.")
+    p_words.add_argument(
+        "--sizes",
+        default="10000,100000,1000000",
+        help="Nombres de mots à mesurer, séparés par des virgules (par défaut : 10000,100000,1000000)."
+    )
+    p_words.add_argument(
+        "--fuzz_cases",
+        type=int,
+        default=3000,
+        help="Timelines aléatoires avec égalités et chevauchements comparées au balayage "
+             "avant la mesure (0 : désactivé ; par défaut : 3000)."
+    )
+
+    p_ingest = sub.add_parser("ingest", help="Décodage ffmpeg : pipe en mémoire vs WAV temporaire.")
+    p_ingest.add_argument("--input", help="Fichier audio/vidéo à décoder (par défaut : vidéo synthétique générée).")
+    p_ingest.add_argument(
+        "--duration",
+        type=float,
+        default=1800.0,
+        help="Durée en secondes de la vidéo synthétique (par défaut : 1800)."
+    )
+
+    p_pipe = sub.add_parser(
+        "pipeline",
+        help="Pipeline complète (ingest, transcription, diarisation, alignement, exports) avec modèles de substitution."
+    )
+    p_pipe.add_argument("--input", help="Fichier audio/vidéo à traiter (par défaut : audio synthétique généré).")
+    p_pipe.add_argument(
+        "--duration",
+        type=float,
+        default=600.0,
+        help="Durée en secondes de l'audio synthétique (par défaut : 600)."
+    )
+    p_pipe.add_argument("--speakers", type=int, default=2, choices=range(1, len(STUB_SPEAKER_FREQS) + 1),
+                        help="Nombre de locuteurs synthétiques (par défaut : 2).")
+    p_pipe.add_argument("--format", default="m4a", help="Format de l'audio synthétique (par défaut : m4a).")
+    p_pipe.add_argument("--ingest", default="pipe", choices=wp.INGEST_MODES,
+                        help="Mode de décodage ffmpeg (par défaut : pipe).")
+    p_pipe.add_argument("--whisper_backend", default="stub", choices=sorted(WHISPER_BACKENDS),
+                        help="stub : transcription factice hors-ligne (--backend fake) ; real : vrai modèle "
+                             "Whisper ; faster-whisper : modèle CTranslate2.")
+    p_pipe.add_argument("--whisper_model", default="small", help="Modèle Whisper pour --whisper_backend real ou faster-whisper.")
+    p_pipe.add_argument("--diarization_backend", default="stub", choices=sorted(DIARIZATION_BACKENDS),
+                        help="stub : diarisation factice hors-ligne ; real : vraie pipeline Pyannote (token HF).")
+    p_pipe.add_argument("--hf_token", help="Token Hugging Face pour --diarization_backend real.")
+    p_pipe.add_argument("--ask_token", action="store_true", help=argparse.SUPPRESS)
+    p_pipe.add_argument("--output", help="Écrire les mesures au format JSON dans ce fichier.")
+    p_pipe.add_argument(
+        "--baseline",
+        help="Fichier de référence JSON : créé s'il n'existe pas, sinon comparé (code retour 1 en cas de régression)."
+    )
+    p_pipe.add_argument("--update_baseline", action="store_true", help="Remplacer la référence par les mesures actuelles.")
+    p_pipe.add_argument("--tolerance", type=float, default=0.25,
+                        help="Marge relative tolérée sur le RTF de chaque étape (par défaut : 0.25).")
+    p_pipe.add_argument("--min_seconds", type=float, default=0.05,
+                        help="Écart absolu minimal (s) pour signaler une régression (par défaut : 0.05).")
+
+    p_live = sub.add_parser("live", help="Mode live sur un fichier rejoué : latence d'émission et speakers.")
+    p_live.add_argument("--duration", type=float, default=60.0,
+                        help="Durée en secondes de l'audio synthétique (par défaut : 60).")
+    p_live.add_argument("--speakers", type=int, default=2, choices=range(1, len(STUB_SPEAKER_FREQS) + 1),
+                        help="Nombre de locuteurs synthétiques (par défaut : 2).")
+    p_live.add_argument("--latency", type=float, default=wp.DEFAULT_LIVE_LATENCY,
+                        help=f"Latence cible passée à --latency (par défaut : {wp.DEFAULT_LIVE_LATENCY:g}).")
+    p_live.add_argument("--realtime", action="store_true",
+                        help="Rejouer à la vitesse réelle (ffmpeg -re) au lieu d'aussi vite que possible.")
+    p_live.add_argument("--whisper_backend", default="stub", choices=sorted(WHISPER_BACKENDS),
+                        help="stub : transcription factice hors-ligne (--backend fake) ; real : vrai modèle "
+                             "Whisper ; faster-whisper : modèle CTranslate2.")
+    p_live.add_argument("--whisper_model", default="small", help="Modèle Whisper pour --whisper_backend real ou faster-whisper.")
+    p_live.add_argument("--embedding_backend", default="stub", choices=["stub", "real"],
+                        help="stub : embedding factice hors-ligne ; real : modèle Pyannote (token HF).")
+    p_live.add_argument("--hf_token", help="Token Hugging Face pour --embedding_backend real.")
+    p_live.add_argument("--ask_token", action="store_true", help=argparse.SUPPRESS)
+    p_live.add_argument("--max_latency", type=float,
+                        help="Échouer (code retour 1) si la latence p95 dépasse cette valeur.")
+
+    p_quant = sub.add_parser("quantize", help="Whisper int8 (--quantize) vs fp32 sur CPU : vitesse et écart de WER.")
+    p_quant.add_argument("--input", help="Enregistrement de parole à transcrire (obligatoire).")
+    p_quant.add_argument("--reference",
+                         help="Transcription de référence (texte) : WER absolu de chaque mode. "
+                              "Sans elle, l'écart est mesuré par rapport à la sortie fp32.")
+    p_quant.add_argument("--whisper_model", default="small", help="Modèle Whisper (par défaut : small).")
+    p_quant.add_argument("--language", help="Forcer la langue (sinon détection automatique).")
+    p_quant.add_argument("--max_seconds", type=float, default=300.0,
+                         help="Ne transcrire que le début de l'enregistrement (par défaut : 300 s ; 0 : tout).")
+    p_quant.add_argument("--cache_dir", help="Dossier du modèle quantifié (par défaut : dossier temporaire).")
+    p_quant.add_argument("--output", help="Écrire les mesures au format JSON dans ce fichier.")
+    p_quant.add_argument("--max_wer_delta", type=float,
+                         help="Échouer (code retour 1) si l'écart de WER dépasse cette valeur (ex: 0.02).")
+
+    p_vad = sub.add_parser("vad", help="Pré-passe VAD (--vad) : silence ignoré, gain de transcription et écart de WER.")
+    p_vad.add_argument("--input", help="Enregistrement à transcrire (par défaut : audio synthétique avec silences).")
+    p_vad.add_argument("--duration", type=float, default=600.0,
+                       help="Durée en secondes de l'audio synthétique (par défaut : 600).")
+    p_vad.add_argument("--max_pause", type=float, default=8.0,
+                       help="Silence maximal entre deux tours de l'audio synthétique (par défaut : 8 s).")
+    p_vad.add_argument("--whisper_backend", default="stub", choices=sorted(WHISPER_BACKENDS),
+                       help="stub : transcription factice hors-ligne (--backend fake) ; real : vrai modèle "
+                            "Whisper ; faster-whisper : modèle CTranslate2.")
+    p_vad.add_argument("--whisper_model", default="small", help="Modèle Whisper pour --whisper_backend real ou faster-whisper.")
+    p_vad.add_argument("--language", help="Forcer la langue (sinon détection automatique).")
+    p_vad.add_argument("--vad_threshold", type=float, default=wp.DEFAULT_VAD_THRESHOLD_DB,
+                       help=f"Seuil de parole en dB au-dessus du bruit de fond (par défaut : {wp.DEFAULT_VAD_THRESHOLD_DB:g}).")
+    p_vad.add_argument("--vad_min_silence", type=float, default=wp.DEFAULT_VAD_MIN_SILENCE,
+                       help=f"Silence minimal ignoré en secondes (par défaut : {wp.DEFAULT_VAD_MIN_SILENCE:g}).")
+    p_vad.add_argument("--output", help="Écrire les mesures au format JSON dans ce fichier.")
+    p_vad.add_argument("--min_speedup", type=float,
+                       help="Échouer (code retour 1) si le gain est inférieur à cette valeur (ex: 1.2).")
+
+    p_start = sub.add_parser("startup", help="Temps de démarrage du CLI (-h) et imports lourds évités.")
+    p_start.add_argument("--repeat", type=int, default=5, help="Nombre de lancements par commande (par défaut : 5).")
+    p_start.add_argument("--max_seconds", type=float,
+                         help="Échouer (code retour 1) si le temps médian de -h dépasse cette valeur.")
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.bench == "alignment":
+        sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+        bench_alignment(sizes, args.naive_max)
+    elif args.bench == "words":
+        bench_word_alignment([int(x) for x in args.sizes.split(",") if x.strip()], args.fuzz_cases)
+    elif args.bench == "ingest":
+        bench_ingest(args.input, args.duration)
+    elif args.bench == "pipeline":
+        bench_pipeline(args)
+    elif args.bench == "live":
+        bench_live(args)
+    elif args.bench == "quantize":
+        bench_quantize(args)
+    elif args.bench == "vad":
+        bench_vad(args)
+    elif args.bench == "startup":
+        bench_startup(args.repeat, args.max_seconds)
+
+
+if __name__ == "__main__":
+    main()
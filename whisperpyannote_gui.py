@@ -7,7 +7,10 @@ Auteur : marcdelage
 
 import os
 import sys
+import json
+import time
 import shlex
+import tempfile
 from datetime import datetime
 from PySide6 import QtCore, QtGui, QtWidgets
 
@@ -38,6 +41,33 @@ I18N = {
         "btn_stop": "Stop",
         "btn_reset": "Reinitialiser",
         "btn_open_output": "Ouvrir la sortie",
+        "btn_save_log": "Enregistrer le log...",
+        "card_queue": "FILE D'ATTENTE",
+        "btn_queue_add": "Ajouter...",
+        "btn_queue_start": "Lancer la file",
+        "btn_queue_cancel": "Annuler la selection",
+        "btn_queue_clear": "Retirer les termines",
+        "col_file": "Fichier",
+        "col_status": "Statut",
+        "col_elapsed": "Duree",
+        "col_rtf": "RTF",
+        "q_queued": "En attente",
+        "q_running": "En cours",
+        "q_done": "Termine",
+        "q_error": "Erreur",
+        "q_cancelled": "Annule",
+        "dlg_pick_inputs_title": "Ajouter des fichiers a la file",
+        "tip_queue_not_supported": "Mode worker non supporte par {script}",
+        "log_worker_start": "> Worker (modeles gardes en memoire) :",
+        "log_worker_ready": "[GUI] Worker pret (pid={pid})",
+        "log_worker_exit": "[GUI] Worker arrete (code={code})",
+        "log_worker_start_failed": "ERREUR Le worker s'est arrete avant d'etre pret : file interrompue",
+        "log_queue_job": "> [{idx}/{total}] {name}",
+        "log_queue_done": "OK {name} : {elapsed} (RTF {rtf})",
+        "log_queue_error": "ERREUR {name} : {message}",
+        "dlg_save_log_title": "Enregistrer le log complet",
+        "log_saved": "OK Log complet enregistre : {path}",
+        "log_lines_hidden": "... {hidden} ligne(s) masquee(s), cf. log complet",
 
         "lbl_mode": "Mode",
         "lbl_whisper_model": "Modele Whisper",
@@ -81,8 +111,17 @@ I18N = {
         "log_caps_srt": "  --srt: {v}",
         "log_caps_vtt": "  --vtt: {v}",
         "log_caps_subs": "  --subs_no_speaker: {v}",
+        "log_caps_progress": "  --progress_json: {v}",
+        "log_caps_from_json": "[GUI] Capabilities: --capabilities (JSON)",
+        "log_caps_from_help": "[GUI] Capabilities: -h (fallback)",
         "log_qprocess_error": "ERREUR QProcess error: {err}",
 
+        "stage_ingest": "Decodage audio",
+        "stage_transcription": "Transcription",
+        "stage_diarization": "Diarisation",
+        "stage_export": "Export",
+        "progress_eta": "reste ~{eta}",
+
         # --- Missing translations (UI) ---
         "ph_no_file": "Aucun fichier selectionne",
         "ph_output": "Chemin de sortie... (ex: C:\\chemin\\sortie.txt)",
@@ -122,6 +161,33 @@ I18N = {
         "btn_stop": "Stop",
         "btn_reset": "Reset",
         "btn_open_output": "Open output",
+        "btn_save_log": "Save log...",
+        "card_queue": "QUEUE",
+        "btn_queue_add": "Add...",
+        "btn_queue_start": "Run queue",
+        "btn_queue_cancel": "Cancel selected",
+        "btn_queue_clear": "Remove finished",
+        "col_file": "File",
+        "col_status": "Status",
+        "col_elapsed": "Elapsed",
+        "col_rtf": "RTF",
+        "q_queued": "Queued",
+        "q_running": "Running",
+        "q_done": "Done",
+        "q_error": "Error",
+        "q_cancelled": "Cancelled",
+        "dlg_pick_inputs_title": "Add files to the queue",
+        "tip_queue_not_supported": "Worker mode not supported by {script}",
+        "log_worker_start": "> Worker (models kept in memory):",
+        "log_worker_ready": "[GUI] Worker ready (pid={pid})",
+        "log_worker_exit": "[GUI] Worker stopped (code={code})",
+        "log_worker_start_failed": "ERREUR The worker stopped before it was ready: queue aborted",
+        "log_queue_job": "> [{idx}/{total}] {name}",
+        "log_queue_done": "OK {name}: {elapsed} (RTF {rtf})",
+        "log_queue_error": "ERREUR {name}: {message}",
+        "dlg_save_log_title": "Save full log",
+        "log_lines_hidden": "... {hidden} line(s) hidden, see full log",
+        "log_saved": "OK Full log saved: {path}",
 
         "lbl_mode": "Mode",
         "lbl_whisper_model": "Whisper model",
@@ -165,8 +231,17 @@ I18N = {
         "log_caps_srt": "  --srt: {v}",
         "log_caps_vtt": "  --vtt: {v}",
         "log_caps_subs": "  --subs_no_speaker: {v}",
+        "log_caps_progress": "  --progress_json: {v}",
+        "log_caps_from_json": "[GUI] Capabilities: --capabilities (JSON)",
+        "log_caps_from_help": "[GUI] Capabilities: -h (fallback)",
         "log_qprocess_error": "ERREUR QProcess error: {err}",
 
+        "stage_ingest": "Audio decoding",
+        "stage_transcription": "Transcription",
+        "stage_diarization": "Diarization",
+        "stage_export": "Export",
+        "progress_eta": "~{eta} left",
+
         # --- Missing translations (UI) ---
         "ph_no_file": "No file selected",
         "ph_output": "Output path... (e.g. /path/output.txt)",
@@ -198,6 +273,15 @@ def _ts() -> str:
 
 SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "whisperpyannote.py")
 
+# Console : rafraichissement groupe toutes les LOG_FLUSH_MS, au plus LOG_MAX_LINES lignes affichees,
+# et LOG_FRAME_BUDGET_MS de travail par rafraichissement sur le thread UI.
+LOG_FLUSH_MS = 50
+LOG_MAX_LINES = 5000
+LOG_FRAME_BUDGET_MS = 8
+
+# Worker de la file : au-dela de ce nombre de demarrages sans "ready", la file s'arrete en erreur
+WORKER_MAX_FAILED_STARTS = 1
+
 WHISPER_LANG_CHOICES = [
     ("Auto (detect)", "auto"),
     ("French", "fr"),
@@ -551,6 +635,7 @@ def fix_combo_popup(combo: QtWidgets.QComboBox):
 
 class DropZone(QtWidgets.QFrame):
     fileDropped = QtCore.Signal(str)
+    filesDropped = QtCore.Signal(list)
 
     def __init__(self, tr_callable):
         super().__init__()
@@ -606,11 +691,40 @@ class DropZone(QtWidgets.QFrame):
 
     def dropEvent(self, e):
         self._set_active(False)
-        urls = e.mimeData().urls()
-        if urls:
-            path = urls[0].toLocalFile()
-            if path:
-                self.fileDropped.emit(path)
+        paths = [u.toLocalFile() for u in e.mimeData().urls() if u.toLocalFile()]
+        if len(paths) > 1:
+            self.filesDropped.emit(paths)  # plusieurs fichiers -> file d'attente
+        elif paths:
+            self.fileDropped.emit(paths[0])
+
+
+class QueueTable(QtWidgets.QTableWidget):
+    """Tableau de la file d'attente, qui accepte aussi le glisser-deposer de fichiers."""
+    filesDropped = QtCore.Signal(list)
+
+    def __init__(self):
+        super().__init__(0, 4)
+        self.setAcceptDrops(True)
+        self.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.verticalHeader().setVisible(False)
+        header = self.horizontalHeader()
+        header.setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        for col in (1, 2, 3):
+            header.setSectionResizeMode(col, QtWidgets.QHeaderView.ResizeToContents)
+
+    def dragEnterEvent(self, e):
+        if e.mimeData().hasUrls():
+            e.acceptProposedAction()
+
+    def dragMoveEvent(self, e):
+        if e.mimeData().hasUrls():
+            e.acceptProposedAction()
+
+    def dropEvent(self, e):
+        paths = [u.toLocalFile() for u in e.mimeData().urls() if u.toLocalFile()]
+        if paths:
+            self.filesDropped.emit(paths)
 
 
 # =========================
@@ -633,6 +747,136 @@ class Card(QtWidgets.QFrame):
         self.t.setText(title)
 
 
+# =========================
+#   Buffered log sink
+# =========================
+
+class LogSink(QtCore.QObject):
+    """
+    Tampon entre la sortie du process et la console :
+    - les lignes sont accumulees puis ajoutees en un seul bloc par tick de timer,
+    - les mises a jour par retour chariot (barres tqdm) remplacent la ligne en place,
+    - la console garde au plus LOG_MAX_LINES lignes ; le log complet reste dans un
+      fichier temporaire et peut etre sauvegarde (save_full_log).
+    """
+
+    def __init__(self, console: QtWidgets.QPlainTextEdit, auto_scroll: QtWidgets.QCheckBox, tr, parent=None):
+        super().__init__(parent)
+        self.tr_text = tr  # traduction des messages de la GUI (cf. Main.tr)
+        self.console = console
+        self.auto_scroll = auto_scroll
+        self.console.setMaximumBlockCount(LOG_MAX_LINES)
+
+        self._pending = []        # lignes completes en attente d'affichage
+        self._partials = {}       # debut de ligne recu sans "\n", par flux (stdout / stderr)
+        self._live = None         # ligne "\r" a afficher en place (barre de progression)
+        self._live_shown = False  # la derniere ligne de la console est une ligne "\r"
+        self._full = tempfile.TemporaryFile("w+", encoding="utf-8")
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(LOG_FLUSH_MS)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start()
+
+    def _complete(self, line: str, stamp: str):
+        line = f"{stamp} {line}"
+        self._pending.append(line)
+        self._full.write(line + "\n")
+
+    def add_lines(self, text: str):
+        """Messages de la GUI (deja decoupes en lignes)."""
+        stamp = _ts()
+        for line in text.splitlines():
+            self._complete(line, stamp)
+
+    def feed(self, data: str, stream: str = "stdout"):
+        """Sortie brute du process : les segments apres "\r" remplacent le debut de la ligne."""
+        stamp = _ts()
+        data = self._partials.get(stream, "") + data.replace("\r\n", "\n")
+        *lines, partial = data.split("\n")
+        for line in lines:
+            line = line.rstrip("\r").rsplit("\r", 1)[-1]
+            if line:
+                self._complete(line, stamp)
+            self._live = None
+        if "\r" in partial:
+            head = partial.rstrip("\r").rsplit("\r", 1)[-1]
+            self._live = f"{stamp} {head}" if head else None
+            # un "\r" final reste en attente : le prochain morceau remplacera la ligne
+            partial = head + "\r" if partial.endswith("\r") else head
+        self._partials[stream] = partial
+
+    def _drop_live_line(self):
+        doc = self.console.document()
+        if doc.blockCount() == 1:
+            doc.clear()
+        else:
+            # BlockUnderCursor inclut le saut de ligne qui precede le dernier bloc
+            cursor = QtGui.QTextCursor(doc.lastBlock())
+            cursor.select(QtGui.QTextCursor.BlockUnderCursor)
+            cursor.removeSelectedText()
+        self._live_shown = False
+
+    def flush(self):
+        if not self._pending and self._live is None and not self._live_shown:
+            return
+        deadline = time.perf_counter() + LOG_FRAME_BUDGET_MS / 1000.0
+
+        # Au-dela de la capacite de la console, seules les dernieres lignes resteraient visibles.
+        if len(self._pending) > LOG_MAX_LINES:
+            hidden = len(self._pending) - LOG_MAX_LINES
+            self._pending = [self.tr_text("log_lines_hidden").format(hidden=hidden)] + self._pending[-LOG_MAX_LINES:]
+
+        self.console.setUpdatesEnabled(False)
+        try:
+            if self._live_shown:
+                self._drop_live_line()
+            # Ajout par blocs, en rendant la main si le budget du tick est depasse.
+            while self._pending and time.perf_counter() < deadline:
+                block, self._pending = self._pending[:500], self._pending[500:]
+                self.console.appendPlainText("\n".join(block))
+            if not self._pending and self._live is not None:
+                self.console.appendPlainText(self._live)
+                self._live_shown = True
+        finally:
+            self.console.setUpdatesEnabled(True)
+
+        if self.auto_scroll.isChecked():
+            bar = self.console.verticalScrollBar()
+            bar.setValue(bar.maximum())
+
+    def end_stream(self):
+        """Fin du process : la ligne en cours (sans "\n") devient une ligne normale."""
+        for stream, partial in list(self._partials.items()):
+            if partial:
+                self.feed("\n", stream)
+        self.flush()
+
+    def clear(self):
+        self._pending = []
+        self._partials = {}
+        self._live = None
+        self._live_shown = False
+        self.console.clear()
+        self._full.seek(0)
+        self._full.truncate()
+
+    def save_full_log(self, path: str):
+        """Ecrit tout le log de la session (y compris les lignes retirees de la console)."""
+        self._full.flush()
+        self._full.seek(0)
+        with open(path, "w", encoding="utf-8") as out:
+            while True:
+                chunk = self._full.read(1 << 20)
+                if not chunk:
+                    break
+                out.write(chunk)
+            for partial in self._partials.values():
+                if partial.rstrip("\r"):
+                    out.write(partial.rstrip("\r") + "\n")
+        self._full.seek(0, os.SEEK_END)
+
+
 # =========================
 #   Main window
 # =========================
@@ -652,8 +896,25 @@ class Main(QtWidgets.QWidget):
         if self.ui_lang not in ("fr", "en"):
             self.ui_lang = "fr"
 
+        # stdout = messages texte, stderr = evenements --progress_json (et erreurs Python)
         self.proc = QtCore.QProcess(self)
-        self.proc.setProcessChannelMode(QtCore.QProcess.MergedChannels)
+        self.proc.setProcessChannelMode(QtCore.QProcess.SeparateChannels)
+        self.supports_progress_json = False
+        self.supports_worker = False
+        self._stderr_buf = ""
+        self._stderr_text = False  # debut de ligne texte deja transmis a la console
+        self._progress_stage = None
+
+        # File d'attente : un seul process worker garde les modeles charges entre les fichiers
+        self.worker = QtCore.QProcess(self)
+        self.worker.setProcessChannelMode(QtCore.QProcess.SeparateChannels)
+        self.worker_ready = False
+        self._worker_failed_starts = 0  # arrets du worker avant "ready" depuis le dernier demarrage reussi
+        self._worker_buf = ""
+        self.queue_jobs = []
+        self.queue_running = False
+        self.current_job = None
+        self._job_counter = 0
 
         # ----- Header -----
         header = QtWidgets.QFrame()
@@ -767,11 +1028,29 @@ class Main(QtWidgets.QWidget):
 
         self.progress = QtWidgets.QProgressBar()
         self.progress.setRange(0, 0)
+        self.progress.setTextVisible(True)
         self.progress.setVisible(False)
 
         self.console = QtWidgets.QPlainTextEdit()
         self.console.setObjectName("Console")
         self.console.setReadOnly(True)
+        self.log_sink = LogSink(self.console, self.auto_scroll, self.tr, self)
+
+        self.save_log_btn = QtWidgets.QPushButton(self.tr("btn_save_log"))
+        self.save_log_btn.setObjectName("Ghost")
+
+        self.queue_table = QueueTable()
+        self.queue_add_btn = QtWidgets.QPushButton(self.tr("btn_queue_add"))
+        self.queue_add_btn.setObjectName("Ghost")
+        self.queue_start_btn = QtWidgets.QPushButton(self.tr("btn_queue_start"))
+        self.queue_start_btn.setObjectName("Primary")
+        self.queue_cancel_btn = QtWidgets.QPushButton(self.tr("btn_queue_cancel"))
+        self.queue_cancel_btn.setObjectName("Danger")
+        self.queue_clear_btn = QtWidgets.QPushButton(self.tr("btn_queue_clear"))
+        self.queue_clear_btn.setObjectName("Ghost")
+
+        self.queue_timer = QtCore.QTimer(self)
+        self.queue_timer.setInterval(500)
 
         # ----- Layout -----
         root = QtWidgets.QVBoxLayout(self)
@@ -857,21 +1136,55 @@ class Main(QtWidgets.QWidget):
         self.c_actions.v.addWidget(self.progress)
         root.addWidget(self.c_actions, 0)
 
+        bottom_row = QtWidgets.QHBoxLayout()
+        bottom_row.setSpacing(14)
+
+        self.c_queue = Card(self.tr("card_queue"))
+        self.c_queue.v.addWidget(self.queue_table, 1)
+        queue_btns = QtWidgets.QHBoxLayout()
+        queue_btns.setSpacing(10)
+        queue_btns.addWidget(self.queue_add_btn)
+        queue_btns.addWidget(self.queue_start_btn)
+        queue_btns.addWidget(self.queue_cancel_btn)
+        queue_btns.addWidget(self.queue_clear_btn)
+        queue_btns.addStretch(1)
+        self.c_queue.v.addLayout(queue_btns)
+
         self.c_logs = Card(self.tr("card_logs"))
         self.c_logs.v.addWidget(self.console, 1)
-        root.addWidget(self.c_logs, 1)
+        log_btns = QtWidgets.QHBoxLayout()
+        log_btns.addStretch(1)
+        log_btns.addWidget(self.save_log_btn)
+        self.c_logs.v.addLayout(log_btns)
+
+        bottom_row.addWidget(self.c_queue, 1)
+        bottom_row.addWidget(self.c_logs, 1)
+        root.addLayout(bottom_row, 1)
 
         # ----- Signals -----
         self.browse_btn.clicked.connect(self.pick_input)
         self.save_btn.clicked.connect(self.pick_output)
         drop.fileDropped.connect(self.set_input)
+        drop.filesDropped.connect(self.enqueue_files)
+        self.queue_table.filesDropped.connect(self.enqueue_files)
+        self.queue_add_btn.clicked.connect(self.pick_queue_inputs)
+        self.queue_start_btn.clicked.connect(self.start_queue)
+        self.queue_cancel_btn.clicked.connect(self.cancel_selected_jobs)
+        self.queue_clear_btn.clicked.connect(self.clear_finished_jobs)
+        self.queue_timer.timeout.connect(self._refresh_running_elapsed)
+
+        self.worker.readyReadStandardOutput.connect(self._read_worker)
+        self.worker.readyReadStandardError.connect(self._read_worker_stderr)
+        self.worker.finished.connect(self._worker_finished)
 
         self.start_btn.clicked.connect(self.start)
         self.stop_btn.clicked.connect(self.stop)
         self.reset_btn.clicked.connect(self.reset_settings)
         self.open_output_btn.clicked.connect(self.open_output)
+        self.save_log_btn.clicked.connect(self.save_log)
 
-        self.proc.readyRead.connect(self._read)
+        self.proc.readyReadStandardOutput.connect(self._read)
+        self.proc.readyReadStandardError.connect(self._read_stderr)
         self.proc.finished.connect(self._finished)
         self.proc.errorOccurred.connect(self._proc_error)
 
@@ -920,6 +1233,18 @@ class Main(QtWidgets.QWidget):
         self.stop_btn.setText(self.tr("btn_stop"))
         self.reset_btn.setText(self.tr("btn_reset"))
         self.open_output_btn.setText(self.tr("btn_open_output"))
+        self.save_log_btn.setText(self.tr("btn_save_log"))
+
+        self.c_queue.setTitle(self.tr("card_queue"))
+        self.queue_add_btn.setText(self.tr("btn_queue_add"))
+        self.queue_start_btn.setText(self.tr("btn_queue_start"))
+        self.queue_cancel_btn.setText(self.tr("btn_queue_cancel"))
+        self.queue_clear_btn.setText(self.tr("btn_queue_clear"))
+        self.queue_table.setHorizontalHeaderLabels(
+            [self.tr("col_file"), self.tr("col_status"), self.tr("col_elapsed"), self.tr("col_rtf")]
+        )
+        for job in self.queue_jobs:
+            self._update_job_row(job)
 
         self.input_path.setPlaceholderText(self.tr("ph_no_file"))
         self.output_path.setPlaceholderText(self.tr("ph_output"))
@@ -976,17 +1301,64 @@ class Main(QtWidgets.QWidget):
 
         return out
 
+    def _get_script_capabilities(self):
+        """JSON de `--capabilities` (sans import lourd cote script), ou None si non supporte."""
+        sp = self._script_path()
+        if not os.path.exists(sp):
+            return None
+
+        p = QtCore.QProcess()
+        p.setProcessChannelMode(QtCore.QProcess.SeparateChannels)
+        p.start(sys.executable, [sp, "--capabilities"])
+        if not p.waitForStarted(3000):
+            return None
+        if not p.waitForFinished(10000):
+            try:
+                p.kill()
+            except Exception:
+                pass
+            return None
+        if p.exitCode() != 0:
+            return None
+
+        try:
+            caps = json.loads(bytes(p.readAllStandardOutput()).decode("utf-8", "replace"))
+        except ValueError:
+            return None
+        return caps if isinstance(caps, dict) and "options" in caps else None
+
     def _detect_and_apply_script_capabilities(self):
         sp = self._script_path()
         self._log(self.tr("log_using_script").format(sp=sp))
 
-        help_txt = self._get_script_help()
-        if not help_txt:
-            self._log(self.tr("log_empty_help"))
-            return
+        caps = self._get_script_capabilities()
+        if caps is not None:
+            self._log(self.tr("log_caps_from_json"))
+            known = set()
+            for name, opt in caps["options"].items():
+                known.add(name)
+                known.update(opt.get("aliases") or [])
+
+            def supports(flag: str) -> bool:
+                return flag in known
+        else:
+            # Ancienne version du script : detection par le texte de -h
+            self._log(self.tr("log_caps_from_help"))
+            help_txt = self._get_script_help()
+            if not help_txt:
+                self._log(self.tr("log_empty_help"))
+                return
+
+            def supports(flag: str) -> bool:
+                return (flag in help_txt) or (f"{flag}]" in help_txt) or (f"{flag} " in help_txt)
 
-        def supports(flag: str) -> bool:
-            return (flag in help_txt) or (f"{flag}]" in help_txt) or (f"{flag} " in help_txt)
+        self.supports_progress_json = supports("--progress_json")
+        self.supports_worker = caps is not None and "worker" in (caps.get("subcommands") or [])
+        queue_tip = "" if self.supports_worker else \
+            self.tr("tip_queue_not_supported").format(script=os.path.basename(sp))
+        for b in (self.queue_add_btn, self.queue_start_btn):
+            b.setEnabled(self.supports_worker)
+            b.setToolTip(queue_tip)
 
         tip = self.tr("tip_opt_not_supported").format(script=os.path.basename(sp))
         self._set_export_enabled(self.export_json, supports("--json"), tip)
@@ -998,7 +1370,8 @@ class Main(QtWidgets.QWidget):
         self._log(self.tr("log_caps_json").format(v=supports("--json")))
         self._log(self.tr("log_caps_srt").format(v=supports("--srt")))
         self._log(self.tr("log_caps_vtt").format(v=supports("--vtt")))
-        self._log(self.tr("log_caps_subs").format(v=supports("--subs_no_speaker")) + "\n")
+        self._log(self.tr("log_caps_subs").format(v=supports("--subs_no_speaker")))
+        self._log(self.tr("log_caps_progress").format(v=self.supports_progress_json) + "\n")
 
     def _set_export_enabled(self, cb: QtWidgets.QCheckBox, enabled: bool, disabled_tip: str):
         cb.setEnabled(enabled)
@@ -1081,6 +1454,7 @@ class Main(QtWidgets.QWidget):
             self._save_settings()
         except Exception:
             pass
+        self._stop_worker()
         super().closeEvent(event)
 
     # =========================
@@ -1127,7 +1501,7 @@ class Main(QtWidgets.QWidget):
 
         self._detect_and_apply_script_capabilities()
 
-        self.console.clear()
+        self.log_sink.clear()
         self.progress.setVisible(False)
         self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
@@ -1151,12 +1525,23 @@ class Main(QtWidgets.QWidget):
         s = s.rstrip("\n")
         if not s:
             return
-        for line in s.splitlines():
-            self.console.appendPlainText(f"{_ts()} {line}")
-        if self.auto_scroll.isChecked():
-            cursor = self.console.textCursor()
-            cursor.movePosition(QtGui.QTextCursor.End)
-            self.console.setTextCursor(cursor)
+        self.log_sink.add_lines(s)
+
+    def save_log(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self,
+            self.tr("dlg_save_log_title"),
+            "whisperpyannote_log.txt",
+            "TXT (*.txt);;All (*.*)",
+        )
+        if not path:
+            return
+        try:
+            self.log_sink.save_full_log(path)
+        except OSError as e:
+            QtWidgets.QMessageBox.critical(self, self.tr("msg_error_title"), str(e))
+            return
+        self._log(self.tr("log_saved").format(path=path))
 
     # =========================
     #   ONLY CHANGE: hide --hf_token value in logs
@@ -1240,9 +1625,17 @@ class Main(QtWidgets.QWidget):
             except Exception as e:
                 raise RuntimeError(f"Impossible de creer le dossier de sortie: {out_dir}\n{e}")
 
-        args = [sys.executable, "-u", sp, inp, outp]
+        args = [sys.executable, "-u", sp, inp, outp] + self._option_args()
 
-        args += ["--whisper_model", str(self.whisper_model.currentData())]
+        # Progression reelle (evenements JSON sur stderr) si le script la supporte
+        if self.supports_progress_json:
+            args += ["--progress_json"]
+
+        return args
+
+    def _option_args(self):
+        """Options de traitement choisies dans l'interface (communes au lancement simple et a la file)."""
+        args = ["--whisper_model", str(self.whisper_model.currentData())]
 
         lang_code = str(self.lang.currentData() or "auto")
         if lang_code != "auto":
@@ -1277,7 +1670,7 @@ class Main(QtWidgets.QWidget):
     # =========================
 
     def start(self):
-        if self.proc.state() != QtCore.QProcess.NotRunning:
+        if self.proc.state() != QtCore.QProcess.NotRunning or self.queue_running:
             return
 
         try:
@@ -1295,6 +1688,11 @@ class Main(QtWidgets.QWidget):
         self.start_btn.setEnabled(False)
         self.stop_btn.setEnabled(True)
         self.reset_btn.setEnabled(False)
+        self._stderr_buf = ""
+        self._stderr_text = False
+        self._progress_stage = None
+        self.progress.setRange(0, 0)
+        self.progress.setFormat("%p%")
         self.progress.setVisible(True)
         self._set_status(self.tr("status_running"))
 
@@ -1333,18 +1731,343 @@ class Main(QtWidgets.QWidget):
     # =========================
 
     def _read(self):
-        data = bytes(self.proc.readAll()).decode("utf-8", errors="replace")
+        data = bytes(self.proc.readAllStandardOutput()).decode("utf-8", errors="replace")
         if data:
-            for line in data.splitlines():
-                self._log(line)
+            self.log_sink.feed(data)
+
+    def _read_stderr(self):
+        data = bytes(self.proc.readAllStandardError()).decode("utf-8", errors="replace")
+        if not data:
+            return
+        # Les evenements JSON peuvent arriver coupes entre deux lectures
+        self._stderr_buf += data
+        *lines, self._stderr_buf = self._stderr_buf.split("\n")
+        for line in lines:
+            event = None
+            if line.startswith("{") and not self._stderr_text:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    event = None
+            if isinstance(event, dict) and "event" in event:
+                self._on_progress_event(event)
+            else:
+                # Texte (tracebacks, barres tqdm) : meme traitement des "\r" que stdout
+                self.log_sink.feed(line + "\n", "stderr")
+            self._stderr_text = False
+        # Ligne texte en cours : transmise sans attendre "\n" pour voir les barres "\r" avancer.
+        # Un debut "{" reste en tampon (evenement JSON coupe entre deux lectures).
+        if self._stderr_buf and (self._stderr_text or not self._stderr_buf.startswith("{")):
+            self.log_sink.feed(self._stderr_buf, "stderr")
+            self._stderr_buf = ""
+            self._stderr_text = True
+
+    @staticmethod
+    def _format_eta(seconds) -> str:
+        seconds = int(seconds)
+        return f"{seconds // 60}:{seconds % 60:02d}"
+
+    def _on_progress_event(self, event: dict):
+        kind = event.get("event")
+        stage = event.get("stage")
+        label = self.tr(f"stage_{stage}") if stage in ("ingest", "transcription", "diarization", "export") else ""
+
+        if kind == "stage_start":
+            self._progress_stage = stage
+            if stage in ("transcription", "diarization"):
+                self.progress.setRange(0, 100)
+                self.progress.setValue(0)
+            else:
+                self.progress.setRange(0, 0)  # pas de pourcentage pour le decodage / l'export
+            self.progress.setFormat(f"{label} - %p%")
+            self._set_status(label)
+
+        elif kind == "progress" and stage == self._progress_stage:
+            percent = float(event.get("percent") or 0.0)
+            text = f"{label} - %p%"
+            if event.get("eta_seconds") is not None:
+                text += " - " + self.tr("progress_eta").format(eta=self._format_eta(event["eta_seconds"]))
+            self.progress.setRange(0, 100)
+            self.progress.setValue(int(percent))
+            self.progress.setFormat(text)
+            self._set_status(f"{label} {percent:.0f}%")
+
+        elif kind == "stage_end" and stage == self._progress_stage:
+            self.progress.setRange(0, 100)
+            self.progress.setValue(100)
 
     def _proc_error(self, err: QtCore.QProcess.ProcessError):
         self._log(self.tr("log_qprocess_error").format(err=err))
 
     def _finished(self, code, status):
+        self._read()
+        self._read_stderr()
+        if self._stderr_buf:
+            self.log_sink.feed(self._stderr_buf, "stderr")
+            self._stderr_buf = ""
+        self._stderr_text = False
+        self.log_sink.end_stream()
         self._log("\n" + self.tr("log_finished").format(code=code))
         self._restore_ui_after_run(error=(code != 0))
 
+    # =========================
+    #   Queue (warm worker)
+    # =========================
+
+    def pick_queue_inputs(self):
+        paths, _ = QtWidgets.QFileDialog.getOpenFileNames(
+            self,
+            self.tr("dlg_pick_inputs_title"),
+            "",
+            self.tr("dlg_pick_input_filter"),
+        )
+        if paths:
+            self.enqueue_files(paths)
+
+    def enqueue_files(self, paths):
+        if not self.supports_worker:
+            # Script sans mode worker : on garde le comportement fichier unique
+            if paths:
+                self.set_input(paths[0])
+            return
+        # Options, dossier et extension de sortie figes au moment de l'ajout
+        options = self._option_args()
+        outp = self.output_path.text().strip()
+        out_dir = os.path.dirname(outp)
+        out_ext = os.path.splitext(outp)[1] or ".txt"
+        if out_dir and not os.path.exists(out_dir):
+            try:
+                os.makedirs(out_dir, exist_ok=True)
+            except Exception as e:
+                QtWidgets.QMessageBox.critical(
+                    self, self.tr("msg_error_title"),
+                    f"Impossible de creer le dossier de sortie: {out_dir}\n{e}",
+                )
+                return
+        for path in paths:
+            if not os.path.isfile(path):
+                continue
+            self._job_counter += 1
+            name = os.path.splitext(os.path.basename(path))[0]
+            job = {
+                "id": f"job-{self._job_counter}",
+                "input": path,
+                "output": os.path.join(out_dir or os.path.dirname(path), name + out_ext),
+                "options": options,
+                "status": "queued",
+                "started": None,
+                "elapsed": None,
+                "rtf": None,
+                "row": None,
+            }
+            job["row"] = self.queue_table.rowCount()
+            self.queue_table.insertRow(job["row"])
+            self.queue_jobs.append(job)
+            self._update_job_row(job)
+
+    def _update_job_row(self, job):
+        row = job["row"]
+        if row is None:
+            return
+        elapsed = job["elapsed"]
+        if job["status"] == "running" and job["started"] is not None:
+            elapsed = time.monotonic() - job["started"]
+        values = [
+            os.path.basename(job["input"]),
+            self.tr(f"q_{job['status']}"),
+            self._format_eta(elapsed) if elapsed is not None else "",
+            f"{job['rtf']:.2f}" if job["rtf"] is not None else "",
+        ]
+        for col, value in enumerate(values):
+            item = self.queue_table.item(row, col)
+            if item is None:
+                item = QtWidgets.QTableWidgetItem()
+                self.queue_table.setItem(row, col, item)
+            item.setText(value)
+            if col == 0:
+                item.setToolTip(job["input"])
+
+    def _refresh_running_elapsed(self):
+        if self.current_job is not None:
+            self._update_job_row(self.current_job)
+
+    def _renumber_rows(self):
+        for idx, job in enumerate(self.queue_jobs):
+            job["row"] = idx
+
+    def clear_finished_jobs(self):
+        keep = [j for j in self.queue_jobs if j["status"] in ("queued", "running")]
+        self.queue_table.setRowCount(0)
+        self.queue_jobs = keep
+        self._renumber_rows()
+        for job in self.queue_jobs:
+            self.queue_table.insertRow(job["row"])
+            self._update_job_row(job)
+
+    def cancel_selected_jobs(self):
+        rows = {index.row() for index in self.queue_table.selectionModel().selectedRows()}
+        for job in self.queue_jobs:
+            if job["row"] not in rows:
+                continue
+            if job["status"] == "queued":
+                job["status"] = "cancelled"
+                self._update_job_row(job)
+            elif job["status"] == "running":
+                # Annuler le job en cours impose d'arreter le worker (modeles recharges ensuite)
+                job["status"] = "cancelled"
+                job["elapsed"] = time.monotonic() - job["started"]
+                self._update_job_row(job)
+                self.current_job = None
+                self._stop_worker(force=True)
+
+    def start_queue(self):
+        if self.queue_running or self.proc.state() != QtCore.QProcess.NotRunning:
+            return
+        if not any(j["status"] == "queued" for j in self.queue_jobs):
+            return
+        self.queue_running = True
+        self.start_btn.setEnabled(False)
+        self.reset_btn.setEnabled(False)
+        self.stop_btn.setEnabled(False)
+        self.queue_start_btn.setEnabled(False)
+        self.progress.setRange(0, 0)
+        self.progress.setFormat("%p%")
+        self.progress.setVisible(True)
+        self._set_status(self.tr("status_running"))
+        self.queue_timer.start()
+        self._dispatch_next_job()
+
+    def _ensure_worker(self) -> bool:
+        if self.worker.state() != QtCore.QProcess.NotRunning:
+            return True
+        args = [sys.executable, "-u", self._script_path(), "worker"]
+        self.worker_ready = False
+        self._worker_buf = ""
+        self._log("\n" + self.tr("log_worker_start"))
+        self._log(self._format_cmd_for_log(args))
+        self.worker.start(args[0], args[1:])
+        if not self.worker.waitForStarted(3000):
+            self._log(self.tr("log_failed_start"))
+            return False
+        return True
+
+    def _dispatch_next_job(self):
+        if not self.queue_running or self.current_job is not None:
+            return
+        pending = [j for j in self.queue_jobs if j["status"] == "queued"]
+        if not pending:
+            self._queue_finished()
+            return
+        if not self._ensure_worker():
+            self._queue_finished(error=True)
+            return
+        if not self.worker_ready:
+            return  # relance a la reception de "ready"
+
+        job = pending[0]
+        job["status"] = "running"
+        job["started"] = time.monotonic()
+        self.current_job = job
+        self._update_job_row(job)
+        total = len([j for j in self.queue_jobs if j["status"] != "cancelled"])
+        idx = len([j for j in self.queue_jobs if j["status"] in ("done", "error", "running")])
+        self._log("\n" + "=" * 72)
+        self._log(self.tr("log_queue_job").format(idx=idx, total=total, name=os.path.basename(job["input"])))
+
+        request = {"id": job["id"], "args": [job["input"], job["output"]] + job["options"]}
+        self.worker.write((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def _queue_finished(self, error: bool = False):
+        self.queue_running = False
+        self.queue_timer.stop()
+        self.queue_start_btn.setEnabled(self.supports_worker)
+        self._restore_ui_after_run(error=error or any(j["status"] == "error" for j in self.queue_jobs))
+
+    def _read_worker(self):
+        self._worker_buf += bytes(self.worker.readAllStandardOutput()).decode("utf-8", errors="replace")
+        *lines, self._worker_buf = self._worker_buf.split("\n")
+        for line in lines:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                self._log(line)
+                continue
+            if isinstance(event, dict):
+                self._on_worker_event(event)
+
+    def _read_worker_stderr(self):
+        data = bytes(self.worker.readAllStandardError()).decode("utf-8", errors="replace")
+        if data:
+            self.log_sink.feed(data, "stderr")
+
+    def _on_worker_event(self, event: dict):
+        kind = event.get("event")
+        if kind == "ready":
+            self.worker_ready = True
+            self._worker_failed_starts = 0
+            self._log(self.tr("log_worker_ready").format(pid=event.get("pid")))
+            self._dispatch_next_job()
+            return
+
+        job = self.current_job
+        if job is None or event.get("id") != job["id"]:
+            return  # evenement d'un job annule
+        if kind == "log":
+            self._log(event.get("line", ""))
+        elif kind in ("stage_start", "progress", "stage_end"):
+            self._on_progress_event(event)
+        elif kind in ("done", "error"):
+            job["elapsed"] = time.monotonic() - job["started"]
+            name = os.path.basename(job["input"])
+            if kind == "done":
+                job["status"] = "done"
+                job["rtf"] = (event.get("result") or {}).get("rtf")
+                rtf = f"{job['rtf']:.2f}" if job["rtf"] is not None else "-"
+                self._log(self.tr("log_queue_done").format(name=name, elapsed=self._format_eta(job["elapsed"]), rtf=rtf))
+            else:
+                job["status"] = "error"
+                self._log(self.tr("log_queue_error").format(name=name, message=event.get("message", "")))
+            self._update_job_row(job)
+            self.current_job = None
+            self._dispatch_next_job()
+
+    def _worker_finished(self, code, status):
+        was_ready = self.worker_ready
+        self.worker_ready = False
+        self._log(self.tr("log_worker_exit").format(code=code))
+        if not was_ready:
+            self._worker_failed_starts += 1
+        job = self.current_job
+        if job is not None:
+            # Le worker s'est arrete en plein job (crash) : job en erreur, on continue avec un nouveau worker
+            job["status"] = "error"
+            job["elapsed"] = time.monotonic() - job["started"]
+            self._update_job_row(job)
+            self.current_job = None
+        if not self.queue_running:
+            return
+        if self._worker_failed_starts >= WORKER_MAX_FAILED_STARTS:
+            # Le worker ne demarre pas (script, dependances...) : pas de relance en boucle
+            self._worker_failed_starts = 0
+            for pending in self.queue_jobs:
+                if pending["status"] == "queued":
+                    pending["status"] = "error"
+                    self._update_job_row(pending)
+            self._log(self.tr("log_worker_start_failed"))
+            self._queue_finished(error=True)
+            return
+        QtCore.QTimer.singleShot(0, self._dispatch_next_job)
+
+    def _stop_worker(self, force: bool = False):
+        if self.worker.state() == QtCore.QProcess.NotRunning:
+            return
+        if not force:
+            self.worker.write(b'{"cmd": "shutdown"}\n')
+            if self.worker.waitForFinished(2000):
+                return
+        self.worker.kill()
+        self.worker.waitForFinished(2000)
+
 
 # =========================
 #   Entry point